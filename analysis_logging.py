@@ -0,0 +1,138 @@
+# ============================================
+# ログ・コンソール出力の設定
+# HTML解析ツール / Seleniumツール共通
+# ============================================
+
+import atexit  # 終了時にバックグラウンドの書き込みを止める用
+import json  # 構造化ログ用
+import logging  # ログ出力用
+import logging.handlers  # キューを使った非同期書き込み用
+import queue  # ログレコードの受け渡し用
+from typing import Optional  # 型ヒント用
+
+
+# 出力モード
+#   debug      : [DEBUG]表示 + DEBUGログ（ファイルとコンソール）… 従来の動作
+#   info       : [DEBUG]表示なし、INFO以上をファイルへ
+#   silent     : [DEBUG]表示なし、WARNING以上をファイルへ
+#   structured : [DEBUG]表示なし、INFO以上を1行1JSONでファイルへ
+VERBOSITY_MODES = ('debug', 'info', 'silent', 'structured')
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_echo_enabled = True  # [DEBUG]表示を出すか
+_handlers = []  # configure_loggingで追加したハンドラ（再設定時に外す）
+_listener = None  # バックグラウンド書き込みのリスナー
+
+
+class JSONFormatter(logging.Formatter):
+    """ログレコードを1行のJSONに変換するフォーマッタ"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(verbosity: str = 'debug', log_file: Optional[str] = None,
+                      background: bool = False):
+    """
+    出力モードを設定（何度呼んでもよい、前回の設定は置き換える）
+
+    Args:
+        verbosity: VERBOSITY_MODESのいずれか
+        log_file: ログファイルのパス（Noneならファイルに書かない）
+        background: Trueの場合、ログの書き込みを別スレッドで行う
+    """
+    global _echo_enabled, _listener
+
+    if verbosity not in VERBOSITY_MODES:
+        raise ValueError(f"verbosityは {VERBOSITY_MODES} のいずれか: {verbosity}")
+
+    shutdown_logging()
+
+    root = logging.getLogger()
+    level = {
+        'debug': logging.DEBUG,
+        'info': logging.INFO,
+        'silent': logging.WARNING,
+        'structured': logging.INFO,
+    }[verbosity]
+    formatter = JSONFormatter() if verbosity == 'structured' else logging.Formatter(LOG_FORMAT)
+
+    handlers = []
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))  # ファイルに保存
+    if verbosity == 'debug':
+        handlers.append(logging.StreamHandler())  # コンソールにも表示
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if background and handlers:
+        # 呼び出し元はキューに積むだけにして、実際の書き込みは専用スレッドで行う
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, *handlers)
+        _listener.start()
+        installed = [logging.handlers.QueueHandler(log_queue)]
+    else:
+        installed = handlers
+
+    for handler in installed:
+        root.addHandler(handler)
+    _handlers.extend(installed)
+    _handlers.extend(h for h in handlers if h not in installed)
+
+    root.setLevel(level)
+    _echo_enabled = verbosity == 'debug'
+
+
+def shutdown_logging():
+    """configure_loggingで追加したハンドラを外し、書き込みを完了させる"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()  # キューに残っているレコードを書き切る
+        _listener = None
+
+    root = logging.getLogger()
+    for handler in _handlers:
+        root.removeHandler(handler)
+        handler.close()
+    _handlers.clear()
+
+
+atexit.register(shutdown_logging)
+
+
+def echo(message: str, *args):
+    """
+    [DEBUG]付きでコンソールに表示（debugモード以外では何もしない）
+
+    引数は表示するときだけ % で埋め込むので、静音モードでは整形の手間もかからない。
+
+    Args:
+        message: 表示するメッセージ（先頭の改行は[DEBUG]の前に出す）
+        args: messageに % で埋め込む値
+    """
+    if not _echo_enabled:
+        return
+    if args:
+        message = message % args
+    body = message.lstrip('\n')
+    print(message[:len(message) - len(body)] + '[DEBUG] ' + body)
+
+
+def echo_enabled() -> bool:
+    """[DEBUG]表示が有効か"""
+    return _echo_enabled
+
+
+def previews_enabled(logger: logging.Logger) -> bool:
+    """要素ごとのプレビュー（テキスト抽出など）を作る必要があるか"""
+    return _echo_enabled or logger.isEnabledFor(logging.DEBUG)
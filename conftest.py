@@ -0,0 +1,71 @@
+# ============================================
+# テスト共通のフィクスチャ
+# ============================================
+
+import threading  # サーバーを別スレッドで動かす用
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # ローカルHTTPサーバー用
+
+import pytest
+
+
+class LocalServer:
+    """
+    テスト用のローカルHTTPサーバー
+
+    routesにパス → 関数(リクエストヘッダー) を登録すると、
+    関数が返す (ステータス, ヘッダーの辞書, 本文のバイト列) を返す。
+    受け取ったリクエストは (パス, ヘッダー) としてrequestsに残る。
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                route = server.routes.get(self.path)
+                status, headers, body = route(self.headers) if route else (404, {}, b'not found')
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+
+    @property
+    def base(self) -> str:
+        return f'http://127.0.0.1:{self._httpd.server_port}'
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def paths(self) -> list:
+        """受け取ったリクエストのパス（順番どおり）"""
+        return [path for path, _headers in self.requests]
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def http_server():
+    server = LocalServer()
+    server.start()
+    yield server
+    server.stop()
@@ -0,0 +1,906 @@
+# ============================================
+# HTMLAnalyzer ベンチマークツール
+# ローカルのテストサーバーに対して性能を計測
+#
+# 回帰チェック（suite）の使い方:
+#   python html_analyzer_benchmark.py suite --save-baseline   # 基準の結果を benchmark_baseline.json に保存
+#   python html_analyzer_benchmark.py suite                   # 保存した結果と比較（悪化していれば終了コード1）
+# 時間は実行環境に依存するので、ベースラインは比較に使うマシンで作成すること。
+# ============================================
+
+import argparse  # コマンドライン引数の解析用
+import contextlib  # 計測中の標準出力を捨てる用
+import io  # 標準出力の受け皿
+import json  # スイートの結果とベースラインの保存用
+import logging  # 計測中のログ出力を止める用
+import os  # 一時ファイル削除用
+import platform  # ベースラインに記録する実行環境の情報用
+import random  # 合成コーパスの再現可能な乱数用
+import subprocess  # インポート時間を別プロセスで計測する用
+import sys  # 計測に使うPythonのパス
+import tempfile  # 合成ページの保存用
+import threading  # テストサーバーをバックグラウンドで動かす用
+import time  # 時間計測用
+from concurrent.futures import ThreadPoolExecutor  # 並列リクエスト用
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # テストサーバー用
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource  # 最大メモリ使用量の取得用（Unixのみ）
+except ImportError:  # Windows
+    resource = None
+
+import requests  # HTTP通信用
+
+from bs4 import BeautifulSoup  # セレクタ計測用の文書
+
+from analysis_logging import configure_logging
+from html_crawler import Crawler, print_crawl_summary
+from html_parser_no_driver import (HTMLAnalyzer, _extract_images, _extract_links, compile_selector,
+                                   create_session, selector_cache_info)
+
+
+# ============================================
+# テスト用HTTPサーバー
+# ============================================
+
+SAMPLE_HTML = (
+    "<html><head><title>ベンチマーク</title></head><body>"
+    + "".join(f'<div class="item"><a href="/page/{i}">リンク{i}</a></div>' for i in range(200))
+    + "</body></html>"
+).encode('utf-8')
+
+
+class _CountingHandler(BaseHTTPRequestHandler):
+    """接続数（=TCPハンドシェイク数）を数えるハンドラ"""
+
+    protocol_version = 'HTTP/1.1'  # keep-aliveを有効にする
+    disable_nagle_algorithm = True  # ヘッダーと本文の分割送信で遅延しないように
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1  # 新しい接続を受け付けた
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(SAMPLE_HTML)))
+        self.end_headers()
+        self.wfile.write(SAMPLE_HTML)
+
+    def log_message(self, format, *args):
+        pass  # アクセスログは出さない
+
+
+class _SiteHandler(_CountingHandler):
+    """/page/<番号> がリンクでつながった合成サイト（クローラー計測用のローカルミラー）"""
+
+    site_pages = 1000  # ページ数
+    site_fanout = 10  # 1ページあたりの子ページへのリンク数
+
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            body = b"User-agent: *\nDisallow: /private/\n"
+            content_type = 'text/plain'
+        else:
+            try:
+                number = int(self.path.rsplit('/', 1)[-1]) if self.path.startswith('/page/') else 0
+            except ValueError:
+                number = self.site_pages
+            if number >= self.site_pages:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            # 木構造の子ページ + 全ページ共通のナビゲーション（既出URLになる）
+            children = range(number * self.site_fanout + 1,
+                             min(number * self.site_fanout + self.site_fanout + 1, self.site_pages))
+            nav = ''.join(f'<li><a href="/page/{i}">ナビ{i}</a></li>' for i in range(5))
+            links = ''.join(f'<a href="/page/{i}#top">ページ{i}</a>' for i in children)
+            body = (f'<html><head><title>ページ{number}</title></head><body><ul>{nav}</ul>'
+                    f'<div>{links}<a href="/private/{number}">非公開</a></div></body></html>').encode('utf-8')
+            content_type = 'text/html; charset=utf-8'
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalTestServer:
+    """ベンチマーク用のローカルHTTPサーバー"""
+
+    def __init__(self, handler: type = _CountingHandler):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.connections = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def connections(self) -> int:
+        return self.httpd.connections
+
+    def reset(self):
+        with self.httpd.lock:
+            self.httpd.connections = 0
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _run_requests(get: Callable, url: str, count: int, threads: int) -> float:
+    """count回のGETをthreads並列で実行し、経過秒数を返す"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for response in pool.map(lambda _: get(url), range(count)):
+            response.raise_for_status()
+    return time.perf_counter() - start
+
+
+# ============================================
+# ベンチマーク: keep-aliveセッション
+# ============================================
+
+def bench_session(count: int, threads: int, pool_size: int) -> Dict[str, Dict[str, float]]:
+    """
+    requests.get（毎回新規接続）と共有Sessionを比較
+
+    Args:
+        count: リクエスト回数
+        threads: 並列スレッド数
+        pool_size: Sessionのホストごとの接続数
+
+    Returns:
+        モードごとの計測結果
+    """
+    request_headers = {
+        'User-Agent': 'html-analyzer-benchmark',
+        'Connection': 'keep-alive',
+    }
+
+    results = {}
+    with LocalTestServer() as server:
+        # 変更前: モジュールレベルのrequests.get
+        server.reset()
+        elapsed = _run_requests(
+            lambda url: requests.get(url, headers=request_headers, timeout=10),
+            server.url, count, threads)
+        results['requests.get'] = {
+            'seconds': elapsed,
+            'requests_per_sec': count / elapsed,
+            'connections': server.connections,
+        }
+
+        # 変更後: 接続プール付きの共有Session
+        server.reset()
+        session = create_session(pool_size)
+        try:
+            elapsed = _run_requests(
+                lambda url: session.get(url, headers=request_headers, timeout=10),
+                server.url, count, threads)
+        finally:
+            session.close()
+        results['session'] = {
+            'seconds': elapsed,
+            'requests_per_sec': count / elapsed,
+            'connections': server.connections,
+        }
+
+    return results
+
+
+def _print_session_results(results: Dict[str, Dict[str, float]], count: int):
+    """セッションベンチマークの結果を表示"""
+    print(f"{'mode':<14}{'req/s':>10}{'connections':>14}{'seconds':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['requests_per_sec']:>10.1f}{r['connections']:>14}{r['seconds']:>10.2f}")
+    saved = results['requests.get']['connections'] - results['session']['connections']
+    print(f"\nハンドシェイク削減: {saved} / {count}")
+
+
+# ============================================
+# ベンチマーク: analyze_all と 4回呼び出しの比較
+# ============================================
+
+def synthetic_page(items: int) -> str:
+    """商品一覧のような合成ページを作成（items個のブロック）"""
+    blocks = "".join(
+        f'<div class="product" id="p{i}"><h2>商品{i}</h2>'
+        f'<p class="desc">説明文 {i} <span>詳細</span></p>'
+        f'<a href="/item/{i}?ref=list">商品{i}を見る</a>'
+        f'<img src="/img/{i}.jpg" alt="商品{i}"></div>'
+        for i in range(items)
+    )
+    return (
+        '<html><head><title>合成ページ</title>'
+        '<meta name="description" content="ベンチマーク用"></head>'
+        f'<body><nav><a href="/">ホーム</a></nav>{blocks}<footer>フッター</footer></body></html>'
+    )
+
+
+def _best_of(func: Callable, repeat: int) -> float:
+    """repeat回実行して最短の秒数を返す"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_analyze_all(items: int, repeat: int) -> Dict[str, float]:
+    """
+    get_page_info → analyze_structure → get_all_links → get_all_images と
+    analyze_allを同じ文書で比較
+
+    get_all_links / get_all_imagesは先頭10個しか処理しないため、
+    全件を抽出する場合の4回呼び出し（four_calls_all）も計測する。
+
+    Args:
+        items: 合成ページのブロック数
+        repeat: 計測回数（最短を採用）
+
+    Returns:
+        方式ごとの秒数
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.html', encoding='utf-8', delete=False) as f:
+        f.write(synthetic_page(items))
+        path = f.name
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyzer = HTMLAnalyzer()
+            analyzer.load_from_file(path)
+
+            def four_calls():
+                analyzer.get_page_info()
+                analyzer.analyze_structure()
+                analyzer.get_all_links()
+                analyzer.get_all_images()
+
+            def four_calls_all():
+                analyzer.get_page_info()
+                analyzer.analyze_structure()
+                _extract_links(analyzer.soup, analyzer.url, None)
+                _extract_images(analyzer.soup, analyzer.url, None)
+
+            results = {
+                'four_calls': _best_of(four_calls, repeat),
+                'four_calls_all': _best_of(four_calls_all, repeat),
+                'analyze_all': _best_of(analyzer.analyze_all, repeat),
+            }
+            analyzer.close()
+    finally:
+        os.remove(path)
+
+    return results
+
+
+def _print_timings(results: Dict[str, float]):
+    """方式ごとの秒数と、先頭の方式に対する速度比を表示"""
+    base = next(iter(results.values()))
+    print(f"{'mode':<16}{'ms':>10}{'speedup':>10}")
+    for mode, seconds in results.items():
+        print(f"{mode:<16}{seconds * 1000:>10.1f}{base / seconds:>9.2f}x")
+
+
+# ============================================
+# ベンチマーク: CSSセレクタのキャッシュ
+# ============================================
+
+# selenium-hierarchy.tsx で紹介しているセレクタ
+HIERARCHY_SELECTORS = [
+    '#data-table tr:nth-child(3) td:nth-child(2)',
+    'div.product:not(.sold-out) button',
+    '#notifications li:last-child',
+    'input[name*="email"]',
+    'a[href^="https"]',
+    'a[href$=".pdf"]',
+    'button[type="submit"][data-action="save"]',
+    'input[checked]',
+]
+
+SELECTOR_PAGE = """
+<html><body>
+<table id="data-table">""" + "".join(
+    f"<tr><td>{r}-1</td><td>{r}-2</td></tr>" for r in range(5)) + """</table>
+<div class="product"><button>購入</button></div>
+<div class="product sold-out"><button>売り切れ</button></div>
+<ul id="notifications"><li>通知1</li><li>通知2</li></ul>
+<form><input name="user_email"><input type="checkbox" checked>
+<button type="submit" data-action="save">保存</button></form>
+<a href="https://example.com/page1">リンク1</a><a href="download.pdf">PDF</a>
+</body></html>
+"""
+
+
+def bench_css(calls: int) -> Dict[str, float]:
+    """
+    soup.select（毎回セレクタを解析）とcompile_selector（キャッシュ）の1回あたりの時間を比較
+
+    Args:
+        calls: 各セレクタの呼び出し回数
+
+    Returns:
+        方式ごとの1回あたりの秒数
+    """
+    soup = BeautifulSoup(SELECTOR_PAGE, 'html.parser')
+    total = calls * len(HIERARCHY_SELECTORS)
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        for selector in HIERARCHY_SELECTORS:
+            soup.select(selector)
+    uncached = (time.perf_counter() - start) / total
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        for selector in HIERARCHY_SELECTORS:
+            compile_selector(selector).select(soup)
+    cached = (time.perf_counter() - start) / total
+
+    return {'soup.select': uncached, 'compile_selector': cached}
+
+
+def _print_per_call(results: Dict[str, float]):
+    """1回あたりの時間（マイクロ秒）と速度比を表示"""
+    base = next(iter(results.values()))
+    print(f"{'mode':<18}{'us/call':>10}{'speedup':>10}")
+    for mode, seconds in results.items():
+        print(f"{mode:<18}{seconds * 1e6:>10.1f}{base / seconds:>9.2f}x")
+    info = selector_cache_info()
+    print(f"\nセレクタキャッシュ: ヒット {info['hits']}, ミス {info['misses']}, 件数 {info['size']}")
+
+
+# ============================================
+# ベンチマーク: クローラー
+# ============================================
+
+def bench_crawl(pages: int, workers: int, parser: str) -> Dict[str, Any]:
+    """
+    ローカルの合成サイトをクロールしてスループットを計測
+
+    Args:
+        pages: 合成サイトのページ数（すべて取得する）
+        workers: クローラーのワーカー数
+        parser: 使用するパーサー名
+
+    Returns:
+        クロール指標
+    """
+    _SiteHandler.site_pages = pages
+    with LocalTestServer(_SiteHandler) as server:
+        crawler = Crawler([server.url + 'page/0'], workers=workers, max_pages=None,
+                          max_depth=None, delay=0.0, parser=parser, progress_interval=float('inf'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats = crawler.run()
+        stats['connections'] = server.connections
+    return stats
+
+
+# ============================================
+# ベンチマーク: モジュールのインポート時間
+# ============================================
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))  # 計測対象のモジュールがあるディレクトリ
+
+
+def bench_import(module: str, repeat: int) -> Dict[str, Any]:
+    """
+    python -X importtime で新しいプロセスからのインポート時間を計測
+
+    空の一時ディレクトリをカレントにして実行し、インポートだけで
+    ファイル（ログなど）が作られないことも確認する。
+
+    Args:
+        module: 計測するモジュール名
+        repeat: 計測回数（最短を採用）
+
+    Returns:
+        合計時間（ミリ秒）、時間のかかったインポート、作られたファイル
+    """
+    code = f"import sys; sys.path.insert(0, {REPO_DIR!r}); import {module}"
+    best_ms = None
+    best_lines = []
+    created = []
+
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                    cwd=workdir, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip().splitlines()[-1])
+            created = sorted(set(created) | set(os.listdir(workdir)))
+
+        # 行の形式: "import time: self [us] | cumulative | imported package"
+        # 子のインポートは親の行より前に、深いインデントで出力される
+        lines = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            lines.append((int(cumulative) / 1000, name.rstrip()))
+
+        position = max(i for i, (_, name) in enumerate(lines) if name.strip() == module)
+        total_ms = lines[position][0]
+        children = []
+        for ms, name in reversed(lines[:position]):
+            if len(name) - len(name.lstrip()) <= 1:  # siteなど、計測対象より前のインポート
+                break
+            children.append((ms, name))
+        if best_ms is None or total_ms < best_ms:
+            best_ms, best_lines = total_ms, children
+
+    # 計測対象から読み込まれたもののうち、時間のかかった上位
+    top = sorted(best_lines, reverse=True)[:10]
+    return {'module': module, 'total_ms': best_ms, 'top': top, 'created_files': created}
+
+
+def _print_import_results(results: List[Dict[str, Any]], max_ms: float) -> bool:
+    """インポート時間を表示し、予算内かつファイルを作らなかったかを返す"""
+    ok = True
+    for r in results:
+        over = max_ms is not None and r['total_ms'] > max_ms
+        print(f"{r['module']}: {r['total_ms']:.1f} ms" + ("  ← 予算超過" if over else ""))
+        for ms, name in r['top']:
+            print(f"  {ms:>8.1f} ms {name}")
+        if r['created_files']:
+            print(f"  インポート時に作成されたファイル: {', '.join(r['created_files'])}")
+        ok = ok and not over and not r['created_files']
+    return ok
+
+
+# ============================================
+# ベンチマーク: 合成コーパスによるスイート
+# ============================================
+
+# 名前 → 合成ページのおよそのバイト数（--sizesには数値も指定できる）
+CORPUS_SIZES = {
+    '10k': 10 * 1024,
+    '100k': 100 * 1024,
+    '1m': 1024 * 1024,
+    '10m': 10 * 1024 * 1024,
+    '200m': 200 * 1024 * 1024,
+}
+DEFAULT_SUITE_SIZES = ('10k', '1m')  # 既定で計測する大きさ（200mはメモリ数GB・数分かかる）
+DEFAULT_SEED = 20240101  # 合成コーパスの乱数の種（同じ種なら同じバイト列）
+
+# スイートで計測する処理（表示順）
+# build_indexはfind_by_class/id/tagが使う索引の作成で、find_by_*は作成済みの索引を引く時間になる
+SUITE_OPERATIONS = (
+    'load_from_file', 'analyze_structure', 'build_index', 'find_by_class', 'find_by_id', 'find_by_tag',
+    'find_by_css_selector', 'get_all_links', 'extract_text', 'pretty_print',
+)
+
+# 回帰の判定: 時間・メモリがベースラインより許容率を超えて増え、かつ下限値より大きく増えた場合
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 5.0  # これ未満の時間差は誤差とみなす
+MIN_REGRESSION_RSS_MB = 8.0  # これ未満のメモリ差は誤差とみなす
+
+# --baselineを省略した場合に比較するファイル（suite --save-baseline で作成）
+DEFAULT_BASELINE = os.path.join(REPO_DIR, 'benchmark_baseline.json')
+
+_JAPANESE_WORDS = (
+    '東京', '大阪', '天気', 'ニュース', '経済', 'スポーツ', '政治', '技術', 'データ', '解析',
+    '日本語', '文章', 'ページ', '情報', '検索', '今日', '明日', '会社', '発表', '予定',
+    'の', 'は', 'が', 'を', 'に', 'で', 'と', 'です', 'ました', 'します', 'について', '、',
+)
+
+
+def parse_size(text: str) -> int:
+    """'10k'・'200m'・'1g'・'4096' のような大きさの指定をバイト数にする"""
+    text = text.strip().lower()
+    if text in CORPUS_SIZES:
+        return CORPUS_SIZES[text]
+    units = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+    number = text.rstrip('b')
+    if number and number[-1] in units:
+        return int(float(number[:-1]) * units[number[-1]])
+    return int(number)
+
+
+def _japanese_sentence(rng: random.Random, words: int) -> str:
+    """ランダムな日本語風の文"""
+    return ''.join(rng.choice(_JAPANESE_WORDS) for _ in range(words)) + '。'
+
+
+def _corpus_block(rng: random.Random, index: int) -> str:
+    """
+    合成コーパスの1ブロック（種類を順番に切り替える）
+
+    記事（日本語の段落とリンク）、深い入れ子、リンク集、閉じタグの無い表、
+    壊れたマークアップ、script・style・コメント・preを含む。
+    """
+    kind = index % 6
+
+    if kind == 0:
+        # 日本語の記事
+        paragraphs = ''.join(
+            f'<p>{_japanese_sentence(rng, rng.randint(15, 40))}'
+            f'<a href="/article/{index}/{n}">続きを読む</a>{_japanese_sentence(rng, 10)}</p>'
+            for n in range(rng.randint(2, 5))
+        )
+        return (f'<article class="item article" id="block-{index}"><h2>{_japanese_sentence(rng, 5)}</h2>'
+                f'{paragraphs}</article>\n')
+
+    if kind == 1:
+        # 深い入れ子
+        depth = rng.randint(20, 60)
+        opening = ''.join(f'<div class="level-{level}"><span>' for level in range(depth))
+        closing = '</span></div>' * depth
+        return (f'<section class="item nested" id="block-{index}">{opening}'
+                f'{_japanese_sentence(rng, 8)}<a href="#deep-{index}">深いリンク</a>{closing}</section>\n')
+
+    if kind == 2:
+        # リンク集（相対・絶対・クエリ・フラグメント・mailto）
+        links = []
+        for n in range(rng.randint(20, 40)):
+            href = rng.choice((
+                f'/category/{index}/item-{n}.html',
+                f'https://example.com/path/{n}?ref={index}&page={n % 7}',
+                f'../up/{n}/index.html',
+                f'#section-{n}',
+                f'mailto:user{n}@example.com',
+                f'//cdn.example.org/assets/{n}.pdf',
+            ))
+            links.append(f'<li><a href="{href}" title="リンク{n}">{_japanese_sentence(rng, 3)}</a></li>')
+        return f'<nav class="item links" id="block-{index}"><ul>{"".join(links)}</ul></nav>\n'
+
+    if kind == 3:
+        # 閉じタグを省略した表
+        rows = ''.join(
+            '<tr>' + ''.join(f'<td>{rng.choice(_JAPANESE_WORDS)}{row * 10 + col}' for col in range(5))
+            for row in range(rng.randint(3, 8))
+        )
+        return (f'<table class="item table" id="block-{index}"><tr><th>項目<th>値<th>備考<th>日付<th>状態'
+                f'{rows}</table>\n')
+
+    if kind == 4:
+        # 壊れたマークアップ
+        return (
+            f'<div class=item id=block-{index} data-flag><p>閉じない段落 {_japanese_sentence(rng, 6)}'
+            f'<p>入れ子の誤り <b><i>太字斜体</b></i> a < b &amp c &unknown; &copy'
+            f'</span></div></div><img alt=画像{index}><a href=/raw/{index}>引用符なし</a>'
+            f'<ul><li>一<li>二<li>三</ul><font color=red>古いタグ</font>\n'
+        )
+
+    # script・style・コメント・pre
+    return (
+        f'<div class="item code" id="block-{index}"><!-- コメント {index} -->'
+        f'<script>var data{index} = {{"x": {index}, "html": "<b>ignored</b>"}};</script>'
+        f'<style>.level-{index % 60} {{ color: #{index % 4096:03x}; }}</style>'
+        f'<pre>  整形済み\n    テキスト {index}\n</pre></div>\n'
+    )
+
+
+def write_synthetic_corpus(path: str, target_bytes: int, seed: int = DEFAULT_SEED) -> int:
+    """
+    合成HTMLを少しずつファイルに書き出す（200MBでもメモリに全体を持たない）
+
+    Args:
+        path: 出力先
+        target_bytes: およその大きさ（この大きさを超えたところで閉じる）
+        seed: 乱数の種（同じ種・大きさなら同じ内容）
+
+    Returns:
+        書き出したバイト数
+    """
+    rng = random.Random(seed)
+    written = 0
+    with open(path, 'wb') as f:
+        head = ('<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
+                '<title>合成コーパス</title><meta name="description" content="ベンチマーク用の合成ページ">'
+                '</head><body><header class="site">サイトヘッダー</header><main>\n').encode('utf-8')
+        f.write(head)
+        written += len(head)
+
+        index = 0
+        tail = '</main><footer>フッター</footer></body></html>\n'.encode('utf-8')
+        while written + len(tail) < target_bytes:
+            block = _corpus_block(rng, index).encode('utf-8')
+            f.write(block)  # 書き込みはファイルオブジェクトがまとめて行う
+            written += len(block)
+            index += 1
+
+        f.write(tail)
+        written += len(tail)
+    return written
+
+
+def corpus_file(directory: str, size: str, seed: int = DEFAULT_SEED) -> str:
+    """合成コーパスのファイル（無ければ作成、同じ大きさ・種なら作り直さない）"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'corpus_{size}_{seed}.html')
+    if not os.path.exists(path):
+        write_synthetic_corpus(path, parse_size(size), seed)
+    return path
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """このプロセスの最大メモリ使用量（MB、取得できなければNone）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # macOSはバイト、他はKB
+
+
+def run_suite_case(path: str, parser: str, repeat: int) -> Dict[str, Any]:
+    """
+    1つのコーパスファイルで各処理を計測（suiteが別プロセスで呼ぶ）
+
+    毎回ファイルから読み直し、索引などのキャッシュが無い状態の時間を計測する。
+    索引の作成はbuild_indexとして別に計測し、find_by_class/id/tagには含めない。
+
+    Args:
+        path: コーパスファイル
+        parser: 使用するパーサー名
+        repeat: 計測回数（処理ごとに最短を採用）
+
+    Returns:
+        bytes, operations（処理名 → 秒）, peak_rss_mb
+    """
+    configure_logging('silent')  # [DEBUG]表示とログファイルを止める
+    logging.disable(logging.CRITICAL)
+
+    # 遅延インポートやセレクタのコンパイルを計測に含めないよう、小さな文書で1回空回しする
+    warmup = os.path.join(tempfile.gettempdir(), f'html_benchmark_warmup_{os.getpid()}.html')
+    write_synthetic_corpus(warmup, 16 * 1024)
+
+    operations = {
+        'load_from_file': lambda a: a.load_from_file(path),
+        'analyze_structure': lambda a: a.analyze_structure(),
+        'build_index': lambda a: a._element_index(),
+        'find_by_class': lambda a: a.find_by_class('item'),
+        'find_by_id': lambda a: a.find_by_id('block-1'),
+        'find_by_tag': lambda a: a.find_by_tag('a'),
+        'find_by_css_selector': lambda a: a.find_by_css_selector('article.item p a[href]'),
+        'get_all_links': lambda a: a.get_all_links(limit=None),
+        'extract_text': lambda a: a.extract_text(),
+        'pretty_print': lambda a: a.pretty_print(),
+    }
+    best = {}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer = HTMLAnalyzer(parser=parser)
+        try:
+            analyzer.load_from_file(warmup)
+            for name in SUITE_OPERATIONS[1:]:
+                operations[name](analyzer)
+            for _ in range(repeat):
+                for name in SUITE_OPERATIONS:
+                    start = time.perf_counter()
+                    operations[name](analyzer)
+                    elapsed = time.perf_counter() - start
+                    best[name] = min(best.get(name, elapsed), elapsed)
+        finally:
+            analyzer.close()
+            os.remove(warmup)
+
+    return {'bytes': os.path.getsize(path), 'operations': best, 'peak_rss_mb': _peak_rss_mb()}
+
+
+def bench_suite(sizes: List[str], corpus_dir: str, parser: str, repeat: int,
+                seed: int = DEFAULT_SEED) -> Dict[str, Any]:
+    """
+    合成コーパスの大きさごとに、別プロセスで各処理の時間と最大メモリを計測
+
+    Args:
+        sizes: コーパスの大きさ（CORPUS_SIZESの名前またはバイト数）
+        corpus_dir: コーパスの保存先（作成済みのファイルは使い回す）
+        parser: 使用するパーサー名
+        repeat: 計測回数
+        seed: コーパスの乱数の種
+
+    Returns:
+        実行環境の情報とresults（大きさ → run_suite_caseの結果 + mb_per_sec）
+    """
+    results = {}
+    script = os.path.abspath(__file__)
+
+    for size in sizes:
+        path = corpus_file(corpus_dir, size, seed)
+        # 最大メモリは大きさごとに測りたいので、毎回新しいプロセスで実行する
+        completed = subprocess.run(
+            [sys.executable, script, 'suite-case', path, '--parser', parser, '--repeat', str(repeat)],
+            cwd=REPO_DIR, capture_output=True, text=True, encoding='utf-8')
+        if completed.returncode != 0:
+            raise RuntimeError(f"{size}: {completed.stderr.strip().splitlines()[-1]}")
+        case = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        total = sum(case['operations'].values())
+        case['mb_per_sec'] = case['bytes'] / (1024 * 1024) / total if total > 0 else 0.0
+        results[size] = case
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parser': parser,
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare_to_baseline(current: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    ベースラインと比べて、時間またはメモリが悪化した項目を返す
+
+    Args:
+        current: bench_suiteの結果
+        baseline: 保存しておいたbench_suiteの結果
+        tolerance: 許容する増加率（0.25なら25%まで）
+
+    Returns:
+        回帰した項目（size, metric, baseline, current, change）のリスト
+    """
+    regressions = []
+
+    for size, case in current['results'].items():
+        base_case = baseline.get('results', {}).get(size)
+        if base_case is None:
+            continue  # ベースラインに無い大きさは比較しない
+
+        for name, seconds in case['operations'].items():
+            base_seconds = base_case['operations'].get(name)
+            if base_seconds is None:
+                continue
+            if (seconds > base_seconds * (1 + tolerance)
+                    and (seconds - base_seconds) * 1000 >= MIN_REGRESSION_MS):
+                regressions.append({'size': size, 'metric': name, 'baseline': base_seconds * 1000,
+                                    'current': seconds * 1000, 'change': seconds / base_seconds - 1})
+
+        rss, base_rss = case.get('peak_rss_mb'), base_case.get('peak_rss_mb')
+        if rss is not None and base_rss and rss > base_rss * (1 + tolerance) \
+                and rss - base_rss >= MIN_REGRESSION_RSS_MB:
+            regressions.append({'size': size, 'metric': 'peak_rss_mb', 'baseline': base_rss,
+                                'current': rss, 'change': rss / base_rss - 1})
+
+    return regressions
+
+
+def _print_suite_results(suite: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """大きさ・処理ごとの時間（ベースラインがあれば増減率も）を表示"""
+    print(f"Python {suite['python']} / parser={suite['parser']} / seed={suite['seed']}")
+    for size, case in suite['results'].items():
+        base_case = (baseline or {}).get('results', {}).get(size)
+        rss = case['peak_rss_mb']
+        memory = f", 最大メモリ {rss:.1f} MB" if rss is not None else ""
+        print(f"\n[{size}] {case['bytes']:,} バイト, {case['mb_per_sec']:.2f} MB/秒{memory}")
+        print(f"  {'operation':<22}{'ms':>10}{'baseline':>10}{'change':>9}")
+        for name in SUITE_OPERATIONS:
+            ms = case['operations'][name] * 1000
+            base = base_case['operations'].get(name) if base_case else None
+            if base:
+                print(f"  {name:<22}{ms:>10.2f}{base * 1000:>10.2f}{ms / (base * 1000) - 1:>+9.0%}")
+            else:
+                print(f"  {name:<22}{ms:>10.2f}")
+
+    keys = ('python', 'parser', 'seed', 'repeat')
+    if baseline and any(baseline.get(key) != suite[key] for key in keys):
+        # 初回呼び出しには遅延インポートなどが含まれるため、repeatが違うだけでも時間は比べにくい
+        print("\n⚠ ベースラインと条件が異なります: "
+              + ", ".join(f"{key}={baseline.get(key)}" for key in keys))
+
+
+# ============================================
+# メイン実行部分
+# ============================================
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="HTMLAnalyzer ベンチマーク")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_session = sub.add_parser('session', help="keep-alive接続プールの効果を計測")
+    p_session.add_argument('--requests', type=int, default=500, help="リクエスト回数")
+    p_session.add_argument('--threads', type=int, default=8, help="並列スレッド数")
+    p_session.add_argument('--pool-size', type=int, default=10, help="ホストごとの接続数")
+
+    p_all = sub.add_parser('analyze-all', help="analyze_allと4回呼び出しを比較")
+    p_all.add_argument('--items', type=int, default=5000, help="合成ページのブロック数")
+    p_all.add_argument('--repeat', type=int, default=3, help="計測回数")
+
+    p_css = sub.add_parser('css', help="CSSセレクタキャッシュの効果を計測")
+    p_css.add_argument('--calls', type=int, default=2000, help="各セレクタの呼び出し回数")
+
+    p_crawl = sub.add_parser('crawl', help="ローカルの合成サイトに対するクローラーのスループットを計測")
+    p_crawl.add_argument('--pages', type=int, default=2000, help="合成サイトのページ数")
+    p_crawl.add_argument('--workers', type=int, default=8, help="クローラーのワーカー数")
+    p_crawl.add_argument('--parser', default='html.parser', help="使用するパーサー")
+
+    p_import = sub.add_parser('importtime', help="モジュールのインポート時間を計測")
+    p_import.add_argument('--modules', nargs='+', default=['html_parser_no_driver'],
+                          help="計測するモジュール名")
+    p_import.add_argument('--repeat', type=int, default=5, help="計測回数")
+    p_import.add_argument('--max-ms', type=float, default=None,
+                          help="インポート時間の上限（超えたら終了コード1）")
+
+    p_suite = sub.add_parser('suite', help="合成コーパスで主要な処理の時間と最大メモリを計測")
+    p_suite.add_argument('--sizes', nargs='+', default=list(DEFAULT_SUITE_SIZES),
+                         help=f"コーパスの大きさ（{', '.join(CORPUS_SIZES)} または '5m' などのバイト数）")
+    p_suite.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'html_benchmark_corpus'),
+                         help="合成コーパスの保存先（作成済みのファイルは使い回す）")
+    p_suite.add_argument('--parser', default='html.parser', help="使用するパーサー")
+    p_suite.add_argument('--repeat', type=int, default=3, help="計測回数")
+    p_suite.add_argument('--seed', type=int, default=DEFAULT_SEED, help="コーパスの乱数の種")
+    p_suite.add_argument('--baseline',
+                         help="比較するベースラインのJSON（回帰があれば終了コード1、"
+                              f"省略時は {os.path.basename(DEFAULT_BASELINE)} があれば使う）")
+    p_suite.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE,
+                         help="今回の結果をベースラインとして保存するパス（パス省略時は "
+                              f"{os.path.basename(DEFAULT_BASELINE)}）")
+    p_suite.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                         help="回帰とみなさない増加率（0.25なら25%%まで）")
+
+    p_case = sub.add_parser('suite-case', help="suiteの内部用: 1ファイルを計測してJSONを出力")
+    p_case.add_argument('path', help="コーパスファイル")
+    p_case.add_argument('--parser', default='html.parser', help="使用するパーサー")
+    p_case.add_argument('--repeat', type=int, default=3, help="計測回数")
+
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)  # ログ出力の時間を計測に含めない
+
+    if args.command == 'session':
+        results = bench_session(args.requests, args.threads, args.pool_size)
+        _print_session_results(results, args.requests)
+    elif args.command == 'analyze-all':
+        _print_timings(bench_analyze_all(args.items, args.repeat))
+    elif args.command == 'css':
+        _print_per_call(bench_css(args.calls))
+    elif args.command == 'crawl':
+        stats = bench_crawl(args.pages, args.workers, args.parser)
+        print_crawl_summary(stats)
+        print(f"接続数: {stats['connections']}")
+    elif args.command == 'importtime':
+        results = [bench_import(module, args.repeat) for module in args.modules]
+        if not _print_import_results(results, args.max_ms):
+            sys.exit(1)
+    elif args.command == 'suite-case':
+        print(json.dumps(run_suite_case(args.path, args.parser, args.repeat)))
+    elif args.command == 'suite':
+        baseline = None
+        baseline_path = args.baseline
+        if baseline_path is None and not args.save_baseline and os.path.exists(DEFAULT_BASELINE):
+            baseline_path = DEFAULT_BASELINE
+        if baseline_path:
+            with open(baseline_path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        suite = bench_suite(args.sizes, args.corpus_dir, args.parser, args.repeat, args.seed)
+        _print_suite_results(suite, baseline)
+
+        if args.save_baseline:
+            with open(args.save_baseline, 'w', encoding='utf-8') as f:
+                json.dump(suite, f, ensure_ascii=False, indent=2)
+            print(f"\nベースラインを保存: {args.save_baseline}")
+
+        if baseline is not None:
+            regressions = compare_to_baseline(suite, baseline, args.tolerance)
+            if regressions:
+                print(f"\n❌ 回帰 {len(regressions)}件（許容 +{args.tolerance:.0%}）")
+                for r in regressions:
+                    print(f"  [{r['size']}] {r['metric']}: {r['baseline']:.1f} → {r['current']:.1f} "
+                          f"({r['change']:+.0%})")
+                sys.exit(1)
+            print(f"\n✅ 回帰なし（許容 +{args.tolerance:.0%}）")
+        elif not args.save_baseline:
+            print(f"\nベースラインが無いため比較していません（作成: {os.path.basename(__file__)} suite --save-baseline）")
+
+
+if __name__ == "__main__":
+    main()
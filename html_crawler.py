@@ -0,0 +1,570 @@
+# ============================================
+# サイトクローラー
+# HTMLAnalyzerでページを取得し、リンクをたどって巡回
+# ============================================
+
+from __future__ import annotations  # 型ヒントを実行時に評価しない（遅延インポートのため）
+
+import argparse  # コマンドライン引数の解析用
+import hashlib  # 既出URLの要約用
+import heapq  # ホストごとの次回アクセス時刻の管理用
+import json  # ページ情報のJSONL出力用
+import logging  # ログ出力用
+import threading  # ワーカー間の排他制御用
+import time  # 待機・処理時間の計測用
+from collections import deque  # ホストごとのURLキュー
+from concurrent.futures import ThreadPoolExecutor  # ワーカープール
+from typing import Callable, Dict, Iterable, List, Optional, Tuple  # 型ヒント用
+from urllib.parse import urlsplit  # ホスト名の取り出し用
+
+from analysis_logging import VERBOSITY_MODES, configure_logging, echo  # 出力モード切替用
+from html_parser_no_driver import (DEFAULT_PARSER, PARSER_BACKENDS, HTMLAnalyzer,
+                                   canonicalize_url, create_session)
+from lazy_import import LazyModule  # 重いライブラリの遅延インポート用
+
+# robots.txtを最初に取得する時まで読み込まない（importを速くするため）
+requests = LazyModule('requests')  # robots.txtの取得エラー判定用
+robotparser = LazyModule('urllib.robotparser')  # robots.txtの解釈用
+
+
+# ============================================
+# ログ設定
+# ============================================
+
+LOG_FILE = 'crawler.log'  # ログファイルのパス（main()でconfigure_loggingに渡す）
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# 既出URLの集合
+# ============================================
+
+class SeenURLSet:
+    """
+    一度キューに入れたURLを覚えておく集合
+
+    URL文字列の代わりに64ビットの要約（整数）だけを保持するので、
+    数百万URLでも文字列で持つより大幅に小さい（衝突確率は実用上無視できる）。
+    """
+
+    def __init__(self):
+        self._digests = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(url: str) -> int:
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, url: str) -> bool:
+        """
+        URLを追加
+
+        Args:
+            url: 正規化済みのURL
+
+        Returns:
+            初めてのURLならTrue、既出ならFalse
+        """
+        digest = self._digest(url)
+        with self._lock:
+            if digest in self._digests:
+                return False
+            self._digests.add(digest)
+            return True
+
+    def __contains__(self, url: str) -> bool:
+        return self._digest(url) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+
+# ============================================
+# robots.txtのキャッシュ
+# ============================================
+
+class RobotsCache:
+    """
+    ホストごとのrobots.txtを1回だけ取得して使い回す
+
+    取得に失敗した場合（404・接続エラー）は全許可、401/403は全拒否として扱う
+    （urllib.robotparserと同じ解釈）。
+    """
+
+    def __init__(self, session: requests.Session, user_agent: str = '*',
+                 timeout: int = 10, max_age: float = 3600.0):
+        """
+        初期化
+
+        Args:
+            session: robots.txtの取得に使うSession
+            user_agent: robots.txtの照合に使うユーザーエージェント名
+            timeout: 取得のタイムアウト（秒）
+            max_age: キャッシュの有効期間（秒）
+        """
+        self.session = session
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.max_age = max_age
+        self._parsers = {}  # 'scheme://host' → (取得時刻, RobotFileParser)
+        self._locks = {}  # 同じホストのrobots.txtを同時に2回取りに行かないためのロック
+        self._lock = threading.Lock()
+        self.fetches = 0  # 実際にrobots.txtを取得した回数
+
+    def _fetch(self, origin: str) -> robotparser.RobotFileParser:
+        """robots.txtを取得して解釈"""
+        robots = robotparser.RobotFileParser(origin + '/robots.txt')
+        self.fetches += 1
+        try:
+            response = self.session.get(robots.url, timeout=self.timeout)
+            if response.status_code in (401, 403):
+                robots.disallow_all = True
+            elif response.status_code >= 400:
+                robots.allow_all = True
+            else:
+                robots.parse(response.text.splitlines())
+        except requests.exceptions.RequestException as e:
+            logger.warning("robots.txt取得失敗（全許可として扱う）: %s: %s", robots.url, e)
+            robots.allow_all = True
+        return robots
+
+    def _parser(self, url: str) -> robotparser.RobotFileParser:
+        """URLのホストのRobotFileParserを取得（期限切れなら取り直す）"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        entry = self._parsers.get(origin)
+        if entry is not None and time.monotonic() - entry[0] < self.max_age:
+            return entry[1]
+
+        with self._lock:
+            host_lock = self._locks.setdefault(origin, threading.Lock())
+        with host_lock:
+            entry = self._parsers.get(origin)  # 待っている間に他のワーカーが取得済みか
+            if entry is None or time.monotonic() - entry[0] >= self.max_age:
+                entry = (time.monotonic(), self._fetch(origin))
+                self._parsers[origin] = entry
+        return entry[1]
+
+    def allowed(self, url: str) -> bool:
+        """URLの取得が許可されているか"""
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        """robots.txtのCrawl-delay（指定なしならNone）"""
+        delay = self._parser(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+
+# ============================================
+# フロンティア（未取得URLのキュー）
+# ============================================
+
+class Frontier:
+    """
+    ホストごとのキューと、ホストごとの次回アクセス可能時刻を持つURLキュー
+
+    pop()はアクセス間隔を守れるホストが現れるまで待つ。
+    同じホストへのリクエストは開始時刻がdelay秒以上離れる（0なら間隔なし）。
+    """
+
+    def __init__(self, delay: float = 1.0):
+        """
+        初期化
+
+        Args:
+            delay: 同じホストへのアクセス間隔（秒）
+        """
+        self.delay = delay
+        self._queues = {}  # ホスト → deque[(url, depth)]
+        self._delays = {}  # ホスト → アクセス間隔（robots.txtのCrawl-delayで上書き）
+        self._next_time = {}  # ホスト → 次にアクセスしてよい時刻
+        self._ready = []  # (次回アクセス時刻, 連番, ホスト) のヒープ（キューが空でないホストのみ）
+        self._sequence = 0
+        self._queued = 0  # キュー内のURL数
+        self._in_progress = 0  # pop済みでdone()が呼ばれていない数
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _schedule(self, host: str, at: float):
+        self._sequence += 1
+        heapq.heappush(self._ready, (at, self._sequence, host))
+
+    def push(self, url: str, depth: int, host: str) -> bool:
+        """URLをホストのキューに追加（close()後は追加せずFalseを返す）"""
+        with self._cond:
+            if self._closed:
+                return False
+            queue = self._queues.get(host)
+            if queue is None:
+                queue = self._queues[host] = deque()
+            if not queue:  # 空だったホストをヒープに戻す
+                self._schedule(host, self._next_time.get(host, 0.0))
+            queue.append((url, depth))
+            self._queued += 1
+            self._cond.notify()
+            return True
+
+    def set_delay(self, host: str, delay: float):
+        """ホストのアクセス間隔を変更（既定値より短くはしない）"""
+        with self._cond:
+            self._delays[host] = max(self.delay, delay)
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """
+        次に取得するURLを取り出す（アクセス可能になるまで待つ）
+
+        Returns:
+            (url, depth)。キューが空で処理中のURLも無い場合、またはclose()後はNone
+        """
+        with self._cond:
+            while True:
+                if self._closed or (not self._ready and self._in_progress == 0):
+                    self._cond.notify_all()  # 他の待機中ワーカーも終了させる
+                    return None
+                if not self._ready:
+                    self._cond.wait()  # 処理中のページからURLが追加されるのを待つ
+                    continue
+
+                at, _, host = self._ready[0]
+                now = time.monotonic()
+                if at > now:
+                    self._cond.wait(at - now)
+                    continue
+
+                heapq.heappop(self._ready)
+                queue = self._queues[host]
+                url, depth = queue.popleft()
+                self._queued -= 1
+                self._in_progress += 1
+
+                next_time = now + self._delays.get(host, self.delay)
+                self._next_time[host] = next_time
+                if queue:
+                    self._schedule(host, next_time)
+                return url, depth
+
+    def done(self):
+        """pop()したURLの処理が終わったことを通知"""
+        with self._cond:
+            self._in_progress -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        """以降のpop()をすべてNoneにする（ページ数の上限に達した場合など）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return self._queued
+
+    def hosts(self) -> int:
+        """キューにURLが残っているホストの数"""
+        with self._cond:
+            return sum(1 for queue in self._queues.values() if queue)
+
+
+# ============================================
+# クローラー
+# ============================================
+
+class Crawler:
+    """
+    開始URLからリンクをたどってページを取得するクローラー
+
+    ワーカーごとにHTMLAnalyzerを持ち、Session（接続プール）とrobots.txtの
+    キャッシュ・既出URL集合・フロンティアは全ワーカーで共有する。
+    """
+
+    def __init__(self, start_urls: Iterable[str], workers: int = 8,
+                 max_pages: Optional[int] = 100, max_depth: Optional[int] = 3,
+                 delay: float = 1.0, same_host: bool = True, respect_robots: bool = True,
+                 timeout: int = 10, parser: str = DEFAULT_PARSER, user_agent: str = '*',
+                 on_page: Optional[Callable[[str, int, HTMLAnalyzer], None]] = None,
+                 progress_interval: float = 5.0):
+        """
+        初期化
+
+        Args:
+            start_urls: 開始URL
+            workers: 並列に取得・解析するワーカー数
+            max_pages: 取得するページ数の上限（Noneなら無制限）
+            max_depth: 開始URLからのリンクの深さの上限（Noneなら無制限）
+            delay: 同じホストへのアクセス間隔（秒）
+            same_host: Trueの場合、開始URLと同じホストのリンクだけたどる
+            respect_robots: Trueの場合、robots.txtに従う（Crawl-delayも反映）
+            timeout: 取得のタイムアウト（秒）
+            parser: 使用するパーサー名
+            user_agent: robots.txtの照合に使うユーザーエージェント名
+            on_page: ページ取得成功時にワーカーのスレッドで呼ぶ関数 (url, depth, analyzer)
+            progress_interval: 進捗を表示する間隔（秒）
+        """
+        self.start_urls = [canonicalize_url(url) for url in start_urls]
+        self.workers = workers
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.same_host = same_host
+        self.timeout = timeout
+        self.parser = parser
+        self.on_page = on_page
+        self.progress_interval = progress_interval
+
+        self.session = create_session(pool_size=workers)
+        self.frontier = Frontier(delay)
+        self.seen = SeenURLSet()
+        self.robots = RobotsCache(self.session, user_agent, timeout) if respect_robots else None
+        self.allowed_hosts = {urlsplit(url).hostname for url in self.start_urls}
+
+        self._lock = threading.Lock()
+        self._started_pages = 0  # 取得を開始したページ数（max_pagesの判定用）
+        self._delays_set = set()  # Crawl-delayを反映済みのホスト
+        self.metrics = {
+            'pages': 0,  # 取得・解析に成功したページ数
+            'failed': 0,  # 取得に失敗したページ数
+            'bytes': 0,  # 取得したHTMLの文字数の合計
+            'links_found': 0,  # 見つかったリンク数（重複含む）
+            'enqueued': 0,  # フロンティアに入れたURL数
+            'duplicates': 0,  # 既出のため捨てたURL数
+            'robots_blocked': 0,  # robots.txtで拒否されたURL数
+            'fetch_seconds': 0.0,  # 取得にかかった時間の合計
+            'parse_seconds': 0.0,  # リンク抽出にかかった時間の合計
+        }
+        self._start_time = None
+        self._last_progress = 0.0
+
+    # --------------------------------------------
+    # URLの追加
+    # --------------------------------------------
+
+    def _enqueue(self, url: str, depth: int):
+        """未出のURLをフロンティアに追加（robots.txtで拒否されたものは除く）"""
+        if not self.seen.add(url):
+            self._count('duplicates')
+            return
+
+        host = urlsplit(url).hostname
+        if self.robots is not None:
+            if not self.robots.allowed(url):
+                self._count('robots_blocked')
+                logger.debug("robots.txtにより除外: %s", url)
+                return
+            if host not in self._delays_set:
+                self._delays_set.add(host)
+                crawl_delay = self.robots.crawl_delay(url)
+                if crawl_delay is not None:
+                    self.frontier.set_delay(host, crawl_delay)
+
+        if self.frontier.push(url, depth, host):
+            self._count('enqueued')
+
+    def _count(self, key: str, amount=1):
+        with self._lock:
+            self.metrics[key] += amount
+
+    # --------------------------------------------
+    # ワーカー
+    # --------------------------------------------
+
+    def _claim_page(self) -> bool:
+        """ページ数の上限に達していなければ1ページ分の枠を確保"""
+        with self._lock:
+            if self.max_pages is not None and self._started_pages >= self.max_pages:
+                return False
+            self._started_pages += 1
+            return True
+
+    def _worker(self):
+        """フロンティアが空になるまでURLを取り出して取得・解析"""
+        analyzer = HTMLAnalyzer(session=self.session, parser=self.parser)
+
+        while True:
+            item = self.frontier.pop()
+            if item is None:
+                break
+            url, depth = item
+
+            try:
+                if not self._claim_page():
+                    self.frontier.close()
+                    break
+                self._crawl_page(analyzer, url, depth)
+            except Exception as e:
+                self._count('failed')
+                logger.error("クロールエラー: %s: %s", url, e, exc_info=True)
+            finally:
+                self.frontier.done()
+
+            self._maybe_report_progress()
+
+    def _crawl_page(self, analyzer: HTMLAnalyzer, url: str, depth: int):
+        """1ページを取得し、リンクをフロンティアに追加"""
+        start = time.perf_counter()
+        ok = analyzer.fetch_url(url, self.timeout)
+        fetched = time.perf_counter()
+        self._count('fetch_seconds', fetched - start)
+
+        if not ok:
+            self._count('failed')
+            return
+
+        self._count('pages')
+        self._count('bytes', analyzer.html_length)
+
+        if self.max_depth is None or depth < self.max_depth:
+            found = 0
+            for link in analyzer.iter_links(schemes=('http', 'https')):
+                found += 1
+                if self.same_host and urlsplit(link.href).hostname not in self.allowed_hosts:
+                    continue
+                self._enqueue(link.href, depth + 1)
+            self._count('links_found', found)
+        self._count('parse_seconds', time.perf_counter() - fetched)
+
+        if self.on_page is not None:
+            self.on_page(url, depth, analyzer)
+
+    # --------------------------------------------
+    # 進捗
+    # --------------------------------------------
+
+    def stats(self) -> Dict[str, any]:
+        """現在までのクロール指標"""
+        elapsed = time.perf_counter() - self._start_time if self._start_time else 0.0
+        with self._lock:
+            stats = dict(self.metrics)
+        stats.update({
+            'seconds': elapsed,
+            'pages_per_sec': stats['pages'] / elapsed if elapsed > 0 else 0.0,
+            'frontier': len(self.frontier),
+            'frontier_hosts': self.frontier.hosts(),
+            'seen': len(self.seen),
+            'robots_fetches': self.robots.fetches if self.robots is not None else 0,
+        })
+        return stats
+
+    def _maybe_report_progress(self):
+        """前回からprogress_interval秒以上経っていれば進捗を表示"""
+        now = time.perf_counter()
+        with self._lock:
+            if now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+
+        stats = self.stats()
+        echo("進捗: %s ページ (失敗 %s), %.1f ページ/秒, キュー %s URL / %s ホスト",
+             stats['pages'], stats['failed'], stats['pages_per_sec'],
+             stats['frontier'], stats['frontier_hosts'])
+        logger.info("クロール進捗: %s", stats)
+
+    # --------------------------------------------
+    # 実行
+    # --------------------------------------------
+
+    def run(self) -> Dict[str, any]:
+        """
+        クロールを実行（フロンティアが空になるか上限に達するまで）
+
+        Returns:
+            クロール指標（statsと同じ形式）
+        """
+        logger.info("クロール開始: %s, %sワーカー", self.start_urls, self.workers)
+        self._start_time = self._last_progress = time.perf_counter()
+
+        for url in self.start_urls:
+            self._enqueue(url, 0)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(self._worker) for _ in range(self.workers)]
+                try:
+                    for future in futures:
+                        future.result()
+                except KeyboardInterrupt:
+                    self.frontier.close()  # 取得中のページが終わり次第ワーカーを止める
+                    raise
+        finally:
+            self.session.close()
+
+        stats = self.stats()
+        logger.info("クロール完了: %s", stats)
+        return stats
+
+
+def print_crawl_summary(stats: Dict[str, any]):
+    """クロール指標を表示"""
+    print("\n" + "=" * 70)
+    print("🕷 クロールサマリー")
+    print("=" * 70)
+    print(f"ページ数: {stats['pages']} (失敗 {stats['failed']})")
+    print(f"処理時間: {stats['seconds']:.2f}秒")
+    print(f"スループット: {stats['pages_per_sec']:.2f} ページ/秒")
+    print(f"取得量: {stats['bytes']:,} 文字")
+    print(f"リンク: 発見 {stats['links_found']:,}, 追加 {stats['enqueued']:,}, "
+          f"既出 {stats['duplicates']:,}, robots除外 {stats['robots_blocked']:,}")
+    print(f"未取得: {stats['frontier']:,} URL / {stats['frontier_hosts']} ホスト")
+    pages = stats['pages'] + stats['failed']
+    if pages:
+        print(f"平均: 取得 {stats['fetch_seconds'] / pages * 1000:.1f}ms, "
+              f"リンク抽出 {stats['parse_seconds'] / pages * 1000:.1f}ms")
+
+
+# ============================================
+# メイン実行部分
+# ============================================
+
+def main(argv: Optional[List[str]] = None):
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="HTMLAnalyzer サイトクローラー")
+    parser.add_argument('urls', nargs='+', help="開始URL")
+    parser.add_argument('--workers', type=int, default=8, help="並列ワーカー数")
+    parser.add_argument('--max-pages', type=int, default=100, help="取得ページ数の上限（0で無制限）")
+    parser.add_argument('--max-depth', type=int, default=3, help="リンクの深さの上限（-1で無制限）")
+    parser.add_argument('--delay', type=float, default=1.0, help="同じホストへのアクセス間隔（秒）")
+    parser.add_argument('--all-hosts', action='store_true', help="他のホストへのリンクもたどる")
+    parser.add_argument('--ignore-robots', action='store_true', help="robots.txtを無視する")
+    parser.add_argument('--timeout', type=int, default=10, help="取得のタイムアウト（秒）")
+    parser.add_argument('--parser', default=DEFAULT_PARSER, choices=list(PARSER_BACKENDS),
+                        help="使用するパーサー")
+    parser.add_argument('--output', help="取得したページの情報を書き出すJSONL")
+    parser.add_argument('--verbosity', default='info', choices=VERBOSITY_MODES,
+                        help="出力モード（debugはページごとの表示が多く遅くなる）")
+    parser.add_argument('--log-file', default=LOG_FILE, help="ログファイルのパス（空文字で出力しない）")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.verbosity, args.log_file or None)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    write_lock = threading.Lock()
+
+    def write_page(url: str, depth: int, analyzer: HTMLAnalyzer):
+        record = {'url': url, 'depth': depth, 'title': analyzer.soup.title.get_text(strip=True)
+                  if analyzer.soup.title else None, 'html_length': analyzer.html_length}
+        with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    crawler = Crawler(
+        args.urls, workers=args.workers,
+        max_pages=args.max_pages or None,
+        max_depth=args.max_depth if args.max_depth >= 0 else None,
+        delay=args.delay, same_host=not args.all_hosts,
+        respect_robots=not args.ignore_robots, timeout=args.timeout,
+        parser=args.parser, on_page=write_page if out else None,
+    )
+
+    try:
+        stats = crawler.run()
+    except KeyboardInterrupt:
+        echo("\n\n中断されました")
+        logger.info("ユーザー中断")
+        stats = crawler.stats()
+    finally:
+        if out:
+            out.close()
+
+    print_crawl_summary(stats)
+
+
+if __name__ == "__main__":
+    main()
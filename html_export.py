@@ -0,0 +1,420 @@
+# ============================================
+# 解析結果のエクスポート
+# ページ情報・構造・リンク・画像を表ごとにJSONL / CSV / Parquetへ追記
+# ============================================
+
+import abc  # 出力先の基底クラス用
+import csv  # CSV出力用
+import importlib.util  # pyarrowの有無を確認する用
+import json  # JSONL出力用
+import logging  # ログ出力用
+import os  # ファイル操作用
+import threading  # 複数スレッドからの書き込みの排他用
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple  # 型ヒント用
+
+from lazy_import import LazyModule  # オプションのライブラリの遅延インポート用
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# 形式と列の定義
+# ============================================
+
+# pyarrowはオプション（無ければParquetは使えない）
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+pa = LazyModule('pyarrow')
+pq = LazyModule('pyarrow.parquet')
+
+# 出力形式 → ファイルの拡張子
+#   jsonl   : 1行1JSON（追記可）
+#   csv     : ヘッダー付きCSV（追記可、既存のヘッダーと列が違えばエラー）
+#   parquet : 列指向（pyarrowが必要、行をためて行グループごとに書く）
+FORMATS = {'jsonl': '.jsonl', 'csv': '.csv', 'parquet': '.parquet'}
+
+DEFAULT_BUFFER_ROWS = 10000  # この行数たまったらファイルに書く（Parquetでは行グループの大きさ）
+
+# 表ごとの列（名前, 型）。順番も固定で、行に無い列は空（None）にする
+PAGE_COLUMNS = (
+    ('source', 'string'),
+    ('url', 'string'),
+    ('title', 'string'),
+    ('description', 'string'),
+    ('keywords', 'string'),
+    ('html_length', 'int64'),
+    ('encoding', 'string'),
+)
+LINK_COLUMNS = (
+    ('source', 'string'),
+    ('href', 'string'),
+    ('text', 'string'),
+    ('original_href', 'string'),
+)
+IMAGE_COLUMNS = (
+    ('source', 'string'),
+    ('src', 'string'),
+    ('alt', 'string'),
+    ('original_src', 'string'),
+)
+
+TABLES = ('pages', 'structure', 'links', 'images')
+
+
+def structure_columns(elements: Iterable[str]) -> Tuple[tuple, ...]:
+    """構造の表の列（source + 要素ごとの個数）"""
+    return (('source', 'string'),) + tuple((element, 'int64') for element in elements)
+
+
+# ============================================
+# 表の出力先
+# ============================================
+
+class TableSink(abc.ABC):
+    """
+    1つの表を追記していく出力先（JSONL / CSV / Parquetの共通部分）
+
+    行は列の順に並べたタプルにしてためておき、buffer_rows行ごとにまとめて書く。
+    writeとwrite_manyはスレッドセーフ（write_manyの行はbuffer_rows行ごとのまとまりで追加される）。
+    """
+
+    format = None  # FORMATSのキー（サブクラスで設定）
+
+    def __init__(self, path: str, columns: Sequence[tuple],
+                 buffer_rows: int = DEFAULT_BUFFER_ROWS, append: bool = False):
+        """
+        初期化
+
+        Args:
+            path: 出力ファイルのパス
+            columns: (列名, 型) のリスト（型は'string'または'int64'）
+            buffer_rows: この行数たまったらファイルに書く
+            append: Trueの場合、既存のファイルの後ろに追記する
+        """
+        self.path = path
+        self.columns = tuple(columns)
+        self.names = tuple(name for name, _type in self.columns)
+        self.buffer_rows = max(1, buffer_rows)
+        self.append = append
+        self.rows = 0  # 受け取った行数
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _normalize(self, row) -> tuple:
+        """行（辞書またはNamedTuple）を列の順のタプルにする（型をそろえ、余分なキーは捨てる）"""
+        if hasattr(row, '_asdict'):
+            row = row._asdict()
+        values = []
+        for name, column_type in self.columns:
+            value = row.get(name)
+            if value is not None:
+                value = int(value) if column_type == 'int64' else str(value)
+            values.append(value)
+        return tuple(values)
+
+    def write(self, row) -> None:
+        """1行追加"""
+        self.write_many((row,))
+
+    def write_many(self, rows: Iterable) -> int:
+        """
+        複数行をまとめて追加（イテレータを渡せば全行をメモリに持たない）
+
+        イテレータの消費（ツリーの走査など）はロックの外で行い、
+        buffer_rows行ずつロックを取って追加するので、他のスレッドを待たせない。
+
+        Args:
+            rows: 辞書またはNamedTupleの行
+
+        Returns:
+            追加した行数
+        """
+        if self._closed:
+            raise ValueError(f"閉じた出力先には書き込めません: {self.path}")
+        count = 0
+        chunk = []
+        for row in rows:
+            chunk.append(self._normalize(row))
+            if len(chunk) >= self.buffer_rows:
+                self._append(chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            self._append(chunk)
+            count += len(chunk)
+        return count
+
+    def _append(self, chunk: List[tuple]):
+        """正規化済みの行をバッファに追加（たまったらファイルに書く）"""
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"閉じた出力先には書き込めません: {self.path}")
+            self._buffer.extend(chunk)
+            self.rows += len(chunk)
+            if len(self._buffer) >= self.buffer_rows:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self._buffer = []
+
+    def flush(self):
+        """ためている行をファイルに書く"""
+        with self._lock:
+            if not self._closed:
+                self._flush_locked()
+
+    def close(self):
+        """残りの行を書いてファイルを閉じる（何度呼んでもよい）"""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._close_file()
+            self._closed = True
+        logger.debug("エクスポート完了: %s (%s行)", self.path, self.rows)
+
+    @abc.abstractmethod
+    def _write_rows(self, rows: List[tuple]):
+        """正規化済みの行をファイルに書く（ロックを取った状態で呼ばれる）"""
+
+    @abc.abstractmethod
+    def _close_file(self):
+        """ファイルを閉じる（ロックを取った状態で1回だけ呼ばれる）"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JSONLSink(TableSink):
+    """1行1JSONで書き出す（キーは列の順）"""
+
+    format = 'jsonl'
+
+    def __init__(self, path: str, columns: Sequence[tuple],
+                 buffer_rows: int = DEFAULT_BUFFER_ROWS, append: bool = False):
+        super().__init__(path, columns, buffer_rows, append)
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def _write_rows(self, rows: List[tuple]):
+        names = self.names
+        self._file.write(''.join(
+            json.dumps(dict(zip(names, values)), ensure_ascii=False) + '\n' for values in rows
+        ))
+        self._file.flush()
+
+    def _close_file(self):
+        self._file.close()
+
+
+class CSVSink(TableSink):
+    """ヘッダー付きCSVで書き出す（Noneは空欄）"""
+
+    format = 'csv'
+
+    def __init__(self, path: str, columns: Sequence[tuple],
+                 buffer_rows: int = DEFAULT_BUFFER_ROWS, append: bool = False):
+        super().__init__(path, columns, buffer_rows, append)
+
+        existing = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if existing:
+            # 列が変わると後から読めなくなるので、ヘッダーが一致する場合だけ追記する
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                header = tuple(next(csv.reader(f), ()))
+            if header != self.names:
+                raise ValueError(f"既存のCSVと列が異なります: {path}")
+
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        if not existing:
+            self._writer.writerow(self.names)
+
+    def _write_rows(self, rows: List[tuple]):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close_file(self):
+        self._file.close()
+
+
+class ParquetSink(TableSink):
+    """列指向のParquetで書き出す（buffer_rows行ごとに1つの行グループ）"""
+
+    format = 'parquet'
+
+    def __init__(self, path: str, columns: Sequence[tuple],
+                 buffer_rows: int = DEFAULT_BUFFER_ROWS, append: bool = False):
+        if not HAS_PYARROW:
+            raise ValueError("Parquetで出力するには pyarrow をインストールしてください")
+        if append and os.path.exists(path):
+            raise ValueError(f"Parquetファイルには追記できません: {path}")
+        super().__init__(path, columns, buffer_rows, append)
+
+        types = {'string': pa.string(), 'int64': pa.int64()}
+        self._schema = pa.schema([(name, types[column_type]) for name, column_type in self.columns])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def _write_rows(self, rows: List[tuple]):
+        arrays = [
+            pa.array(values, type=field.type)
+            for values, field in zip(zip(*rows), self._schema)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _close_file(self):
+        self._writer.close()
+
+
+_SINKS = {'jsonl': JSONLSink, 'csv': CSVSink, 'parquet': ParquetSink}
+
+
+def open_sink(path: str, columns: Sequence[tuple], fmt: str = 'jsonl',
+              buffer_rows: int = DEFAULT_BUFFER_ROWS, append: bool = False) -> TableSink:
+    """
+    形式に合った出力先を開く
+
+    Args:
+        path: 出力ファイルのパス（拡張子が無ければ形式の拡張子を付ける）
+        columns: (列名, 型) のリスト
+        fmt: FORMATSのいずれか
+        buffer_rows: この行数たまったらファイルに書く
+        append: Trueの場合、既存のファイルの後ろに追記する
+
+    Returns:
+        TableSink
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"形式は {list(FORMATS)} のいずれか: {fmt}")
+    if not os.path.splitext(path)[1]:
+        path += FORMATS[fmt]
+    return _SINKS[fmt](path, columns, buffer_rows, append)
+
+
+# ============================================
+# 解析結果の書き出し
+# ============================================
+
+class AnalysisExporter:
+    """
+    解析結果を pages / structure / links / images の4つの表に分けて書き出す
+
+    ディレクトリ構成（形式がcsvの場合）:
+        pages.csv      … 1ページ1行のページ情報
+        structure.csv  … 1ページ1行の主要要素の個数
+        links.csv      … 1リンク1行
+        images.csv     … 1画像1行
+
+    どの表もsource列（URLまたはファイルパス）で結び付ける。
+    """
+
+    def __init__(self, directory: str, fmt: str = 'jsonl',
+                 structure_elements: Iterable[str] = (),
+                 buffer_rows: int = DEFAULT_BUFFER_ROWS, append: bool = False,
+                 tables: Iterable[str] = TABLES):
+        """
+        初期化
+
+        Args:
+            directory: 出力先ディレクトリ
+            fmt: FORMATSのいずれか
+            structure_elements: 構造の表に列として並べる要素名
+            buffer_rows: 表ごとに、この行数たまったらファイルに書く
+            append: Trueの場合、既存のファイルの後ろに追記する
+            tables: 書き出す表（TABLESの部分集合）
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.format = fmt
+
+        columns = {
+            'pages': PAGE_COLUMNS,
+            'structure': structure_columns(structure_elements),
+            'links': LINK_COLUMNS,
+            'images': IMAGE_COLUMNS,
+        }
+        self.sinks = {}
+        try:
+            for table in tables:
+                self.sinks[table] = open_sink(os.path.join(directory, table), columns[table],
+                                              fmt, buffer_rows, append)
+        except Exception:
+            self.close()  # 開けた分は閉じてから例外を伝える
+            raise
+
+        logger.info("エクスポート開始: %s (%s)", directory, fmt)
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        """表の名前 → 出力ファイルのパス"""
+        return {table: sink.path for table, sink in self.sinks.items()}
+
+    def write_page(self, source: str, page_info: Optional[Dict] = None,
+                   structure: Optional[Dict[str, int]] = None,
+                   links: Iterable = (), images: Iterable = (),
+                   extra: Optional[Dict] = None) -> Dict[str, int]:
+        """
+        1ページ分の解析結果を書き出す
+
+        links / imagesはイテレータでもよく、その場合は全件をメモリに持たずに書き出す。
+
+        Args:
+            source: URLまたはファイルパス
+            page_info: get_page_infoの結果
+            structure: analyze_structureの結果
+            links: リンク（辞書またはLinkRecord）
+            images: 画像（辞書またはImageRecord）
+            extra: ページの行に加える値（encodingなど）
+
+        Returns:
+            表ごとの書き出した行数
+        """
+        written = {}
+        sinks = self.sinks
+
+        if page_info is not None and 'pages' in sinks:
+            row = dict(page_info, source=source)
+            if extra:
+                row.update(extra)
+            written['pages'] = sinks['pages'].write_many((row,))
+        if structure is not None and 'structure' in sinks:
+            written['structure'] = sinks['structure'].write_many((dict(structure, source=source),))
+        if 'links' in sinks:
+            written['links'] = sinks['links'].write_many(_with_source(links, source))
+        if 'images' in sinks:
+            written['images'] = sinks['images'].write_many(_with_source(images, source))
+
+        return written
+
+    def flush(self):
+        """すべての表のためている行を書く"""
+        for sink in self.sinks.values():
+            sink.flush()
+
+    def close(self):
+        """すべての表を閉じる"""
+        for sink in self.sinks.values():
+            sink.close()
+        logger.info("エクスポート終了: %s", self.stats())
+
+    def stats(self) -> Dict[str, int]:
+        """表ごとの書き出した行数"""
+        return {table: sink.rows for table, sink in self.sinks.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _with_source(rows: Iterable, source: str) -> Iterable[Dict]:
+    """各行にsource列を加える（1行ずつ変換する）"""
+    for row in rows:
+        row = row._asdict() if hasattr(row, '_asdict') else dict(row)
+        row['source'] = source
+        yield row
@@ -3,30 +3,2043 @@
 # BeautifulSoup + requests でスクレイピング
 # ============================================
 
-import requests  # HTTP通信用
-from bs4 import BeautifulSoup  # HTML解析用
+from __future__ import annotations  # 型ヒントを実行時に評価しない（遅延インポートのため）
+
+import argparse  # バッチモードの引数解析用
 import logging  # ログ出力用
+from analysis_logging import VERBOSITY_MODES, configure_logging, echo, previews_enabled  # 出力モード切替用
+from lazy_import import LazyModule  # 重いライブラリの遅延インポート用
+import math  # パーセンタイル計算用
+import mmap  # 巨大ファイルのメモリマップ用
+import os  # ディレクトリ走査用
+import posixpath  # URLパスの拡張子判定用
+import re  # charsetの検出用
+import threading  # JSONL書き込みの排他制御用
+import codecs  # 分割された本文の逐次デコード用
+import itertools  # 整形HTMLの行の切り出し用
+from collections import deque  # 整形HTMLの末尾の行の保持用
+import importlib.util  # パーサーの有無を確認する用
+import time  # 処理時間の計測用
+import concurrent.futures  # 並列実行用（ProcessPoolExecutorは使う時に読み込まれる）
+from concurrent.futures import ThreadPoolExecutor, as_completed  # 並列実行用
+from collections import OrderedDict  # LRU管理用
 from datetime import datetime  # 日時取得用
-from typing import List, Dict, Optional  # 型ヒント用
-from urllib.parse import urljoin, urlparse  # URL処理用
-import json  # JSON出力用
-import csv  # CSV出力用
+from functools import lru_cache  # コンパイル済みセレクタのキャッシュ用
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterable, Iterator, List, Dict, NamedTuple, Optional  # 型ヒント用
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit  # URL処理用
+
+# 以下は最初に使う時まで読み込まない（importを速くするため）
+requests = LazyModule('requests')  # HTTP通信用
+urllib3 = LazyModule('urllib3')  # ストリーミング読み込みのタイムアウト判定用（requestsの依存パッケージ）
+bs4 = LazyModule('bs4')  # HTML解析用（BeautifulSoup）
+soupsieve = LazyModule('soupsieve')  # CSSセレクタのコンパイル用（bs4の依存パッケージ）
+asyncio = LazyModule('asyncio')  # 一括取得の並行実行用
+hashlib = LazyModule('hashlib')  # キャッシュキー生成用
+json = LazyModule('json')  # JSON出力用
+html_snapshot_store = LazyModule('html_snapshot_store')  # HTMLの圧縮保存用（--snapshot-dir指定時）
+html_warc = LazyModule('html_warc')  # WARCの書き込み・読み込み用（--warc-dir / --from-warc指定時）
+html_export = LazyModule('html_export')  # 解析結果の表形式での書き出し用（--export-dir指定時）
+
+if TYPE_CHECKING:  # 型チェッカー向け（実行時には読み込まない）
+    from concurrent.futures import ProcessPoolExecutor
+    from bs4 import BeautifulSoup
+    from html_snapshot_store import SnapshotStore
+    from html_warc import WARCWriter
+    from html_export import AnalysisExporter
+
+
+# ============================================
+# ログ設定
+# ============================================
+
+LOG_FILE = 'html_analysis.log'  # ログファイルのパス（main()でconfigure_loggingに渡す）
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# HTTPセッション（コネクションプール）
+# ============================================
+
+DEFAULT_POOL_SIZE = 10  # ホストごとに保持する接続数のデフォルト
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE,
+                   headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    keep-aliveで接続を再利用するSessionを作成
+    
+    同じホストへの2回目以降のリクエストではTCP/TLSハンドシェイクを省略できる。
+    接続プール（urllib3）はスレッドセーフなので、複数スレッドから共有してよい。
+    
+    Args:
+        pool_size: ホストごとに保持する最大接続数
+        headers: 全リクエストに付与するヘッダー
+        
+    Returns:
+        設定済みのrequests.Session
+    """
+    session = requests.Session()
+    
+    # pool_connections: プールを保持するホスト数、pool_maxsize: ホストごとの接続数
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    
+    if headers:
+        session.headers.update(headers)
+    
+    logger.debug("Session作成: pool_size=%s", pool_size)
+    
+    return session
+
+
+# ============================================
+# HTTPキャッシュ（ETag / Last-Modifiedで再検証）
+# ============================================
+
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024  # キャッシュ全体の上限（512MB）
+
+
+class HTTPCache:
+    """
+    本文と検証子（ETag / Last-Modified）をディスクに保存するHTTPキャッシュ
+    
+    2回目以降は条件付きリクエストを送り、304ならディスクの本文を使う。
+    合計サイズが上限を超えたら最も長く使われていないエントリから削除する。
+    1つのインスタンスを複数スレッド・複数のHTMLAnalyzerで共有してよい。
+    """
+    
+    def __init__(self, directory: str = '.html_cache', max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        """
+        初期化
+        
+        Args:
+            directory: キャッシュを保存するディレクトリ
+            max_bytes: 本文の合計サイズの上限（バイト）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # キー → 本文サイズ（古い順）
+        self._total_bytes = 0
+        
+        # 統計
+        self.hits = 0  # 304で本文をディスクから返した回数
+        self.misses = 0  # 本文をダウンロードした回数
+        self.bytes_saved = 0  # 304によって転送を省いたバイト数
+        
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+    
+    def _load_index(self):
+        """既存のエントリを最終利用時刻順に読み込む"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.body'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len('.body')], stat.st_size))
+        
+        for _mtime, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        
+        logger.debug("キャッシュ読み込み: %s件, %sバイト", len(self._entries), self._total_bytes)
+    
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+    
+    def lookup(self, url: str) -> Optional[Dict[str, str]]:
+        """
+        保存済みの検証子を取得
+        
+        Args:
+            url: 対象のURL
+            
+        Returns:
+            メタ情報の辞書（未保存ならNone）
+        """
+        key = self._key(url)
+        with self._lock:
+            if key not in self._entries:
+                return None
+        try:
+            with open(self._path(key, '.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    @staticmethod
+    def conditional_headers(meta: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """メタ情報から条件付きリクエストのヘッダーを作る"""
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+    
+    def load_body(self, url: str) -> Optional[bytes]:
+        """
+        304を受け取ったURLの本文をディスクから読み込む
+        
+        Args:
+            url: 対象のURL
+            
+        Returns:
+            本文のバイト列（消えていた場合はNone）
+        """
+        key = self._key(url)
+        try:
+            with open(self._path(key, '.body'), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)  # 最近使ったものとして末尾へ
+            self.hits += 1
+            self.bytes_saved += len(body)
+        
+        os.utime(self._path(key, '.body'))  # 再起動後もLRU順を保つ
+        
+        return body
+    
+    def store(self, url: str, response: requests.Response):
+        """
+        200のレスポンスを保存（検証子がない場合は保存しない）
+        
+        Args:
+            url: 対象のURL
+            response: 本文を読み込み済みのレスポンス
+        """
+        with self._lock:
+            self.misses += 1
+        
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        
+        key = self._key(url)
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'encoding': response.encoding,
+        }
+        
+        # 書き込み途中のファイルを読まないよう、一時ファイルから置き換える
+        suffix = f'.{threading.get_ident()}.tmp'
+        with open(self._path(key, '.body' + suffix), 'wb') as f:
+            f.write(body)
+        with open(self._path(key, '.json' + suffix), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        
+        with self._lock:
+            os.replace(self._path(key, '.body' + suffix), self._path(key, '.body'))
+            os.replace(self._path(key, '.json' + suffix), self._path(key, '.json'))
+            
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(body)
+            self._total_bytes += len(body)
+            self._evict()
+    
+    def _evict(self):
+        """上限を超えている間、最も古いエントリを削除（ロック取得済みで呼ぶ）"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            for suffix in ('.body', '.json'):
+                try:
+                    os.remove(self._path(key, suffix))
+                except OSError:
+                    pass
+            logger.debug("キャッシュ削除: %s (%sバイト)", key[:12], size)
+    
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・節約バイト数などの統計"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_saved': self.bytes_saved,
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+            }
+
+
+# ============================================
+# パーサー（BeautifulSoupのツリービルダー）
+# ============================================
+
+DEFAULT_PARSER = 'html.parser'  # 標準ライブラリのみで動くパーサー
+
+# パーサー名 → 必要なモジュール（Noneは標準ライブラリ）
+PARSER_BACKENDS = {
+    'html.parser': None,  # 純Python、追加インストール不要
+    'lxml': 'lxml',  # libxml2ベースのC実装、最速
+    'html5lib': 'html5lib',  # ブラウザと同じ仕様で解釈、最も正確だが低速
+}
+# selectolax（lexbor）は対象外: 解析処理はすべてBeautifulSoupの木を前提にしており、
+# lexborの木をBeautifulSoupへ移し替えると構築の手間でlxmlに対する速度の利点が残らないため
+
+
+def available_parsers() -> List[str]:
+    """インストール済みで使えるパーサー名の一覧"""
+    return [
+        name for name, module in PARSER_BACKENDS.items()
+        if module is None or importlib.util.find_spec(module) is not None
+    ]
+
+
+def _parse_signature(soup: BeautifulSoup) -> tuple:
+    """パーサー間で結果を比較するための要約（タイトル・全リンク・全画像、順序は問わない）"""
+    title = soup.title.get_text(strip=True) if soup.title else None
+    hrefs = tuple(sorted(a.get('href') for a in soup.find_all('a', href=True)))
+    srcs = tuple(sorted(img.get('src') for img in soup.find_all('img', src=True)))
+    return title, hrefs, srcs
+
+
+def calibrate_parser(sample_paths: List[str], repeat: int = 3) -> Dict[str, any]:
+    """
+    使えるパーサーを手元のページで計測し、正しい結果を返す中で最速のものを選ぶ
+    
+    html5lib（無ければhtml.parser）の結果を正解とし、
+    タイトル・リンク・画像が一致しないパーサーは候補から外す。
+    
+    Args:
+        sample_paths: サンプルHTMLファイルのパス
+        repeat: 各ファイルのパース回数（最小値を採用）
+        
+    Returns:
+        {'best': パーサー名, 'results': {パーサー名: {'seconds', 'correct', 'mismatches'}}}
+    """
+    parsers = available_parsers()
+    reference = 'html5lib' if 'html5lib' in parsers else DEFAULT_PARSER
+    
+    logger.info("パーサー計測開始: %s, サンプル%s件", parsers, len(sample_paths))
+    
+    samples = []
+    for path in sample_paths:
+        with open(path, 'rb') as f:
+            samples.append(f.read())
+    
+    expected = [_parse_signature(bs4.BeautifulSoup(html, reference)) for html in samples]
+    results = {}
+    
+    for name in parsers:
+        total = 0.0
+        mismatches = 0
+        
+        for html, signature in zip(samples, expected):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                soup = bs4.BeautifulSoup(html, name)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            total += best
+            
+            if _parse_signature(soup) != signature:
+                mismatches += 1
+        
+        results[name] = {'seconds': total, 'correct': mismatches == 0, 'mismatches': mismatches}
+        logger.info("パーサー計測: %s = %.3f秒, 不一致%s件", name, total, mismatches)
+    
+    correct = [name for name in parsers if results[name]['correct']]
+    best = min(correct, key=lambda name: results[name]['seconds']) if correct else reference
+    
+    return {'best': best, 'reference': reference, 'results': results}
+
+
+def print_calibration(calibration: Dict[str, any]):
+    """パーサー計測結果を表示"""
+    print("\n" + "=" * 70)
+    print("⏱ パーサー計測結果")
+    print("=" * 70)
+    print(f"{'パーサー':<14}{'合計(ms)':>12}{'不一致':>8}")
+    for name, r in calibration['results'].items():
+        print(f"{name:<14}{r['seconds'] * 1000:>12.1f}{r['mismatches']:>8}")
+    print(f"\n正解の基準: {calibration['reference']}")
+    print(f"推奨パーサー: {calibration['best']}")
+
+
+# ============================================
+# 逐次パース（ダウンロードと並行してツリーを構築）
+# ============================================
+
+STREAM_CHUNK_SIZE = 64 * 1024  # ストリーミング時に1回で読むバイト数
+SNIFF_BYTES = 4096  # <meta charset>を探す先頭のバイト数
+DETECT_WINDOW = 16 * 1024  # 最初の非ASCIIバイトから何バイトを見てエンコーディングを推定するか
+DETECT_SCAN_BYTES = 256 * 1024  # 非ASCIIバイトをまとめて探す単位（ASCIIだけの部分はどのコーデックでも同じ文字列）
+
+# BOM → エンコーディング名（長いものから判定する）
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+
+# Webで使われる名前 → Pythonのコーデック（Shift_JISは実際にはWindows-31Jの拡張文字を含む）
+_WEB_ENCODINGS = {
+    'shift_jis': 'cp932',
+    'x-sjis': 'cp932',
+    'x-euc-jp': 'euc_jp',
+}
+
+_HIGH_BYTE = re.compile(rb'[\x80-\xff]')
+_ISO2022JP_ESCAPE = re.compile(rb'\x1b(?:\$[@B]|\$\(D|\([BJI])')  # ISO-2022-JPの切り替えシーケンス
+
+
+def _normalize_encoding(name: Optional[str]) -> Optional[str]:
+    """エンコーディング名をPythonのコーデック名にそろえる（不明ならNone）"""
+    if not name:
+        return None
+    name = name.strip().strip('"\'').lower()
+    try:
+        codec = codecs.lookup(_WEB_ENCODINGS.get(name, name)).name
+    except LookupError:
+        return None
+    return _WEB_ENCODINGS.get(codec, codec)
+
+
+def _declared_encoding(declared: Optional[str]) -> Optional[str]:
+    """宣言されたエンコーディング名（ISO-8859-1はrequestsの既定値と区別できないので無視）"""
+    encoding = _normalize_encoding(declared)
+    return encoding if encoding != 'iso8859-1' else None
+
+
+def _sniff_meta_charset(head: bytes) -> Optional[str]:
+    """HTML先頭部分の<meta charset>からエンコーディング名を取り出す"""
+    match = _META_CHARSET.search(head)
+    if match:
+        return _normalize_encoding(match.group(1).decode('ascii'))
+    return None
+
+
+def _kana_ratio(text: str) -> float:
+    """非ASCII文字のうち、ひらがな・カタカナ・句読点が占める割合"""
+    non_ascii = 0
+    kana = 0
+    for char in text:
+        if char >= '\x80':
+            non_ascii += 1
+            if '\u3000' <= char <= '\u30ff':  # 句読点・ひらがな・カタカナ
+                kana += 1
+    return kana / non_ascii if non_ascii else 0.0
+
+
+def _first_high_byte(data: bytes) -> int:
+    """最初の非ASCIIバイトの位置（無ければ-1、正規表現より速いisasciiでブロック単位に調べる）"""
+    for offset in range(0, len(data), DETECT_SCAN_BYTES):
+        block = bytes(data[offset:offset + DETECT_SCAN_BYTES])
+        if not block.isascii():
+            return offset + _HIGH_BYTE.search(block).start()
+    return -1
+
+
+def _has_iso2022jp_escape(data: bytes) -> bool:
+    """ISO-2022-JPの切り替えシーケンスを含むか"""
+    position = data.find(b'\x1b')
+    while position != -1:
+        if _ISO2022JP_ESCAPE.match(data, position):
+            return True
+        position = data.find(b'\x1b', position + 1)
+    return False
+
+
+def _guess_japanese(data: bytes) -> Optional[str]:
+    """
+    最初の非ASCIIバイトから一定範囲だけを見て、UTF-8 / Shift_JIS / EUC-JP / ISO-2022-JPを推定
+    
+    先頭に大きなscriptやstyleがあっても見落とさないよう、非ASCIIバイトは全体から探す。
+    
+    Args:
+        data: 本文
+        
+    Returns:
+        コーデック名（全体がASCIIのみなら'ascii'、どれとも判定できなければNone）
+    """
+    position = _first_high_byte(data)
+    if position < 0:
+        # 8ビット目を使わないISO-2022-JPはエスケープシーケンスで見分ける
+        if _has_iso2022jp_escape(data):
+            return 'iso2022_jp'
+        return 'ascii'
+    
+    window = bytes(data[position:position + DETECT_WINDOW])
+    
+    # 末尾で文字が切れていてもよいように逐次デコーダーで厳密に試す
+    candidates = []
+    for encoding in ('utf-8', 'cp932', 'euc_jp'):
+        try:
+            text = codecs.getincrementaldecoder(encoding)(errors='strict').decode(window)
+        except UnicodeDecodeError:
+            continue
+        if encoding == 'utf-8':
+            return 'utf-8'  # 非ASCIIを含んで正しいUTF-8になるのはほぼUTF-8だけ
+        candidates.append((_kana_ratio(text), encoding))
+    
+    if not candidates:
+        return None
+    
+    # 正しいエンコーディングでは仮名が多く、誤った方は漢字や半角カナの羅列になる
+    ratio, encoding = max(candidates)
+    return encoding if ratio >= 0.05 else None
+
+
+class EncodingGuess(NamedTuple):
+    """detect_encodingの結果"""
+    encoding: str  # デコードに使うコーデック名
+    source: str  # 決め手（'bom', 'header', 'meta', 'detected', 'ascii', 'default'）
+    seconds: float  # 判定にかかった時間
+
+
+def detect_encoding(data: bytes, declared: Optional[str] = None) -> EncodingGuess:
+    """
+    本文のエンコーディングを段階的に判定（全文の統計的な判定は行わない）
+    
+    BOM → 宣言（HTTPヘッダーなど）→ 先頭SNIFF_BYTESの<meta charset> →
+    最初の非ASCIIバイトからDETECT_WINDOWバイトでの日本語向け判定 → UTF-8 の順。
+    
+    Args:
+        data: 本文（bytes・mmapなど、全体または先頭部分）
+        declared: Content-Typeのcharsetなどで宣言されたエンコーディング名
+        
+    Returns:
+        EncodingGuess（判定できなかった場合のsourceは'default'）
+    """
+    start = time.perf_counter()
+    head = bytes(data[:SNIFF_BYTES])
+    
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return EncodingGuess(encoding, 'bom', time.perf_counter() - start)
+    
+    declared = _declared_encoding(declared)
+    if declared:
+        return EncodingGuess(declared, 'header', time.perf_counter() - start)
+    
+    encoding = _sniff_meta_charset(head)
+    if encoding:
+        return EncodingGuess(encoding, 'meta', time.perf_counter() - start)
+    
+    return _guess_from_content(data, start)
+
+
+def _guess_from_content(data: bytes, start: float) -> EncodingGuess:
+    """detect_encodingの最後の段階（宣言が無い場合の日本語向けの判定）"""
+    encoding = _guess_japanese(data)
+    if encoding == 'ascii':
+        return EncodingGuess('utf-8', 'ascii', time.perf_counter() - start)  # ASCIIはUTF-8の部分集合
+    if encoding:
+        return EncodingGuess(encoding, 'detected', time.perf_counter() - start)
+    
+    return EncodingGuess('utf-8', 'default', time.perf_counter() - start)
+
+
+class IncrementalHTMLDecoder:
+    """
+    バイト列を少しずつ受け取り、エンコーディングを判定しながら文字列に変換する
+    
+    判定に必要な分（BOM・宣言があれば数バイト、無ければ<meta>の範囲と
+    最初の非ASCIIバイトからDETECT_WINDOWバイト）だけをためてから判定し、
+    以降はそのコーデックの逐次デコーダーにそのまま渡す。
+    非ASCIIバイトが現れるまでのASCIIだけの部分は、判定を待たずにDETECT_SCAN_BYTESごとに返す。
+    """
+    
+    def __init__(self, declared: Optional[str] = None, errors: str = 'replace'):
+        """
+        初期化
+        
+        Args:
+            declared: Content-Typeのcharsetなどで宣言されたエンコーディング名
+            errors: デコードエラーの扱い
+        """
+        self.declared = declared
+        self.errors = errors
+        self.guess = None  # 判定結果（EncodingGuess、判定前はNone）
+        self._buffer = bytearray()
+        self._decoder = None
+        self._passed_ascii = False  # 先頭のASCII部分を判定前に返したか（<meta>の確認は済んでいる）
+    
+    @property
+    def encoding(self) -> Optional[str]:
+        """判定したコーデック名（判定前はNone）"""
+        return self.guess.encoding if self.guess else None
+    
+    def _ready(self) -> bool:
+        """ためたバイト列で判定できるか"""
+        buffer = self._buffer
+        if not self._passed_ascii:
+            if len(buffer) < 4:
+                return False  # BOMの判定に最低4バイト必要
+            if any(buffer.startswith(bom) for bom, _encoding in _BOMS):
+                return True
+            if _declared_encoding(self.declared):
+                return True
+            if _sniff_meta_charset(bytes(buffer[:SNIFF_BYTES])):
+                return True
+            if len(buffer) < SNIFF_BYTES:
+                return False  # <meta>がまだ後ろにあるかもしれない
+        position = _first_high_byte(buffer)
+        if position >= 0:
+            return len(buffer) >= position + DETECT_WINDOW
+        return _has_iso2022jp_escape(buffer)
+    
+    def _pass_ascii(self) -> str:
+        """判定前でも、ASCIIだけのバイト列がたまったら文字列にして返す（どのコーデックでも結果は同じ）"""
+        buffer = self._buffer
+        if len(buffer) < DETECT_SCAN_BYTES or not buffer.isascii() or b'\x1b' in buffer:
+            return ''
+        self._passed_ascii = True
+        self._buffer = bytearray()
+        return buffer.decode('ascii')
+    
+    def decode(self, data: bytes, final: bool = False) -> str:
+        """
+        バイト列を追加して、デコードできた分の文字列を返す
+        
+        Args:
+            data: 追加のバイト列
+            final: 最後の呼び出しならTrue（ためている分をすべてデコードする）
+            
+        Returns:
+            文字列（判定前でためているだけの場合は''）
+        """
+        if self._decoder is not None:
+            return self._decoder.decode(data, final)
+        
+        self._buffer += data
+        if not final and not self._ready():
+            return self._pass_ascii()
+        
+        if self._passed_ascii:
+            # 残りは先頭ではないので、BOMや<meta>は見ずに本文から判定する
+            self.guess = _guess_from_content(self._buffer, time.perf_counter())
+        else:
+            self.guess = detect_encoding(self._buffer, self.declared)
+        self._decoder = codecs.getincrementaldecoder(self.guess.encoding)(errors=self.errors)
+        logger.debug("エンコーディング判定: %s (%s, %.2fms)",
+                     self.guess.encoding, self.guess.source, self.guess.seconds * 1000)
+        
+        buffered = bytes(self._buffer)
+        self._buffer = bytearray()
+        return self._decoder.decode(buffered, final)
+
+
+class IncrementalSoupBuilder:
+    """
+    文字列を少しずつ受け取りながらBeautifulSoupのツリーを組み立てる
+    
+    html.parserとlxmlは内部のパーサーに直接feedするので、
+    全文をメモリに持たずにパースがダウンロードと重なる。
+    html5libは逐次パースに対応していないため、close時にまとめてパースする。
+    """
+    
+    def __init__(self, parser: str = DEFAULT_PARSER):
+        """
+        初期化
+        
+        Args:
+            parser: 使用するパーサー名
+        """
+        self.parser = parser
+        self.soup = bs4.BeautifulSoup('', parser)
+        self._pending = []  # html5lib用にためておく文字列
+        
+        builder = self.soup.builder
+        self.soup.reset()
+        builder.initialize_soup(self.soup)
+        builder.reset()
+        
+        if parser == 'html.parser':
+            from bs4.builder._htmlparser import BeautifulSoupHTMLParser
+            args, kwargs = builder.parser_args
+            try:
+                self._feeder = BeautifulSoupHTMLParser(self.soup, *args, **kwargs)  # bs4 4.13以降
+            except TypeError:
+                self._feeder = BeautifulSoupHTMLParser(*args, **kwargs)  # bs4 4.12以前
+                self._feeder.soup = self.soup
+        elif parser == 'lxml':
+            self._feeder = builder.parser_for(None)  # lxml.etree.HTMLParser(target=builder)
+        else:
+            self._feeder = None
+    
+    def feed(self, text: str):
+        """デコード済みの文字列を追加でパース"""
+        if not text:
+            return
+        if self._feeder is None:
+            self._pending.append(text)
+        else:
+            self._feeder.feed(text)
+    
+    def close(self) -> BeautifulSoup:
+        """
+        パースを完了してsoupを返す
+        
+        Returns:
+            組み立てたBeautifulSoupオブジェクト
+        """
+        if self._feeder is None:
+            return bs4.BeautifulSoup(''.join(self._pending), self.parser)
+        
+        self._feeder.close()
+        
+        # BeautifulSoup._feedと同じく、閉じていないタグを閉じる
+        self.soup.endData()
+        while self.soup.currentTag is not None and self.soup.currentTag.name != self.soup.ROOT_TAG_NAME:
+            self.soup.popTag()
+        
+        return self.soup
+
+
+def _iter_body(response: requests.Response, chunk_size: int,
+               deadline: Optional[float] = None) -> Iterator[bytes]:
+    """
+    ストリーミング中のレスポンス本文を少しずつ返す
+    
+    iter_contentはchunk_sizeバイトそろうまで読み続けるため、少しずつ送ってくるサーバーでは
+    期限を過ぎても戻ってこない。期限がある場合は届いた分だけ返すread1で読み、
+    呼び出し側が1チャンクごとに期限を確認できるようにする。
+    1回の読み込みが止まった場合はリクエストの読み込みタイムアウトで抜ける。
+    
+    Args:
+        response: stream=Trueで取得したレスポンス
+        chunk_size: 1回に読み込む最大バイト数
+        deadline: time.perf_counter()での期限（Noneならiter_contentで読む）
+        
+    Yields:
+        本文のバイト列（圧縮は展開済み）
+        
+    Raises:
+        requests.exceptions.ReadTimeout: 読み込みタイムアウトまでに次のデータが届かなかった場合
+    """
+    raw = response.raw
+    if deadline is None or not hasattr(raw, 'read1'):
+        yield from response.iter_content(chunk_size=chunk_size)  # urllib3 1.xは各チャンクの間でだけ期限を確認
+        return
+    
+    while True:
+        try:
+            chunk = raw.read1(chunk_size, decode_content=True)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(e, response=response) from e
+        if not chunk:
+            return
+        yield chunk
+
+
+# ============================================
+# URLの解決・正規化
+# ============================================
+
+DEFAULT_PORTS = {'http': 80, 'https': 443, 'ftp': 21, 'ws': 80, 'wss': 443}  # 省略できるポート番号
+
+
+def canonicalize_url(url: str, sort_query: bool = False, strip_fragment: bool = True) -> str:
+    """
+    絶対URLを正規化（ホスト名の小文字化・既定ポートの削除・フラグメントの削除）
+    
+    mailto:などホストを持たないURLはフラグメントの削除のみ行う。
+    
+    Args:
+        url: 絶対URL
+        sort_query: Trueの場合、クエリパラメータを名前順に並べ替える
+        strip_fragment: Trueの場合、#以降を削除
+        
+    Returns:
+        正規化したURL
+    """
+    try:
+        scheme, netloc, path, query, fragment = urlsplit(url)
+    except ValueError:  # 壊れたIPv6表記など
+        return url
+    
+    scheme = scheme.lower()
+    if netloc:
+        userinfo, _, hostport = netloc.rpartition('@')
+        host, port = hostport, None
+        if hostport.startswith('['):  # IPv6: [::1]:8080
+            bracket = hostport.find(']')
+            if bracket != -1 and hostport[bracket + 1:bracket + 2] == ':':
+                host, port = hostport[:bracket + 1], hostport[bracket + 2:]
+        elif ':' in hostport:
+            host, port = hostport.rsplit(':', 1)
+        host = host.lower()
+        if port == '' or (port and port.isdigit() and int(port) == DEFAULT_PORTS.get(scheme)):
+            port = None
+        netloc = (userinfo + '@' if userinfo else '') + host + (':' + port if port else '')
+        if not path:
+            path = '/'
+    if sort_query and query:
+        # 値のエンコードは変えずに、パラメータの順番だけ揃える
+        query = '&'.join(sorted(query.split('&')))
+    if strip_fragment:
+        fragment = ''
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def _find_base_href(soup: BeautifulSoup) -> Optional[str]:
+    """文書中で最初の<base href>の値（無ければNone、<head>があればその中だけ探す）"""
+    scope = soup.head if soup.head is not None else soup
+    base = scope.find('base', href=True)
+    return base['href'].strip() if base is not None and base['href'].strip() else None
+
+
+class URLResolver:
+    """
+    1つの文書の相対URLを解決して正規化する
+    
+    <base href>を考慮した基準URLを作成時に1回だけ求め、
+    同じhrefの2回目以降は結果をキャッシュから返す（ナビゲーションの繰り返しリンク対策）。
+    """
+    
+    def __init__(self, base_url: Optional[str], sort_query: bool = False,
+                 strip_fragment: bool = True):
+        """
+        初期化
+        
+        Args:
+            base_url: 相対URLの基準となるURL（Noneなら相対URLはそのまま返す）
+            sort_query: Trueの場合、クエリパラメータを名前順に並べ替える
+            strip_fragment: Trueの場合、#以降を削除
+        """
+        self.base_url = base_url
+        self.sort_query = sort_query
+        self.strip_fragment = strip_fragment
+        self._cache = {}  # href → 解決・正規化済みURL
+    
+    @classmethod
+    def for_document(cls, soup: Optional[BeautifulSoup], url: Optional[str],
+                     **options) -> 'URLResolver':
+        """
+        文書の<base href>を考慮したリゾルバーを作成
+        
+        Args:
+            soup: BeautifulSoupオブジェクト（Noneなら<base>を探さない）
+            url: 文書のURL
+            options: sort_query, strip_fragment
+            
+        Returns:
+            URLResolver
+        """
+        base_url = url
+        base_href = _find_base_href(soup) if soup is not None else None
+        if base_href:
+            # <base href>自体が相対の場合は文書のURLから解決する
+            joined = urljoin(url, base_href) if url else base_href
+            if urlsplit(joined).scheme:
+                base_url = joined
+        return cls(base_url, **options)
+    
+    def resolve(self, href: str) -> str:
+        """
+        hrefを絶対URLに解決して正規化
+        
+        Args:
+            href: HTMLに書かれていたURL
+            
+        Returns:
+            正規化した絶対URL（基準URLが無く相対の場合はhrefのまま）
+        """
+        resolved = self._cache.get(href)
+        if resolved is None:
+            target = href.strip()
+            if self.base_url:
+                target = urljoin(self.base_url, target)  # 相対URLを絶対URLに変換
+            if urlsplit(target).scheme:
+                target = canonicalize_url(target, self.sort_query, self.strip_fragment)
+            resolved = self._cache[href] = target
+        return resolved
+    
+    def cache_size(self) -> int:
+        """キャッシュしているhrefの種類数"""
+        return len(self._cache)
+
+
+# ============================================
+# 抽出ヘルパー（self.soupに依存しない）
+# ============================================
+
+def _decode_response(response: requests.Response) -> tuple:
+    """
+    レスポンス本文を文字列に変換（文字化け対策込み）
+    
+    detect_encodingで判定できなかった場合だけ、全文を統計的に調べるapparent_encodingを使う。
+    
+    Returns:
+        (文字列, EncodingGuess)
+    """
+    content = response.content
+    guess = detect_encoding(content, response.encoding)
+    
+    if guess.source == 'default':
+        start = time.perf_counter()
+        encoding = _normalize_encoding(response.apparent_encoding) or 'utf-8'  # 全文から自動検出（遅い）
+        guess = EncodingGuess(encoding, 'apparent', guess.seconds + time.perf_counter() - start)
+    
+    response.encoding = guess.encoding  # response.textも同じ結果になるようにする
+    return codecs.decode(content, guess.encoding, errors='replace'), guess
+
+
+def _decode_body(body: bytes, content_type: Optional[str]) -> str:
+    """保存済みの本文を文字列に変換（BOM → Content-Typeのcharset → <meta charset> → 日本語向けの判定 → UTF-8）"""
+    match = re.search(r'charset\s*=\s*["\']?([\w.:-]+)', content_type or '', re.IGNORECASE)
+    guess = detect_encoding(body, match.group(1) if match else None)
+    return codecs.decode(body, guess.encoding, errors='replace')
+
+
+def _extract_page_info(soup: BeautifulSoup, url: Optional[str], html_length: int) -> Dict[str, any]:
+    """
+    パース済みのsoupからページ基本情報を取り出す
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        url: ページのURL
+        html_length: HTML文字列の長さ
+        
+    Returns:
+        get_page_infoと同じキーを持つ辞書
+    """
+    # タイトルを取得（NavigableStringはツリー全体を参照するのでstrに変換）
+    title = soup.title.string if soup.title else "(タイトルなし)"
+    title = str(title) if title is not None else None
+    
+    # descriptionメタタグ
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    description = meta_desc.get('content', '') if meta_desc else ""
+    
+    # keywordsメタタグ
+    meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+    keywords = meta_keywords.get('content', '') if meta_keywords else ""
+    
+    return {
+        'url': url,
+        'title': title,
+        'description': description,
+        'keywords': keywords,
+        'html_length': html_length
+    }
+
+
+# 構造分析でカウントする主要な要素
+STRUCTURE_ELEMENTS = [
+    'div', 'span', 'p', 'a', 'img', 'table', 'tr', 'td',
+    'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'form', 'input', 'button', 'select', 'textarea',
+    'nav', 'header', 'footer', 'section', 'article', 'aside'
+]
+
+
+def _summarize_tag_counts(tags: Dict[str, int], depths: Dict[int, int]) -> Dict[str, any]:
+    """
+    走査中に数えたタグ名ごと・深さごとの個数からタグ統計の辞書を作る
+    
+    Args:
+        tags: タグ名 → 個数
+        depths: 深さ → 要素数
+        
+    Returns:
+        tags（多い順）, total_elements, max_depth, avg_depth, depth_histogramを持つ辞書
+    """
+    total = sum(tags.values())
+    
+    return {
+        'tags': dict(sorted(tags.items(), key=lambda item: (-item[1], item[0]))),
+        'total_elements': total,
+        'max_depth': max(depths) if depths else 0,
+        'avg_depth': sum(d * n for d, n in depths.items()) / total if total else 0.0,
+        'depth_histogram': dict(sorted(depths.items())),
+    }
+
+
+def _tag_histogram(soup: BeautifulSoup) -> Dict[str, any]:
+    """
+    ツリーを1回だけ走査して、全タグの出現数と深さの統計を求める
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        
+    Returns:
+        tags（タグ名 → 個数、多い順）, total_elements, max_depth, avg_depth,
+        depth_histogram（深さ → 要素数）を持つ辞書
+    """
+    Tag = bs4.Tag
+    tags = {}
+    depths = {}
+    
+    # 再帰すると深いページでRecursionErrorになるので明示的なスタックで走査
+    stack = [(child, 1) for child in soup.contents if isinstance(child, Tag)]
+    while stack:
+        tag, depth = stack.pop()
+        tags[tag.name] = tags.get(tag.name, 0) + 1
+        depths[depth] = depths.get(depth, 0) + 1
+        stack.extend((child, depth + 1) for child in tag.contents if isinstance(child, Tag))
+    
+    return _summarize_tag_counts(tags, depths)
+
+
+def _structure_view(histogram: Dict[str, any]) -> Dict[str, int]:
+    """タグ統計から従来のanalyze_structure形式（主要要素の個数）を取り出す"""
+    tags = histogram['tags']
+    return {element: tags.get(element, 0) for element in STRUCTURE_ELEMENTS}
+
+
+def _count_structure(soup: BeautifulSoup) -> Dict[str, int]:
+    """主要な要素の出現数を数える"""
+    return _structure_view(_tag_histogram(soup))
+
+
+def _extract_links(soup: BeautifulSoup, base_url: Optional[str], limit: Optional[int] = 10,
+                   resolver: Optional[URLResolver] = None):
+    """
+    <a>タグのリンク情報を取り出す
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        base_url: 相対URLの基準となるURL
+        limit: 調べる<a>タグの最大数（Noneなら全件）
+        resolver: 使い回すURLResolver（Noneなら文書から作成）
+        
+    Returns:
+        (リンク情報のリスト, <a>タグの総数)
+    """
+    resolve = (resolver or URLResolver.for_document(soup, base_url)).resolve
+    links = soup.find_all('a')
+    link_data = []
+    
+    for link in links[:limit]:
+        href = link.get('href', '')
+        if href:
+            text = link.get_text(strip=True)
+            link_data.append({
+                'href': resolve(href),  # 相対URLを絶対URLに変換
+                'text': text if text else '(テキストなし)',
+                'original_href': href
+            })
+    
+    return link_data, len(links)
+
+
+def _extract_images(soup: BeautifulSoup, base_url: Optional[str], limit: Optional[int] = 10,
+                    resolver: Optional[URLResolver] = None):
+    """
+    <img>タグの画像情報を取り出す
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        base_url: 相対URLの基準となるURL
+        limit: 調べる<img>タグの最大数（Noneなら全件）
+        resolver: 使い回すURLResolver（Noneなら文書から作成）
+        
+    Returns:
+        (画像情報のリスト, <img>タグの総数)
+    """
+    resolve = (resolver or URLResolver.for_document(soup, base_url)).resolve
+    images = soup.find_all('img')
+    image_data = []
+    
+    for img in images[:limit]:
+        src = img.get('src', '')
+        if src:
+            alt = img.get('alt', '')
+            image_data.append({
+                'src': resolve(src),  # 相対URLを絶対URLに変換
+                'alt': alt if alt else '(altなし)',
+                'original_src': src
+            })
+    
+    return image_data, len(images)
+
+
+# ============================================
+# リンク・画像のストリーミング抽出
+# ============================================
+
+class LinkRecord(NamedTuple):
+    """iter_linksが返すリンク1件（辞書より軽いタプル）"""
+    href: str  # 絶対URL（基準URLが無い場合は書かれていたまま）
+    text: str  # リンクテキスト（空なら''）
+    original_href: str  # HTMLに書かれていた値
+
+
+class ImageRecord(NamedTuple):
+    """iter_imagesが返す画像1件（辞書より軽いタプル）"""
+    src: str  # 絶対URL（基準URLが無い場合は書かれていたまま）
+    alt: str  # 代替テキスト（空なら''）
+    original_src: str  # HTMLに書かれていた値
+
+
+def _url_filter(base_url: Optional[str], same_host: bool = False,
+                schemes: Optional[Iterable[str]] = None,
+                extensions: Optional[Iterable[str]] = None) -> Optional[Callable[[str], bool]]:
+    """
+    絞り込み条件を1つの判定関数にまとめる
+    
+    Args:
+        base_url: ページのURL（same_hostの比較に使用）
+        same_host: Trueの場合、ページと同じホストのURLだけ通す
+        schemes: 通すスキーム（例: ('http', 'https')）
+        extensions: 通すパスの拡張子（例: ('.pdf', 'zip')）
+        
+    Returns:
+        解決済みURLを受け取って通すかを返す関数（条件が無ければNone）
+    """
+    if not same_host and not schemes and not extensions:
+        return None
+    
+    base_host = urlparse(base_url).hostname if base_url else None
+    scheme_set = {scheme.lower().rstrip(':') for scheme in schemes} if schemes else None
+    extension_set = {
+        ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions
+    } if extensions else None
+    
+    def accept(url: str) -> bool:
+        parts = urlparse(url)
+        if scheme_set is not None and parts.scheme.lower() not in scheme_set:
+            return False
+        if same_host and parts.hostname != base_host:  # hostnameは小文字に正規化済み
+            return False
+        if extension_set is not None and posixpath.splitext(parts.path)[1].lower() not in extension_set:
+            return False
+        return True
+    
+    return accept
+
+
+def iter_links(soup: BeautifulSoup, base_url: Optional[str] = None, same_host: bool = False,
+               schemes: Optional[Iterable[str]] = None,
+               extensions: Optional[Iterable[str]] = None,
+               resolver: Optional[URLResolver] = None) -> Iterator[LinkRecord]:
+    """
+    文書中のすべてのリンクを文書順に1件ずつ返す（リストを作らない）
+    
+    絞り込みは走査中に行い、条件に合わないリンクはテキストも取り出さない。
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        base_url: 相対URLの基準となるURL
+        same_host: Trueの場合、base_urlと同じホストのリンクだけ返す
+        schemes: 返すスキーム（例: ('http', 'https')）
+        extensions: 返すパスの拡張子（例: ('.pdf',)）
+        resolver: 使い回すURLResolver（Noneなら文書から作成）
+        
+    Yields:
+        LinkRecord
+    """
+    accept = _url_filter(base_url, same_host, schemes, extensions)
+    resolve = (resolver or URLResolver.for_document(soup, base_url)).resolve
+    
+    for node in soup.descendants:
+        if node.name != 'a':  # 文字列ノードのnameはNone
+            continue
+        href = node.get('href', '')
+        if not href:
+            continue
+        resolved = resolve(href)  # 相対URLを絶対URLに変換
+        if accept is not None and not accept(resolved):
+            continue
+        yield LinkRecord(resolved, node.get_text(strip=True), href)
+
+
+def iter_images(soup: BeautifulSoup, base_url: Optional[str] = None, same_host: bool = False,
+                schemes: Optional[Iterable[str]] = None,
+                extensions: Optional[Iterable[str]] = None,
+                resolver: Optional[URLResolver] = None) -> Iterator[ImageRecord]:
+    """
+    文書中のすべての画像を文書順に1件ずつ返す（リストを作らない）
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        base_url: 相対URLの基準となるURL
+        same_host: Trueの場合、base_urlと同じホストの画像だけ返す
+        schemes: 返すスキーム（例: ('https',)）
+        extensions: 返すパスの拡張子（例: ('.png', '.jpg')）
+        resolver: 使い回すURLResolver（Noneなら文書から作成）
+        
+    Yields:
+        ImageRecord
+    """
+    accept = _url_filter(base_url, same_host, schemes, extensions)
+    resolve = (resolver or URLResolver.for_document(soup, base_url)).resolve
+    
+    for node in soup.descendants:
+        if node.name != 'img':
+            continue
+        src = node.get('src', '')
+        if not src:
+            continue
+        resolved = resolve(src)
+        if accept is not None and not accept(resolved):
+            continue
+        yield ImageRecord(resolved, node.get('alt', ''), src)
+
+
+def _analyze_all(soup: BeautifulSoup, url: Optional[str], html_length: int,
+                 resolver: Optional[URLResolver] = None) -> Dict[str, any]:
+    """
+    ツリーを1回だけ走査して、ページ情報・タグ統計・全リンク・全画像をまとめて取り出す
+    
+    get_page_info / analyze_structure / get_all_links / get_all_images を
+    順に呼ぶ場合と同じ内容を返す（ただしリンクと画像は先頭10個に限らず全件）。
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        url: ページのURL（相対URLの解決に使用）
+        html_length: HTML文字列の長さ
+        resolver: 使い回すURLResolver（Noneなら文書から作成）
+        
+    Returns:
+        page_info, histogram, structure, links, imagesを持つ辞書
+    """
+    Tag = bs4.Tag
+    resolve = (resolver or URLResolver.for_document(soup, url)).resolve
+    plain_strings = (bs4.NavigableString, bs4.CData)  # get_textが対象にする文字列の型
+    title_tag = None
+    description = None
+    keywords = None
+    links = []
+    images = []
+    link_texts = []  # linksと同じ順番で、リンク内の文字列を集める
+    tags = {}
+    depths = {}
+    
+    # (ノード, 深さ, 外側にある<a>の番号のタプル) を文書順に取り出すスタック
+    stack = [(child, 1, ()) for child in reversed(soup.contents)]
+    while stack:
+        node, depth, open_links = stack.pop()
+        
+        if not isinstance(node, Tag):
+            # get_text(strip=True)と同じく、通常の文字列だけを前後の空白を除いて連結
+            if open_links and type(node) in plain_strings:
+                text = node.strip()
+                for link_index in open_links:
+                    link_texts[link_index].append(text)
+            continue
+        
+        name = node.name
+        tags[name] = tags.get(name, 0) + 1
+        depths[depth] = depths.get(depth, 0) + 1
+        
+        if name == 'a':
+            href = node.get('href', '')
+            if href:
+                links.append({
+                    'href': resolve(href),  # 相対URLを絶対URLに変換
+                    'text': None,
+                    'original_href': href
+                })
+                link_texts.append([])
+                open_links = open_links + (len(links) - 1,)
+        elif name == 'img':
+            src = node.get('src', '')
+            if src:
+                alt = node.get('alt', '')
+                images.append({
+                    'src': resolve(src),
+                    'alt': alt if alt else '(altなし)',
+                    'original_src': src
+                })
+        elif name == 'title' and title_tag is None:
+            title_tag = node
+        elif name == 'meta':
+            meta_name = node.get('name')
+            if meta_name == 'description' and description is None:
+                description = node.get('content', '')
+            elif meta_name == 'keywords' and keywords is None:
+                keywords = node.get('content', '')
+        
+        stack.extend((child, depth + 1, open_links) for child in reversed(node.contents))
+    
+    for link, texts in zip(links, link_texts):
+        text = ''.join(texts)
+        link['text'] = text if text else '(テキストなし)'
+    
+    title = title_tag.string if title_tag is not None else "(タイトルなし)"
+    histogram = _summarize_tag_counts(tags, depths)  # _tag_histogramと同じ形式
+    
+    return {
+        'page_info': {
+            'url': url,
+            'title': str(title) if title is not None else None,
+            'description': description or "",
+            'keywords': keywords or "",
+            'html_length': html_length
+        },
+        'histogram': histogram,
+        'structure': _structure_view(histogram),
+        'links': links,
+        'images': images,
+    }
+
+
+def _build_element_index(soup: BeautifulSoup) -> Dict[str, Dict[str, any]]:
+    """
+    1回の走査でID・クラス・タグ名から要素を引ける索引を作る
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        
+    Returns:
+        {'id': {ID: 最初の要素}, 'class': {クラス名: [要素]}, 'tag': {タグ名: [要素]}}
+        （リストはすべて文書順）
+    """
+    ids = {}
+    classes = {}
+    tags = {}
+    
+    for element in soup.find_all(True):
+        tags.setdefault(element.name, []).append(element)
+        
+        element_id = element.get('id')
+        if element_id is not None and element_id not in ids:
+            ids[element_id] = element  # find(id=...)と同じく最初の要素
+        
+        class_names = element.get('class')
+        if class_names:
+            if isinstance(class_names, str):
+                class_names = class_names.split()
+            for class_name in dict.fromkeys(class_names):  # 同じクラスの重複指定は1回だけ
+                classes.setdefault(class_name, []).append(element)
+    
+    return {'id': ids, 'class': classes, 'tag': tags}
+
+
+# ============================================
+# テキストのストリーミング抽出
+# ============================================
+
+# 本文ではない定型部分（STRUCTURE_ELEMENTSのうちナビゲーション・ヘッダー・フッター・サイドバー）
+BOILERPLATE_ELEMENTS = frozenset({'nav', 'header', 'footer', 'aside'})
+
+# テキストブロックの区切りになる要素（この要素の開始・終了で前のブロックを確定する）
+BLOCK_ELEMENTS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'caption', 'dd', 'details',
+    'dialog', 'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p',
+    'pre', 'section', 'summary', 'table', 'td', 'th', 'title', 'tr', 'ul',
+})
+
+_BLOCK_END = object()  # スタック上でブロック要素の終わりを表す印
+
+
+def _text_block_stream(soup: BeautifulSoup, skip: frozenset) -> Iterator[str]:
+    """ブロック要素ごとに、空白を詰めた空でないテキストを文書順に返す"""
+    Tag = bs4.Tag
+    plain_strings = (bs4.NavigableString, bs4.CData)  # get_textと同じく通常の文字列だけ（script等は除く）
+    parts = []
+    
+    stack = list(reversed(soup.contents))
+    while stack:
+        node = stack.pop()
+        
+        if node is _BLOCK_END or (isinstance(node, Tag) and node.name in BLOCK_ELEMENTS):
+            # ブロックの境界: ここまでの文字列を1ブロックとして確定
+            if parts:
+                text = ' '.join(''.join(parts).split())
+                parts.clear()
+                if text:
+                    yield text
+            if node is _BLOCK_END:
+                continue
+        
+        if isinstance(node, Tag):
+            if node.name in skip:
+                continue  # 子孫ごと読み飛ばす
+            if node.name in BLOCK_ELEMENTS:
+                stack.append(_BLOCK_END)
+            stack.extend(reversed(node.contents))
+        elif type(node) in plain_strings:
+            parts.append(node)
+    
+    if parts:
+        text = ' '.join(''.join(parts).split())
+        if text:
+            yield text
+
+
+def iter_text_blocks(soup: BeautifulSoup, skip_boilerplate: bool = True,
+                     max_chars: Optional[int] = None) -> Iterator[str]:
+    """
+    本文のテキストを段落などのブロック単位で1つずつ返す（全文の文字列を作らない）
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        skip_boilerplate: Trueの場合、<head>とBOILERPLATE_ELEMENTS（nav, header, footer, aside）を読み飛ばす
+        max_chars: 返す文字数の合計の上限（超える分は最後のブロックを切り詰めて終了）
+        
+    Yields:
+        ブロックのテキスト（連続する空白は1つに詰める）
+    """
+    skip = BOILERPLATE_ELEMENTS | {'head'} if skip_boilerplate else frozenset()
+    remaining = max_chars
+    
+    for text in _text_block_stream(soup, skip):
+        if remaining is not None:
+            if len(text) >= remaining:
+                if remaining > 0:
+                    yield text[:remaining]
+                return  # 上限に達したら残りのツリーは走査しない
+            remaining -= len(text)
+        yield text
+
+
+# ============================================
+# 整形HTMLのストリーミング出力
+# ============================================
+
+PRETTY_OUTPUT_ENCODING = 'utf-8'  # prettify()と同じく<meta charset>はこの名前で出力する
+
+# 逐次出力がprettify()と一致するかを確かめる小さな文書（空白を保持する要素・空要素・コメントを含む）
+_PRETTY_SAMPLE = (
+    '<!DOCTYPE html><html><head><meta charset="cp932"><title>t &amp; 1</title></head>'
+    '<body><div id="a"><p>x<b>y</b> z<br>w</p><!-- c --><pre> a\n  <i>b</i>\n</pre>'
+    '<textarea>  t\n</textarea><img src="i.png"><script>if (a < b) {}</script></div></body></html>'
+)
+
+
+def _format_start_tag(tag, formatter) -> str:
+    """
+    開始タグの文字列を作る（prettify()と同じ属性の並び・エスケープ）
+    
+    bs4の公開API（Formatter.attributes, attribute_value, quoted_attribute_value）だけで組み立てる。
+    <meta charset>などの文字コード名はPRETTY_OUTPUT_ENCODINGに置き換える。
+    """
+    attrs = []
+    for key, value in formatter.attributes(tag):
+        if value is None:
+            attrs.append(key)
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(value)
+        elif isinstance(value, bs4.element.AttributeValueWithCharsetSubstitution):
+            # 4.13以降はsubstitute_encoding、それより前はencodeという名前
+            substitute = getattr(value, 'substitute_encoding', None) or value.encode
+            value = substitute(PRETTY_OUTPUT_ENCODING)
+        elif not isinstance(value, str):
+            value = str(value)
+        attrs.append(f"{key}={formatter.quoted_attribute_value(formatter.attribute_value(value))}")
+    
+    prefix = f"{tag.prefix}:" if tag.prefix else ''
+    attribute_string = ' ' + ' '.join(attrs) if attrs else ''
+    closing = (formatter.void_element_close_prefix or '') if tag.is_empty_element else ''
+    return f"<{prefix}{tag.name}{attribute_string}{closing}>"
+
+
+def _format_end_tag(tag) -> str:
+    """終了タグの文字列を作る"""
+    prefix = f"{tag.prefix}:" if tag.prefix else ''
+    return f"</{prefix}{tag.name}>"
+
+
+def _pretty_pieces(soup: BeautifulSoup, formatter) -> Iterator[str]:
+    """
+    prettify()と同じ規則で、整形した出力の断片を文書順に返す
+    
+    Tag.decodeの整形処理を、全体の文字列を組み立てない生成器にしたもの。
+    <pre>など空白を保持する要素（Tag.preserve_whitespace_tags）の中は整形せずそのまま出力する。
+    bs4の公開APIだけを使う。
+    """
+    Tag = bs4.Tag
+    indent = formatter.indent
+    level = 0
+    literal = None  # 中を整形しない要素（閉じるまで）
+    stack = []
+    
+    def render(element, opening: Optional[bool]) -> str:
+        # opening: True=開始タグ, False=終了タグ, None=文字列または空要素
+        nonlocal level, literal
+        
+        if not isinstance(element, Tag):
+            piece = element.output_ready(formatter)
+        elif element.hidden:
+            piece = ''  # 見えないルート（BeautifulSoup自身）はタグを出力しない
+        elif opening is False:
+            piece = _format_end_tag(element)
+            level -= 1
+        else:
+            piece = _format_start_tag(element, formatter)
+        
+        before = after = literal is None
+        if (opening is True and literal is None and element.preserve_whitespace_tags
+                and element.name in element.preserve_whitespace_tags):
+            before, after, literal = True, False, element  # ここから閉じるまで整形しない
+        elif opening is False and element is literal:
+            before, after, literal = False, True, None
+        
+        if (before or after) and piece:
+            if not isinstance(element, Tag):
+                piece = piece.strip()
+            if piece:
+                piece = (indent * level if before and level else '') + piece + ('\n' if after else '')
+        
+        if opening is True and not element.hidden:  # 見えないルート（BeautifulSoup自身）は段を増やさない
+            level += 1
+        return piece
+    
+    for node in itertools.chain((soup,), soup.descendants):
+        while stack and node.parent is not stack[-1]:
+            yield render(stack.pop(), False)
+        
+        if isinstance(node, Tag) and not node.is_empty_element:
+            yield render(node, True)
+            stack.append(node)
+        else:
+            yield render(node, None)
+    
+    while stack:
+        yield render(stack.pop(), False)
+
+
+@lru_cache(maxsize=None)
+def _streaming_pretty_supported(parser: str) -> bool:
+    """
+    このbs4で_pretty_piecesの出力がprettify()と一致するか（パーサーごとに1回だけ確かめる）
+    
+    将来のbs4でprettify()の整形規則が変わった場合はFalseを返し、
+    iter_pretty_linesはprettify()を行に分ける方法に切り替える。
+    """
+    sample = bs4.BeautifulSoup(_PRETTY_SAMPLE, parser)
+    formatter = sample.formatter_for_name('minimal')
+    try:
+        supported = ''.join(_pretty_pieces(sample, formatter)) == sample.prettify()
+    except Exception:  # 公開APIの引数が変わった場合など
+        supported = False
+    
+    if not supported:
+        logger.warning("このbs4 (%s) では整形HTMLを逐次出力できないため prettify() を使用します",
+                       bs4.__version__)
+    return supported
+
+
+def iter_pretty_lines(soup: BeautifulSoup, formatter: str = 'minimal') -> Iterator[str]:
+    """
+    soup.prettify()と同じ内容を1行ずつ返す（全体の文字列を作らない）
+    
+    逐次出力が使えないbs4では、prettify()の結果を行に分けて返す（メモリは節約できない）。
+    
+    Args:
+        soup: BeautifulSoupオブジェクト（Tagも可）
+        formatter: bs4のフォーマッタ名
+        
+    Yields:
+        整形後の1行（改行は含まない）
+    """
+    builder = getattr(soup, 'builder', None)
+    parser = builder.NAME if builder is not None else DEFAULT_PARSER
+    if not _streaming_pretty_supported(parser):
+        yield from soup.prettify(formatter=formatter).splitlines()
+        return
+    
+    if not isinstance(formatter, bs4.formatter.Formatter):
+        formatter = soup.formatter_for_name(formatter)
+    
+    line = []
+    for piece in _pretty_pieces(soup, formatter):
+        if '\n' not in piece:
+            line.append(piece)
+            continue
+        first, *middle, last = piece.split('\n')
+        line.append(first)
+        yield ''.join(line)
+        yield from middle
+        line = [last]
+    
+    if any(line):
+        yield ''.join(line)
+
+
+def count_pretty_lines(soup: BeautifulSoup) -> int:
+    """整形後の行数を数える（行を保持しない）"""
+    return sum(1 for _line in iter_pretty_lines(soup))
 
 
 # ============================================
-# ログ設定
+# 差分検出（同じURLの前回の版と比較）
 # ============================================
 
-logging.basicConfig(
-    level=logging.DEBUG,  # DEBUGレベル以上を出力
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('html_analysis.log', encoding='utf-8'),  # ファイルに保存
-        logging.StreamHandler()  # コンソールにも表示
-    ]
-)
+DEFAULT_FINGERPRINT_DEPTH = 8  # 部分木ハッシュを保存する深さ（これより深い部分は1つの領域として扱う）
+MIN_REGION_ELEMENTS = 8  # 要素数がこれ以下の部分木は分割せず1つの領域として扱う（指紋を小さく保つ）
 
-logger = logging.getLogger(__name__)
+
+class FingerprintNode(NamedTuple):
+    """前回の版の部分木1つ分の指紋（変化していない部分木は次の版でもそのまま共有する）"""
+    digest: bytes  # 部分木全体のハッシュ
+    own: bytes  # この要素自身（タグ名・属性・直下の文字列）のハッシュ（末端では空）
+    links: tuple  # この節点が受け持つリンク（末端は部分木内の全リンク、途中はこの要素自身のリンク）
+    children: Optional[Dict[str, FingerprintNode]]  # 子要素（キー → 指紋、末端ならNone）
+
+
+def _tag_header(tag) -> bytes:
+    """タグ名と属性（名前順）をハッシュ用のバイト列にする"""
+    parts = [tag.name]
+    for name, value in sorted(tag.attrs.items()):
+        parts.append(f"{name}={' '.join(value) if isinstance(value, list) else value}")
+    return '\x01'.join(parts).encode('utf-8', 'surrogatepass')
+
+
+def _subtree_digests(soup: BeautifulSoup) -> Dict[int, tuple]:
+    """
+    文書中のすべての要素について、部分木のハッシュ・要素自身のハッシュ・要素数を1回の走査で求める
+    
+    文字列は通常のテキストだけを前後の空白を除いて含める（コメントやscriptの中身は無視）。
+    
+    Returns:
+        id(要素) → (部分木のハッシュ, 要素自身のハッシュ, 部分木の要素数)
+    """
+    Tag = bs4.Tag
+    plain_strings = (bs4.NavigableString, bs4.CData)
+    blake2b = hashlib.blake2b
+    digests = {}
+    
+    tags = [soup]
+    tags.extend(node for node in soup.descendants if isinstance(node, Tag))
+    
+    for tag in reversed(tags):  # 文書順の逆なら子孫が必ず先に計算済み
+        header = _tag_header(tag)
+        subtree = blake2b(header, digest_size=8)
+        own = blake2b(header, digest_size=8)
+        size = 1
+        for child in tag.contents:
+            if isinstance(child, Tag):
+                child_digest, _child_own, child_size = digests[id(child)]
+                subtree.update(b'\x02')
+                subtree.update(child_digest)
+                size += child_size
+            elif type(child) in plain_strings:
+                text = child.strip()
+                if text:
+                    data = b'\x03' + text.encode('utf-8', 'surrogatepass')
+                    subtree.update(data)
+                    own.update(data)
+        digests[id(tag)] = (subtree.digest(), own.digest(), size)
+    
+    return digests
+
+
+def _own_strings(tag) -> List[str]:
+    """要素の直下にある文字列（子要素の中は含めない）"""
+    plain_strings = (bs4.NavigableString, bs4.CData)
+    return [text for text in (' '.join(child.split()) for child in tag.contents
+                              if type(child) in plain_strings) if text]
+
+
+def _child_elements(tag) -> List[tuple]:
+    """
+    子要素を (キー, 要素) で返す
+    
+    キーはid属性があれば 'div#main'、無ければ同名の兄弟の中での順番（'p', 'p[2]', ...）。
+    """
+    Tag = bs4.Tag
+    counts = {}
+    used = set()
+    result = []
+    
+    for child in tag.contents:
+        if not isinstance(child, Tag):
+            continue
+        element_id = child.get('id')
+        key = f"{child.name}#{element_id}" if element_id else None
+        if key is None or key in used:
+            count = counts[child.name] = counts.get(child.name, 0) + 1
+            key = child.name if count == 1 else f"{child.name}[{count}]"
+        used.add(key)
+        result.append((key, child))
+    
+    return result
+
+
+def _key_name(key: str) -> str:
+    """_child_elementsのキーからタグ名を取り出す"""
+    return key.split('#', 1)[0].split('[', 1)[0]
+
+
+def _match_children(children: List[tuple], old_children: Dict[str, FingerprintNode],
+                    digests: Dict[int, tuple]) -> tuple:
+    """
+    子要素を前回の版の子と対応づける（位置のずれで後ろの兄弟がすべて変化扱いにならないように）
+    
+    1. id属性によるキーが同じもの
+    2. 部分木のハッシュが同じもの（位置が変わっていても変化なし）
+    3. 残りは同じタグ名どうしを文書順に（内容が変わった要素）
+    
+    Args:
+        children: _child_elementsの結果
+        old_children: 前回の版の子要素（キー → 指紋、文書順）
+        digests: _subtree_digestsの結果
+        
+    Returns:
+        (各子要素に対応する前回のキー（無ければNone）のリスト, 対応しなかった前回のキーのリスト)
+    """
+    matched = [None] * len(children)
+    if not old_children:
+        return matched, []
+    remaining = dict(old_children)
+    
+    for index, (key, _child) in enumerate(children):
+        if '#' in key and key in remaining:
+            matched[index] = key
+            del remaining[key]
+    
+    by_digest = {}
+    for key, node in remaining.items():
+        by_digest.setdefault(node.digest, deque()).append(key)
+    for index, (_key, child) in enumerate(children):
+        if matched[index] is None:
+            keys = by_digest.get(digests[id(child)][0])
+            if keys:
+                matched[index] = keys.popleft()
+                del remaining[matched[index]]
+    
+    by_name = {}
+    for key in remaining:
+        by_name.setdefault(_key_name(key), deque()).append(key)
+    for index, (_key, child) in enumerate(children):
+        if matched[index] is None:
+            keys = by_name.get(child.name)
+            if keys:
+                matched[index] = keys.popleft()
+                del remaining[matched[index]]
+    
+    return matched, list(remaining)
+
+
+def _fingerprint_links(node: Optional[FingerprintNode]) -> List[str]:
+    """指紋の部分木が受け持つすべてのリンク"""
+    if node is None:
+        return []
+    links = list(node.links)
+    if node.children:
+        for child in node.children.values():
+            links.extend(_fingerprint_links(child))
+    return links
+
+
+def diff_document(soup: BeautifulSoup, previous: Optional[FingerprintNode],
+                  base_url: Optional[str] = None,
+                  max_depth: int = DEFAULT_FINGERPRINT_DEPTH,
+                  resolver: Optional[URLResolver] = None) -> Dict[str, any]:
+    """
+    文書を前回の版の指紋と比べ、変化した部分だけを取り出す
+    
+    ハッシュが一致した部分木は前回の指紋をそのまま使い、リンクやテキストを抽出し直さない。
+    previousがNoneの場合（初回）は指紋を作るだけで、変化した領域は報告しない。
+    
+    Args:
+        soup: BeautifulSoupオブジェクト
+        previous: 前回の版の指紋（diff_documentが返したfingerprint）
+        base_url: 相対URLの基準となるURL
+        max_depth: 部分木ごとのハッシュを保存する深さ
+        resolver: 使い回すURLResolver（Noneなら文書から作成）
+        
+    Returns:
+        fingerprint（次回に渡す指紋）, new（初回か）, changed（前回と違うか）,
+        regions（変化した領域: path, change, text）, links_added, links_removed,
+        reused（抽出を省略した部分木の数）を持つ辞書
+    """
+    resolve = (resolver or URLResolver.for_document(soup, base_url)).resolve
+    digests = _subtree_digests(soup)
+    regions = []
+    added = []
+    removed = []
+    reused = 0
+    
+    def own_links(tag) -> tuple:
+        href = tag.get('href') if tag.name == 'a' else None
+        return (resolve(href),) if href else ()
+    
+    def subtree_links(tag) -> tuple:
+        links = list(own_links(tag))
+        for node in tag.descendants:
+            if node.name == 'a':  # 文字列ノードのnameはNone
+                href = node.get('href')
+                if href:
+                    links.append(resolve(href))
+        return tuple(links)
+    
+    def report(path, change, text):
+        regions.append({'path': path or '/', 'change': change, 'text': text})
+    
+    def build(tag, old, depth, path, reporting) -> FingerprintNode:
+        nonlocal reused
+        digest, node_own, size = digests[id(tag)]
+        if old is not None and old.digest == digest:
+            reused += 1
+            return old  # 変化なし: 前回の指紋を共有して中は見ない
+        
+        children = _child_elements(tag) if depth < max_depth and size > MIN_REGION_ELEMENTS else []
+        
+        if not children:
+            # 末端の領域: 部分木の中身をまとめて扱う
+            node = FingerprintNode(digest, b'', subtree_links(tag), None)
+            if reporting:
+                report(path, 'added' if old is None else 'changed',
+                       list(iter_text_blocks(tag, skip_boilerplate=False)))
+                added.extend(node.links)
+                removed.extend(_fingerprint_links(old))
+            return node
+        
+        whole = reporting and (old is None or old.children is None)
+        node_links = own_links(tag)
+        
+        if whole:
+            # 新しく現れた部分木（または前回は末端だった部分木）は1つの領域として報告
+            report(path, 'added' if old is None else 'changed',
+                   list(iter_text_blocks(tag, skip_boilerplate=False)))
+            removed.extend(_fingerprint_links(old))
+        elif reporting and old.own != node_own:
+            # 要素自身（属性・直下の文字列）だけが変わった
+            report(path, 'changed', _own_strings(tag))
+            removed.extend(old.links)
+            added.extend(node_links)
+        
+        child_reporting = reporting and not whole
+        old_children = old.children if old is not None and old.children else {}
+        old_keys, unmatched = _match_children(children, old_children, digests)
+        node_children = {}
+        
+        for (key, child), old_key in zip(children, old_keys):
+            child_path = f"{path}/{key}"
+            old_child = old_children[old_key] if old_key is not None else None
+            node_children[key] = build(child, old_child, depth + 1, child_path, child_reporting)
+            if whole:
+                added.extend(_fingerprint_links(node_children[key]))
+        
+        if child_reporting:
+            for old_key in unmatched:
+                report(f"{path}/{old_key}", 'removed', [])
+                removed.extend(_fingerprint_links(old_children[old_key]))
+        
+        if whole:
+            added.extend(node_links)
+        
+        return FingerprintNode(digest, node_own, node_links, node_children)
+    
+    fingerprint = build(soup, previous, 0, '', previous is not None)
+    
+    # 領域をまたいで移動しただけのリンクは変化に含めない
+    added_set = set(added)
+    removed_set = set(removed)
+    
+    return {
+        'fingerprint': fingerprint,
+        'new': previous is None,
+        'changed': previous is None or previous.digest != fingerprint.digest,
+        'regions': regions,
+        'links_added': [link for link in dict.fromkeys(added) if link not in removed_set],
+        'links_removed': [link for link in dict.fromkeys(removed) if link not in added_set],
+        'reused': reused,
+    }
+
+
+FINGERPRINT_FORMAT_VERSION = 1  # 指紋ファイル（JSON）の形式の版
+
+
+def _plain_fingerprint(node: FingerprintNode) -> list:
+    """保存用に指紋をJSONにできる形に変換（ハッシュは16進文字列）"""
+    children = {key: _plain_fingerprint(child) for key, child in node.children.items()} \
+        if node.children is not None else None
+    return [node.digest.hex(), node.own.hex(), list(node.links), children]
+
+
+def _restore_fingerprint(plain) -> FingerprintNode:
+    """
+    _plain_fingerprintで変換した値を指紋に戻す（形式を確かめ、不正ならValueError）
+    
+    指紋ファイルは利用者が指定するパスにあるので、中身は信用せずにすべて検査する。
+    """
+    if not isinstance(plain, list) or len(plain) != 4:
+        raise ValueError("指紋の節点は4要素のリストである必要があります")
+    digest, own, links, children = plain
+    if not isinstance(digest, str) or not isinstance(own, str):
+        raise ValueError("指紋のハッシュは16進文字列である必要があります")
+    if not isinstance(links, list) or not all(isinstance(link, str) for link in links):
+        raise ValueError("指紋のリンクは文字列のリストである必要があります")
+    if children is not None:
+        if not isinstance(children, dict):
+            raise ValueError("指紋の子要素はオブジェクトである必要があります")
+        children = {key: _restore_fingerprint(child) for key, child in children.items()}
+    return FingerprintNode(bytes.fromhex(digest), bytes.fromhex(own), tuple(links), children)
+
+
+def load_fingerprints(path: str) -> Dict[str, FingerprintNode]:
+    """
+    保存した指紋を読み込む（ファイルが無ければ空）
+    
+    Args:
+        path: save_fingerprintsで保存したファイル
+        
+    Returns:
+        正規化したURL → 指紋
+        
+    Raises:
+        ValueError: JSONでない、または形式が違う場合
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        if not isinstance(stored, dict) or stored.get('version') != FINGERPRINT_FORMAT_VERSION \
+                or not isinstance(stored.get('pages'), dict):
+            raise ValueError(f"version {FINGERPRINT_FORMAT_VERSION} の指紋ファイルではありません")
+        return {url: _restore_fingerprint(plain) for url, plain in stored['pages'].items()}
+    except (UnicodeDecodeError, RecursionError, ValueError) as e:  # JSONDecodeErrorはValueErrorの一種
+        raise ValueError(f"指紋ファイルを読み込めません: {path}: {e}") from e
+
+
+def save_fingerprints(path: str, fingerprints: Dict[str, FingerprintNode]):
+    """
+    指紋をJSONでファイルに保存（一時ファイルに書いてから置き換える）
+    
+    Args:
+        path: 保存先
+        fingerprints: 正規化したURL → 指紋
+    """
+    pages = {url: _plain_fingerprint(node) for url, node in list(fingerprints.items())}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': FINGERPRINT_FORMAT_VERSION, 'pages': pages}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, path)
+    logger.info("指紋保存: %s件 → %s", len(pages), path)
+
+
+# ============================================
+# CSSセレクタのキャッシュ
+# ============================================
+
+SELECTOR_CACHE_SIZE = 256  # 保持するコンパイル済みセレクタの数
+
+
+@lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def _compile_selector_cached(selector: str, namespaces: tuple) -> soupsieve.SoupSieve:
+    """compile_selectorの本体（辞書はキャッシュのキーにできないので名前空間はタプルで受け取る）"""
+    return soupsieve.compile(selector, namespaces=dict(namespaces) if namespaces else None)
+
+
+def compile_selector(selector: str, namespaces: Optional[Dict[str, str]] = None) -> soupsieve.SoupSieve:
+    """
+    CSSセレクタをコンパイル（同じ文字列・名前空間は2回目以降キャッシュから返す）
+    
+    キャッシュはモジュール単位なので、すべての文書・HTMLAnalyzerで共有される。
+    
+    Args:
+        selector: CSSセレクタ
+        namespaces: 名前空間の接頭辞 → URI（soup.selectと同じ結果にするには soup._namespaces を渡す）
+        
+    Returns:
+        コンパイル済みのセレクタ（.select(soup)で検索できる）
+    """
+    return _compile_selector_cached(selector, tuple(sorted(namespaces.items())) if namespaces else ())
+
+
+def selector_cache_info() -> Dict[str, int]:
+    """セレクタキャッシュのヒット数・ミス数・件数"""
+    info = _compile_selector_cached.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}
+
+
+# ============================================
+# パース用プロセスプール（GILを回避）
+# ============================================
+
+EXTRACT_FIELDS = ('page_info', 'structure', 'links', 'images')  # parse_and_extractで取り出せる項目
+
+
+def _init_parse_worker(parser: str = DEFAULT_PARSER):
+    """ワーカープロセスの初期化（パーサーを一度動かして温めておく）"""
+    bs4.BeautifulSoup('<html><head><title></title></head><body></body></html>', parser)
+
+
+def parse_and_extract(html: str, url: Optional[str],
+                      fields: Iterable[str] = EXTRACT_FIELDS,
+                      parser: str = DEFAULT_PARSER,
+                      limit: Optional[int] = 10,
+                      records: bool = False) -> Dict[str, any]:
+    """
+    HTMLをパースして抽出結果だけを返す（プロセスプールで実行する関数）
+    
+    soupは親プロセスに返さず、pickleしやすい小さな辞書だけを返す。
+    
+    Args:
+        html: HTML文字列
+        url: ページのURL（相対URLの解決に使用）
+        fields: 取り出す項目（EXTRACT_FIELDSの部分集合）
+        parser: 使用するパーサー名
+        limit: 取り出すリンク・画像の最大数（Noneなら全件、recordsがTrueなら無視）
+        records: Trueならリンク・画像をiter_links/iter_imagesと同じ値の辞書で全件返す
+                 （テキストやaltが無い場合は''、エクスポート用）
+        
+    Returns:
+        項目名をキーとする抽出結果 + parse_time
+    """
+    start = time.perf_counter()
+    soup = bs4.BeautifulSoup(html, parser)
+    result = {}
+    
+    if 'page_info' in fields:
+        result['page_info'] = _extract_page_info(soup, url, len(html))
+    if 'structure' in fields:
+        result['structure'] = _count_structure(soup)
+    if records:
+        resolver = URLResolver.for_document(soup, url)
+        if 'links' in fields:
+            result['links'] = [link._asdict() for link in iter_links(soup, url, resolver=resolver)]
+        if 'images' in fields:
+            result['images'] = [image._asdict() for image in iter_images(soup, url, resolver=resolver)]
+    else:
+        if 'links' in fields:
+            result['links'] = _extract_links(soup, url, limit)[0]
+        if 'images' in fields:
+            result['images'] = _extract_images(soup, url, limit)[0]
+    
+    result['parse_time'] = time.perf_counter() - start
+    return result
+
+
+def create_parse_pool(processes: Optional[int] = None,
+                      parser: str = DEFAULT_PARSER) -> ProcessPoolExecutor:
+    """
+    パース専用のプロセスプールを作成し、全ワーカーを起動しておく
+    
+    Args:
+        processes: ワーカープロセス数（省略時はCPUコア数）
+        parser: ワーカーで温めておくパーサー名
+        
+    Returns:
+        起動済みのProcessPoolExecutor
+    """
+    processes = processes or os.cpu_count() or 1
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_parse_worker,
+                                                  initargs=(parser,))
+    
+    # 空のタスクを投げて全プロセスを先に立ち上げる（初回呼び出しの遅延を避ける）
+    for future in [pool.submit(parse_and_extract, '', None, ()) for _ in range(processes)]:
+        future.result()
+    
+    logger.info("パース用プロセスプール起動: %sプロセス", processes)
+    
+    return pool
 
 
 # ============================================
@@ -39,9 +2052,25 @@ class HTMLAnalyzer:
     requests + BeautifulSoup を使用
     """
     
-    def __init__(self):
-        """初期化"""
-        print("[DEBUG] HTMLAnalyzerを初期化")
+    def __init__(self, session: Optional[requests.Session] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE, parser: str = DEFAULT_PARSER,
+                 cache: Optional[HTTPCache] = None,
+                 snapshots: Optional[SnapshotStore] = None,
+                 warc: Optional[WARCWriter] = None,
+                 fingerprints: Optional[Dict[str, FingerprintNode]] = None):
+        """
+        初期化
+        
+        Args:
+            session: 共有するSession（省略時は専用のSessionを作成）
+            pool_size: 専用Sessionを作成する場合のホストごとの接続数
+            parser: BeautifulSoupのパーサー名（'html.parser', 'lxml', 'html5lib'）
+            cache: 条件付きリクエストに使うHTTPキャッシュ（省略時はキャッシュしない）
+            snapshots: save_htmlの保存先にするスナップショットストア（省略時はファイルに保存）
+            warc: 取得したレスポンスを書き込むWARCWriter（省略時は書き込まない）
+            fingerprints: 前回の版の指紋（URL → 指紋、共有する場合に渡す。省略時は専用の辞書）
+        """
+        echo("HTMLAnalyzerを初期化")
         logger.info("HTMLAnalyzer初期化")
         
         # リクエスト用のヘッダー設定（ボット検出を回避）
@@ -54,108 +2083,657 @@ class HTMLAnalyzer:
             'Connection': 'keep-alive',
         }
         
-        self.soup = None  # BeautifulSoupオブジェクトを保存
+        self._soup = None  # BeautifulSoupオブジェクト（soupプロパティ経由で設定）
+        self._index = None  # ID・クラス・タグの索引（初回検索時に作成）
+        self._resolver = None  # 文書のURLResolver（初回のURL解決時に作成）
+        self._resolver_url = None  # _resolverを作った時のURL
         self.url = None  # 現在のURL
-        self.html = None  # HTML文字列
+        self._html = None  # HTML文字列（htmlプロパティ経由で設定）
+        self._html_source = None  # 全文を保持せずに読み込んだファイルの(パス, エンコーディング)
+        self.html_length = 0  # HTML文字列の長さ（htmlを保持しない場合も記録）
+        self.truncated = False  # ストリーミング取得を上限で打ち切ったか
+        self.encoding = None  # 判定したエンコーディング
+        self.encoding_source = None  # 判定の決め手（'bom', 'header', 'meta', 'detected'など）
+        self.detect_time = 0.0  # エンコーディング判定にかかった秒数
+        
+        # 使用するパーサー（インストールされていなければ標準に戻す）
+        if parser not in available_parsers():
+            echo("⚠ パーサー '%s' は使えないため %s を使用", parser, DEFAULT_PARSER)
+            logger.warning("パーサー未対応: %s", parser)
+            parser = DEFAULT_PARSER
+        self.parser = parser
+        
+        # 接続を再利用するSession（渡された場合は共有、closeしない）
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(pool_size)
+        
+        # HTTPキャッシュ（Noneなら毎回ダウンロード）
+        self.cache = cache
+        
+        # スナップショットストア（Noneならsave_htmlは個別のファイルに保存）
+        self.snapshots = snapshots
+        
+        # WARCの書き込み先（Noneなら書き込まない）
+        self.warc = warc
+        
+        # URLごとの前回の版の指紋（detect_changesで比較・更新する）
+        self.fingerprints = fingerprints if fingerprints is not None else {}
+    
+    @property
+    def soup(self) -> Optional[BeautifulSoup]:
+        """現在の文書のBeautifulSoupオブジェクト"""
+        return self._soup
+    
+    @soup.setter
+    def soup(self, value: Optional[BeautifulSoup]):
+        # 文書が置き換わったら索引とURLResolverを捨てる（次に使う時に作り直す）
+        self._soup = value
+        self._index = None
+        self._resolver = None
+    
+    @property
+    def html(self) -> Optional[str]:
+        """
+        現在の文書のHTML文字列
+        
+        load_from_fileで全文を保持しなかった場合は、初めて参照された時に
+        ファイルを読み直してデコードする（以降は保持する）。
+        """
+        if self._html is None and self._html_source is not None:
+            filepath, encoding = self._html_source
+            try:
+                with open(filepath, 'rb') as f:
+                    self._html = codecs.decode(f.read(), encoding, errors='replace')
+            except OSError as e:
+                logger.warning("HTMLの読み直しに失敗: %s: %s", filepath, e)
+                return None
+            self._html_source = None
+        return self._html
+    
+    @html.setter
+    def html(self, value: Optional[str]):
+        self._html = value
+        self._html_source = None
+    
+    def _element_index(self) -> Dict[str, Dict[str, any]]:
+        """現在の文書の索引を取得（未作成なら1回だけ作る）"""
+        if self._index is None:
+            start = time.perf_counter()
+            self._index = _build_element_index(self._soup)
+            logger.debug("索引作成: %.3f秒", time.perf_counter() - start)
+        return self._index
+    
+    def _url_resolver(self) -> URLResolver:
+        """現在の文書のURLResolverを取得（<base href>の検索とhrefのキャッシュを使い回す）"""
+        if self._resolver is None or self._resolver_url != self.url:
+            self._resolver = URLResolver.for_document(self._soup, self.url)
+            self._resolver_url = self.url  # URLだけ変わった場合も作り直す
+        return self._resolver
+    
+    def _get(self, url: str, timeout: int) -> requests.Response:
+        """
+        GETリクエストを送信（キャッシュがあれば条件付きリクエストにする）
+        
+        304の場合はディスクの本文をレスポンスに詰めて返すので、
+        呼び出し側は通常の200と同じように扱える。
+        
+        Args:
+            url: 取得するURL
+            timeout: タイムアウト時間（秒）
+            
+        Returns:
+            本文を読み込み済みのレスポンス
+        """
+        if self.cache is None:
+            return self.session.get(url, headers=self.headers, timeout=timeout)
+        
+        meta = self.cache.lookup(url)
+        headers = dict(self.headers, **HTTPCache.conditional_headers(meta))
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        
+        if response.status_code == 304 and meta:
+            body = self.cache.load_body(url)
+            if body is not None:
+                logger.debug("キャッシュヒット(304): %s", url)
+                response._content = body  # ディスクの本文を使う
+                response.encoding = meta.get('encoding')
+                return response
+            # 本文が消えていた場合は条件なしで取り直す
+            response = self.session.get(url, headers=self.headers, timeout=timeout)
+        
+        if response.status_code == 200:
+            self.cache.store(url, response)
+        
+        return response
+    
+    def _archive(self, response: requests.Response):
+        """取得したレスポンスをWARCに書き込む（304はrevisitレコードにする）"""
+        if self.warc is None:
+            return
+        try:
+            if response.status_code == 304:
+                self.warc.write_revisit(response.url, response.status_code, response.reason,
+                                        response.headers.items())
+            else:
+                self.warc.write_response(response.url, response.status_code, response.reason,
+                                         response.headers.items(), response.content,
+                                         response.request.headers.items())
+        except Exception as e:
+            # 書き込みの失敗で取得自体は失敗させない
+            logger.error("WARC書き込みエラー: %s: %s", response.url, e, exc_info=True)
+    
+    def _set_encoding(self, guess: Optional[EncodingGuess]):
+        """エンコーディングの判定結果を記録"""
+        self.encoding = guess.encoding if guess else None
+        self.encoding_source = guess.source if guess else None
+        self.detect_time = guess.seconds if guess else 0.0
+    
+    def close(self):
+        """専用Sessionの接続プールを解放"""
+        if self._owns_session:
+            self.session.close()
+            logger.debug("Sessionクローズ")
     
-    def fetch_url(self, url: str, timeout: int = 10) -> bool:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def fetch_url(self, url: str, timeout: int = 10, parse: bool = True) -> bool:
         """
         URLからHTMLを取得
         
         Args:
             url: 取得するURL
             timeout: タイムアウト時間（秒）
+            parse: Falseの場合はHTMLの保存のみ行いパースしない（プロセスプールに任せる場合）
             
         Returns:
             成功時True、失敗時False
         """
-        print(f"\n[DEBUG] URLにアクセス: {url}")
-        logger.info(f"URL取得開始: {url}")
+        echo("\nURLにアクセス: %s", url)
+        logger.info("URL取得開始: %s", url)
         
         try:
-            # HTTPリクエストを送信
-            response = requests.get(url, headers=self.headers, timeout=timeout)
+            # HTTPリクエストを送信（Sessionの接続プールとキャッシュを利用）
+            response = self._get(url, timeout)
+            self._archive(response)
             
             # ステータスコードを確認
-            print(f"[DEBUG] ステータスコード: {response.status_code}")
-            logger.debug(f"ステータスコード: {response.status_code}")
+            echo("ステータスコード: %s", response.status_code)
+            logger.debug("ステータスコード: %s", response.status_code)
             
             # エラーチェック
             response.raise_for_status()  # 4xx, 5xxエラーの場合は例外を発生
             
-            # エンコーディングを設定（文字化け対策）
-            if response.encoding == 'ISO-8859-1':  # デフォルトエンコーディングの場合
-                response.encoding = response.apparent_encoding  # 自動検出
-            
-            # HTMLを保存
-            self.html = response.text
+            # HTMLを保存（エンコーディングの自動検出込み）
+            self.html, guess = _decode_response(response)
+            self._set_encoding(guess)
+            self.html_length = len(self.html)
+            self.truncated = False
             self.url = url
             
             # BeautifulSoupでパース
-            self.soup = BeautifulSoup(self.html, 'html.parser')
+            self.soup = bs4.BeautifulSoup(self.html, self.parser) if parse else None
+            
+            echo("✅ HTML取得成功")
+            echo("HTML長: %s 文字", format(len(self.html), ','))
+            echo("エンコーディング: %s (%s, 判定 %.2fms)",
+                 guess.encoding, guess.source, guess.seconds * 1000)
+            
+            logger.info("HTML取得成功: %s文字", len(self.html))
+            logger.debug("エンコーディング: %s (%s, %.2fms)", guess.encoding, guess.source, guess.seconds * 1000)
+            
+            return True
+            
+        except requests.exceptions.Timeout:
+            echo("❌ タイムアウト: %s秒以内に応答がありませんでした", timeout)
+            logger.error("タイムアウト: %s", url)
+            return False
+            
+        except requests.exceptions.HTTPError as e:
+            echo("❌ HTTPエラー: %s", e)
+            logger.error("HTTPエラー: %s", e)
+            return False
+            
+        except requests.exceptions.RequestException as e:
+            echo("❌ リクエストエラー: %s", e)
+            logger.error("リクエストエラー: %s", e, exc_info=True)
+            return False
+    
+    def fetch_url_stream(self, url: str, timeout: int = 10, max_bytes: Optional[int] = None,
+                         max_seconds: Optional[float] = None, keep_html: bool = True,
+                         chunk_size: int = STREAM_CHUNK_SIZE) -> bool:
+        """
+        URLから本文を少しずつ読み込み、届いた分から順にパースする
+        
+        巨大なページでもピークメモリを抑えられる。上限に達した場合は
+        そこまでの内容でパースを完了し、self.truncatedをTrueにする。
+        
+        本文を保持しないため、HTTPキャッシュ（self.cache）とWARC（self.warc）は使用しない
+        （条件付きリクエストもWARCへの記録も行われない）。記録が必要な場合はfetch_urlを使う。
+        
+        max_secondsを指定した場合は、読み込みタイムアウトをmax_secondsまでに縮め、
+        1チャンク届くごとに期限を確認する。データが止まった場合の超過は読み込みタイムアウト分まで。
+        
+        Args:
+            url: 取得するURL
+            timeout: 接続・読み込みのタイムアウト時間（秒）
+            max_bytes: 読み込む最大バイト数（Noneなら無制限）
+            max_seconds: 読み込みにかける最大秒数（Noneなら無制限、少しずつ届く場合も期限で打ち切る）
+            keep_html: Falseの場合はself.htmlに全文を保持しない（メモリ節約）
+            chunk_size: 1回に読み込む最大バイト数
+            
+        Returns:
+            成功時True、失敗時False
+        """
+        echo("\nURLにストリーミングでアクセス: %s", url)
+        logger.info("ストリーミング取得開始: %s", url)
+        
+        start = time.perf_counter()
+        deadline = start + max_seconds if max_seconds is not None else None
+        # 期限がある場合は、止まった読み込みが期限を大きく越えないよう読み込みタイムアウトを縮める
+        timeouts = (timeout, min(timeout, max_seconds)) if max_seconds is not None else timeout
+        
+        try:
+            response = self.session.get(url, headers=self.headers, timeout=timeouts, stream=True)
+            
+            try:
+                echo("ステータスコード: %s", response.status_code)
+                response.raise_for_status()
+                
+                builder = IncrementalSoupBuilder(self.parser)
+                decoder = IncrementalHTMLDecoder(response.encoding)  # 判定に必要な分だけためてから変換
+                parts = [] if keep_html else None
+                bytes_read = 0
+                length = 0
+                truncated = False
+                
+                try:
+                    for chunk in _iter_body(response, chunk_size, deadline):
+                        if max_bytes is not None and bytes_read + len(chunk) > max_bytes:
+                            chunk = chunk[:max_bytes - bytes_read]
+                            truncated = True
+                        bytes_read += len(chunk)
+                        
+                        text = decoder.decode(chunk)
+                        builder.feed(text)
+                        length += len(text)
+                        if parts is not None:
+                            parts.append(text)
+                        
+                        if deadline is not None and time.perf_counter() > deadline:
+                            truncated = True
+                        if truncated:
+                            break
+                except requests.exceptions.ReadTimeout:
+                    if deadline is None or time.perf_counter() < deadline:
+                        raise
+                    truncated = True  # 期限までに続きが届かなかった
+                
+                text = decoder.decode(b'', final=True)
+                builder.feed(text)
+                length += len(text)
+                if parts is not None:
+                    parts.append(text)
+                
+                self.soup = builder.close()
+                self._set_encoding(decoder.guess)
+                
+            finally:
+                response.close()  # 打ち切った場合も接続を解放
+            
+            self.html = ''.join(parts) if parts is not None else None
+            self.html_length = length
+            self.truncated = truncated
+            self.url = url
             
-            print(f"[DEBUG] ✅ HTML取得成功")
-            print(f"[DEBUG] HTML長: {len(self.html):,} 文字")
-            print(f"[DEBUG] エンコーディング: {response.encoding}")
+            echo("✅ HTML取得成功")
+            echo("受信: %s バイト / HTML長: %s 文字", format(bytes_read, ','), format(length, ','))
+            if truncated:
+                echo("⚠ 上限に達したため途中で打ち切りました")
             
-            logger.info(f"HTML取得成功: {len(self.html)}文字")
-            logger.debug(f"エンコーディング: {response.encoding}")
+            logger.info("ストリーミング取得成功: %sバイト, 打ち切り=%s", bytes_read, truncated)
             
             return True
             
         except requests.exceptions.Timeout:
-            print(f"[DEBUG] ❌ タイムアウト: {timeout}秒以内に応答がありませんでした")
-            logger.error(f"タイムアウト: {url}")
+            echo("❌ タイムアウト: %s秒以内に応答がありませんでした", timeout)
+            logger.error("タイムアウト: %s", url)
             return False
             
         except requests.exceptions.HTTPError as e:
-            print(f"[DEBUG] ❌ HTTPエラー: {e}")
-            logger.error(f"HTTPエラー: {e}")
+            echo("❌ HTTPエラー: %s", e)
+            logger.error("HTTPエラー: %s", e)
+            return False
+            
+        except requests.exceptions.RequestException as e:
+            echo("❌ リクエストエラー: %s", e)
+            logger.error("リクエストエラー: %s", e, exc_info=True)
+            return False
+    
+    def load_from_file(self, filepath: str, parse: bool = True,
+                       encoding: Optional[str] = None, keep_html: bool = False) -> bool:
+        """
+        ローカルのHTMLファイルを読み込む
+        
+        ファイルはメモリマップしてバイト列のまま扱い、少しずつデコードしながら
+        パースする。エンコーディングはIncrementalHTMLDecoderがデコードと同じ1回の走査の中で
+        判定するので、判定のためにファイル全体を先に読むことはない。
+        全文の文字列は作らないため、数GBのファイルでもメモリ使用量を抑えられる
+        （self.htmlは初めて参照された時にファイルから作る）。
+        
+        Args:
+            filepath: HTMLファイルのパス
+            parse: Falseの場合はHTMLの保存のみ行いパースしない（プロセスプールに任せる場合）
+            encoding: エンコーディングを明示する場合に指定
+            keep_html: Trueの場合は読み込み時にself.htmlへ全文を保持する（parse=Falseの場合は常に保持）
+            
+        Returns:
+            成功時True、失敗時False
+        """
+        echo("\nファイルを読み込み: %s", filepath)
+        logger.info("ファイル読み込み: %s", filepath)
+        
+        try:
+            with open(filepath, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                # 空ファイルはmmapできないので空のバイト列として扱う
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            
+            try:
+                # 明示されていなければ、判定に必要な分だけためてから変換するデコーダーを使う
+                if encoding:
+                    guess = EncodingGuess(encoding, 'argument', 0.0)
+                    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                else:
+                    guess = None
+                    decoder = IncrementalHTMLDecoder()
+                
+                keep = keep_html or not parse
+                parts = [] if keep else None
+                builder = IncrementalSoupBuilder(self.parser) if not keep else None
+                view = memoryview(data)
+                length = 0
+                
+                try:
+                    # マップしたバイト列を少しずつデコード（不正なバイトは置換して続行）
+                    for offset in range(0, size + 1, STREAM_CHUNK_SIZE):
+                        final = offset + STREAM_CHUNK_SIZE > size
+                        text = decoder.decode(view[offset:offset + STREAM_CHUNK_SIZE], final)
+                        length += len(text)
+                        if keep:
+                            parts.append(text)
+                        else:
+                            builder.feed(text)
+                finally:
+                    view.release()
+                
+                if guess is None:
+                    guess = decoder.guess
+                encoding = guess.encoding
+                self._set_encoding(guess)
+                echo("エンコーディング: %s (%s)", encoding, guess.source)
+                
+                if keep:
+                    self.html = ''.join(parts)
+                    # BeautifulSoupでパース
+                    self.soup = bs4.BeautifulSoup(self.html, self.parser) if parse else None
+                else:
+                    self.html = None
+                    self._html_source = (filepath, encoding)  # 参照された時に読み直す
+                    self.soup = builder.close()
+                self.html_length = length
+            finally:
+                if size:
+                    data.close()
+            
+            self.truncated = False
+            self.url = f"file://{filepath}"
+            
+            echo("✅ ファイル読み込み成功")
+            echo("ファイルサイズ: %s バイト / HTML長: %s 文字", format(size, ','), format(self.html_length, ','))
+            
+            logger.info("ファイル読み込み成功: %sバイト, %s文字 (%s)", size, self.html_length, encoding)
+            
+            return True
+            
+        except FileNotFoundError:
+            echo("❌ ファイルが見つかりません: %s", filepath)
+            logger.error("ファイル未発見: %s", filepath)
+            return False
+            
+        except Exception as e:
+            echo("❌ ファイル読み込みエラー: %s", e)
+            logger.error("ファイル読み込みエラー: %s", e, exc_info=True)
+            return False
+    
+    def load_snapshot(self, url: Optional[str] = None, digest: Optional[str] = None,
+                      before: Optional[float] = None, parse: bool = True) -> bool:
+        """
+        スナップショットストアに保存したHTMLを読み込む
+        
+        Args:
+            url: 取得元のURL（最新、またはbefore時点で最新のものを読み込む）
+            digest: 本文ハッシュ（指定時はurlより優先）
+            before: この時刻以前のスナップショットに限る（UNIX時間）
+            parse: Falseの場合はHTMLの保存のみ行いパースしない
+            
+        Returns:
+            成功時True、失敗時False
+        """
+        echo("\nスナップショットを読み込み: %s", digest or url)
+        logger.info("スナップショット読み込み: url=%s, digest=%s", url, digest)
+        
+        if self.snapshots is None:
+            echo("❌ スナップショットストアが設定されていません")
+            return False
+        
+        try:
+            if digest is None:
+                entry = self.snapshots.latest(url, before)
+                if entry is None:
+                    echo("❌ スナップショットが見つかりません: %s", url)
+                    logger.error("スナップショット未発見: %s", url)
+                    return False
+                digest = entry['digest']
+            
+            self.html = self.snapshots.get(digest)
+            self.html_length = len(self.html)
+            self.truncated = False
+            self.url = url
+            self.soup = bs4.BeautifulSoup(self.html, self.parser) if parse else None
+            
+            echo("✅ スナップショット読み込み成功: %s 文字", format(self.html_length, ','))
+            logger.info("スナップショット読み込み成功: %s (%s文字)", digest, self.html_length)
+            
+            return True
+            
+        except Exception as e:
+            echo("❌ スナップショット読み込みエラー: %s", e)
+            logger.error("スナップショット読み込みエラー: %s", e, exc_info=True)
             return False
+    
+    def iter_warc(self, path: str, parse: bool = True) -> Iterator[str]:
+        """
+        WARCファイル内のHTMLページを1件ずつ読み込む（先頭から1回だけ読む）
+        
+        各ページを読み込んだ状態でそのURLを返すので、ループ内で
+        get_page_info / analyze_all などをそのまま呼べる。
+        
+        Args:
+            path: WARCファイルのパス
+            parse: Falseの場合はHTMLの保存のみ行いパースしない
             
-        except requests.exceptions.RequestException as e:
-            print(f"[DEBUG] ❌ リクエストエラー: {e}")
-            logger.error(f"リクエストエラー: {e}", exc_info=True)
-            return False
+        Yields:
+            読み込んだページのURL
+        """
+        echo("\nWARCを読み込み: %s", path)
+        logger.info("WARC読み込み: %s", path)
+        
+        count = 0
+        for html, record in _iter_warc_html(path):
+            self.html = html
+            self.html_length = len(html)
+            self.truncated = False
+            self.url = record.url
+            self.soup = bs4.BeautifulSoup(html, self.parser) if parse else None
+            count += 1
+            yield record.url
+        
+        echo("✅ WARC読み込み完了: %s ページ", count)
+        logger.info("WARC読み込み完了: %sページ", count)
     
-    def load_from_file(self, filepath: str) -> bool:
+    def _fetch_page_info(self, url: str, timeout: int,
+                         parse_pool: Optional[ProcessPoolExecutor] = None) -> Dict[str, any]:
         """
-        ローカルのHTMLファイルを読み込む
+        1件のURLを取得してページ情報を返す（self.soupは変更しない）
         
         Args:
-            filepath: HTMLファイルのパス
+            url: 取得するURL
+            timeout: タイムアウト時間（秒）
+            parse_pool: create_parse_poolのプール（指定時はパースを別プロセスで実行）
             
         Returns:
-            成功時True、失敗時False
+            get_page_infoのキー + status/encoding/detect_time/fetch_time/parse_time/elapsed/error
+            （失敗しても同じキーを持ち、取れなかった値はNone）
         """
-        print(f"\n[DEBUG] ファイルを読み込み: {filepath}")
-        logger.info(f"ファイル読み込み: {filepath}")
+        start = time.perf_counter()
+        result = {
+            'url': url, 'title': None, 'description': None, 'keywords': None, 'html_length': None,
+            'status': None, 'encoding': None, 'detect_time': None,
+            'fetch_time': None, 'parse_time': None, 'error': None,
+        }
+        fetched = None
         
         try:
-            # ファイルを読み込む
-            with open(filepath, 'r', encoding='utf-8') as f:
-                self.html = f.read()
-            
-            # BeautifulSoupでパース
-            self.soup = BeautifulSoup(self.html, 'html.parser')
-            self.url = f"file://{filepath}"
+            response = self._get(url, timeout)
+            self._archive(response)
+            result['status'] = response.status_code
+            response.raise_for_status()
+            html, guess = _decode_response(response)
+            result['encoding'] = guess.encoding
+            result['detect_time'] = guess.seconds
+            fetched = time.perf_counter()
             
-            print(f"[DEBUG] ✅ ファイル読み込み成功")
-            print(f"[DEBUG] HTML長: {len(self.html):,} 文字")
+            if parse_pool is not None:
+                extracted = parse_pool.submit(
+                    parse_and_extract, html, url, ('page_info',), self.parser).result()
+                result.update(extracted['page_info'])
+            else:
+                soup = bs4.BeautifulSoup(html, self.parser)
+                result.update(_extract_page_info(soup, url, len(html)))
             
-            logger.info(f"ファイル読み込み成功: {len(self.html)}文字")
+            result['fetch_time'] = fetched - start
+            result['parse_time'] = time.perf_counter() - fetched
             
-            return True
+        except requests.exceptions.RequestException as e:
+            result['error'] = str(e)
+            logger.error("一括取得エラー: %s: %s", url, e)
+        except Exception as e:
+            # キャッシュの保存やパースの失敗でも、他のURLの取得は続ける
+            result['error'] = f"{type(e).__name__}: {e}"
+            logger.error("一括取得エラー: %s: %s", url, e, exc_info=True)
+        
+        if result['error'] is not None and fetched is not None:
+            result['fetch_time'] = fetched - start  # 取得までは済んでいた
+        result['elapsed'] = time.perf_counter() - start
+        return result
+    
+    async def afetch_many(self, urls: Iterable[str], concurrency: int = 20,
+                          per_host: int = 4, timeout: int = 10,
+                          parse_pool: Optional[ProcessPoolExecutor] = None) -> AsyncIterator[Dict[str, any]]:
+        """
+        複数URLを並行取得し、完了した順にページ情報をyieldする
+        
+        通信待ちを重ねるため、ブロッキングなSession呼び出しをスレッドで実行する。
+        concurrency個のワーカーがurlsから1件ずつ取り出して取得するので、
+        URLの一覧は先読みせず、巨大なジェネレーターでもタスクは同時にconcurrency個までしか作らない。
+        同一ホストへの同時リクエストはper_hostまでに制限する。
+        
+        Args:
+            urls: 取得するURLの一覧（ジェネレーター可）
+            concurrency: 全体の同時リクエスト数
+            per_host: 同一ホストへの同時リクエスト数（pool_size以下を推奨）
+            timeout: 1件あたりのタイムアウト時間（秒）
+            parse_pool: create_parse_poolのプール（指定時はパースを別プロセスで実行）
             
-        except FileNotFoundError:
-            print(f"[DEBUG] ❌ ファイルが見つかりません: {filepath}")
-            logger.error(f"ファイル未発見: {filepath}")
-            return False
+        Yields:
+            _fetch_page_infoの結果辞書
+        """
+        echo("\n一括取得開始 (全体%s並列, ホストごと%s並列)", concurrency, per_host)
+        logger.info("一括取得開始: 全体%s並列, ホストごと%s並列", concurrency, per_host)
+        
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        host_limits = {}
+        pending = iter(urls)  # 各ワーカーが共有して1件ずつ取り出す
+        results = asyncio.Queue(maxsize=concurrency)  # 受け取り側が遅ければワーカーも待つ
+        finished = object()  # ワーカーの終了を知らせる印
+        
+        async def worker():
+            try:
+                for url in pending:
+                    host = urlparse(url).netloc
+                    host_limit = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+                    async with host_limit:
+                        info = await loop.run_in_executor(
+                            executor, self._fetch_page_info, url, timeout, parse_pool)
+                    await results.put(info)
+            except Exception as e:
+                await results.put(e)  # 受け取り側で送出する
+            await results.put(finished)
+        
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        running = len(workers)
+        count = 0
+        
+        try:
+            while running:
+                item = await results.get()
+                if item is finished:
+                    running -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    count += 1
+                    yield item
+        finally:
+            # 途中で打ち切られた場合は残りをキャンセル
+            for task in workers:
+                task.cancel()
+            executor.shutdown(wait=False)
+            logger.info("一括取得終了: %s件", count)
+    
+    def fetch_many(self, urls: Iterable[str], concurrency: int = 20,
+                   per_host: int = 4, timeout: int = 10,
+                   parse_pool: Optional[ProcessPoolExecutor] = None) -> Iterator[Dict[str, any]]:
+        """
+        afetch_manyの同期版（イベントループを内部で回す）
+        
+        Args:
+            urls: 取得するURLの一覧
+            concurrency: 全体の同時リクエスト数
+            per_host: 同一ホストへの同時リクエスト数
+            timeout: 1件あたりのタイムアウト時間（秒）
+            parse_pool: create_parse_poolのプール（指定時はパースを別プロセスで実行）
             
-        except Exception as e:
-            print(f"[DEBUG] ❌ ファイル読み込みエラー: {e}")
-            logger.error(f"ファイル読み込みエラー: {e}", exc_info=True)
-            return False
+        Yields:
+            _fetch_page_infoの結果辞書
+        """
+        loop = asyncio.new_event_loop()
+        results = self.afetch_many(urls, concurrency, per_host, timeout, parse_pool)
+        
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.close()
     
     def get_page_info(self) -> Dict[str, any]:
         """
@@ -165,90 +2743,149 @@ class HTMLAnalyzer:
             ページ情報の辞書
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             logger.warning("HTML未読み込み")
             return {}
         
-        print("\n[DEBUG] ========== ページ基本情報 ==========")
+        echo("\n========== ページ基本情報 ==========")
         logger.info("ページ情報取得開始")
         
-        # タイトルを取得
-        title = self.soup.title.string if self.soup.title else "(タイトルなし)"
-        
-        # メタ情報を取得
-        description = ""
-        keywords = ""
-        
-        # descriptionメタタグ
-        meta_desc = self.soup.find('meta', attrs={'name': 'description'})
-        if meta_desc:
-            description = meta_desc.get('content', '')
-        
-        # keywordsメタタグ
-        meta_keywords = self.soup.find('meta', attrs={'name': 'keywords'})
-        if meta_keywords:
-            keywords = meta_keywords.get('content', '')
-        
-        info = {
-            'url': self.url,
-            'title': title,
-            'description': description,
-            'keywords': keywords,
-            'html_length': len(self.html)
-        }
+        info = _extract_page_info(self.soup, self.url, self.html_length)
+        title = info['title']
         
         # 情報を表示
-        print(f"[DEBUG] URL: {info['url']}")
-        print(f"[DEBUG] タイトル: {info['title']}")
-        print(f"[DEBUG] 説明: {info['description'][:100] if info['description'] else '(なし)'}...")
-        print(f"[DEBUG] キーワード: {info['keywords'][:100] if info['keywords'] else '(なし)'}...")
-        print(f"[DEBUG] HTML長: {info['html_length']:,} 文字")
+        echo("URL: %s", info['url'])
+        echo("タイトル: %s", info['title'])
+        echo("説明: %s...", info['description'][:100] if info['description'] else '(なし)')
+        echo("キーワード: %s...", info['keywords'][:100] if info['keywords'] else '(なし)')
+        echo("HTML長: %s 文字", format(info['html_length'], ','))
         
-        logger.info(f"ページ情報: {title}")
-        logger.debug(f"HTML長: {info['html_length']}")
+        logger.info("ページ情報: %s", title)
+        logger.debug("HTML長: %s", info['html_length'])
         
         return info
     
+    def get_tag_histogram(self) -> Dict[str, any]:
+        """
+        全タグの出現数と深さの統計を取得（ツリーの走査は1回だけ）
+        
+        Returns:
+            tags, total_elements, max_depth, avg_depth, depth_histogramを持つ辞書
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return {}
+        
+        echo("\n========== タグ統計 ==========")
+        logger.info("タグ統計開始")
+        
+        histogram = _tag_histogram(self.soup)
+        
+        echo("要素数: %s個 (%s種類)", format(histogram['total_elements'], ','), len(histogram['tags']))
+        echo("最大の深さ: %s / 平均の深さ: %.1f", histogram['max_depth'], histogram['avg_depth'])
+        for name, count in list(histogram['tags'].items())[:10]:  # 多い順に10種類
+            echo("  <%s>: %s個", name, count)
+        
+        logger.info("タグ統計完了: %s個, %s種類", histogram['total_elements'], len(histogram['tags']))
+        
+        return histogram
+    
     def analyze_structure(self) -> Dict[str, int]:
         """
-        HTML構造を分析（要素数をカウント）
+        HTML構造を分析（主要な要素の数をカウント）
+        
+        全タグの統計（get_tag_histogram）と同じ1回の走査から、
+        主要な要素の個数だけを取り出して返す。
         
         Returns:
             要素数の辞書
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return {}
         
-        print("\n[DEBUG] ========== HTML構造分析 ==========")
+        echo("\n========== HTML構造分析 ==========")
         logger.info("構造分析開始")
         
-        # 主要な要素をカウント
-        elements = [
-            'div', 'span', 'p', 'a', 'img', 'table', 'tr', 'td',
-            'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-            'form', 'input', 'button', 'select', 'textarea',
-            'nav', 'header', 'footer', 'section', 'article', 'aside'
-        ]
+        echo("要素数をカウント中...")
         
-        counts = {}
+        counts = _count_structure(self.soup)
         
-        print("[DEBUG] 要素数をカウント中...")
-        
-        for element in elements:
-            # 要素を検索してカウント
-            found = self.soup.find_all(element)
-            count = len(found)
-            counts[element] = count
-            
+        for element, count in counts.items():
             if count > 0:  # 存在する要素のみ表示
-                print(f"[DEBUG]   <{element}>: {count}個")
-                logger.debug(f"要素: <{element}> = {count}")
+                echo("  <%s>: %s個", element, count)
+                logger.debug("要素: <%s> = %s", element, count)
         
-        logger.info(f"構造分析完了: {len(counts)}種類の要素")
+        logger.info("構造分析完了: %s種類の要素", len(counts))
         
         return counts
     
+    def analyze_all(self) -> Dict[str, any]:
+        """
+        ページ情報・構造・全リンク・全画像を1回の走査でまとめて取得
+        
+        Returns:
+            page_info, histogram, structure, links, imagesを持つ辞書
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return {}
+        
+        echo("\n========== 一括解析 ==========")
+        logger.info("一括解析開始")
+        
+        result = _analyze_all(self.soup, self.url, self.html_length, self._url_resolver())
+        
+        echo("タイトル: %s", result['page_info']['title'])
+        echo("要素数: %s個 (%s種類)",
+             format(result['histogram']['total_elements'], ','), len(result['histogram']['tags']))
+        echo("リンク: %s個 / 画像: %s個",
+             format(len(result['links']), ','), format(len(result['images']), ','))
+        
+        logger.info("一括解析完了: リンク%s個, 画像%s個", len(result['links']), len(result['images']))
+        
+        return result
+    
+    def detect_changes(self, max_depth: int = DEFAULT_FINGERPRINT_DEPTH) -> Dict[str, any]:
+        """
+        同じURLの前回の版と比べて、変化した領域・リンクだけを取得（指紋は今回の版に更新）
+        
+        Args:
+            max_depth: 部分木ごとのハッシュを保存する深さ
+            
+        Returns:
+            diff_documentの結果（fingerprintを除く）
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return {}
+        
+        echo("\n========== 変化の検出 ==========")
+        logger.info("変化の検出開始: %s", self.url)
+        
+        key = canonicalize_url(self.url) if self.url else ''
+        start = time.perf_counter()
+        result = diff_document(self.soup, self.fingerprints.get(key), self.url, max_depth,
+                               self._url_resolver())
+        self.fingerprints[key] = result.pop('fingerprint')
+        elapsed = time.perf_counter() - start
+        
+        if result['new']:
+            echo("初回のため指紋のみ記録しました")
+        elif not result['changed']:
+            echo("✅ 前回から変化なし")
+        else:
+            echo("変化した領域: %s個 (変化なしで省略: %s個)", len(result['regions']), result['reused'])
+            for region in result['regions'][:10]:
+                preview = ' '.join(region['text'])[:50] if previews_enabled(logger) else ''
+                echo("  [%s] %s %s", region['change'], region['path'], preview)
+            echo("リンク: 追加 %s個 / 削除 %s個", len(result['links_added']), len(result['links_removed']))
+        
+        logger.info("変化の検出完了: changed=%s, 領域%s個, %.3f秒",
+                    result['changed'], len(result['regions']), elapsed)
+        
+        return result
+    
     def find_by_class(self, class_name: str) -> List:
         """
         クラス名で要素を検索
@@ -260,27 +2897,31 @@ class HTMLAnalyzer:
             見つかった要素のリスト
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return []
         
-        print(f"\n[DEBUG] クラス名で検索: '{class_name}'")
-        logger.info(f"クラス検索: {class_name}")
+        echo("\nクラス名で検索: '%s'", class_name)
+        logger.info("クラス検索: %s", class_name)
         
-        # クラス名で検索
-        elements = self.soup.find_all(class_=class_name)
+        # クラス名で検索（空白を含む指定はclass属性全体との一致なので索引を使わない）
+        if class_name.split() == [class_name]:
+            elements = list(self._element_index()['class'].get(class_name, []))
+        else:
+            elements = self.soup.find_all(class_=class_name)
         
-        print(f"[DEBUG] ✅ {len(elements)}個の要素が見つかりました")
-        logger.info(f"クラス検索結果: {len(elements)}個")
+        echo("✅ %s個の要素が見つかりました", len(elements))
+        logger.info("クラス検索結果: %s個", len(elements))
         
-        # 各要素の情報を表示
-        for i, element in enumerate(elements[:5], 1):  # 最初の5個
-            text = element.get_text(strip=True)[:50]
-            tag = element.name
-            print(f"[DEBUG]   [{i}] <{tag}> {text}...")
-            logger.debug(f"要素[{i}]: <{tag}> {text[:30]}")
+        # 各要素の情報を表示（表示もDEBUGログもない場合はテキスト抽出ごと省略）
+        if previews_enabled(logger):
+            for i, element in enumerate(elements[:5], 1):  # 最初の5個
+                text = element.get_text(strip=True)[:50]
+                tag = element.name
+                echo("  [%s] <%s> %s...", i, tag, text)
+                logger.debug("要素[%s]: <%s> %s", i, tag, text[:30])
         
         if len(elements) > 5:
-            print(f"[DEBUG]   ... 他 {len(elements) - 5}個")
+            echo("  ... 他 %s個", len(elements) - 5)
         
         return elements
     
@@ -295,25 +2936,24 @@ class HTMLAnalyzer:
             見つかった要素またはNone
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return None
         
-        print(f"\n[DEBUG] IDで検索: '{element_id}'")
-        logger.info(f"ID検索: {element_id}")
+        echo("\nIDで検索: '%s'", element_id)
+        logger.info("ID検索: %s", element_id)
         
-        # IDで検索
-        element = self.soup.find(id=element_id)
+        # IDで検索（索引から直接取り出す）
+        element = self._element_index()['id'].get(element_id)
         
         if element:
-            text = element.get_text(strip=True)[:100]
-            tag = element.name
-            print(f"[DEBUG] ✅ 要素が見つかりました")
-            print(f"[DEBUG]   タグ: <{tag}>")
-            print(f"[DEBUG]   テキスト: {text}...")
-            logger.info(f"ID検索成功: {element_id}")
+            echo("✅ 要素が見つかりました")
+            if previews_enabled(logger):
+                echo("  タグ: <%s>", element.name)
+                echo("  テキスト: %s...", element.get_text(strip=True)[:100])
+            logger.info("ID検索成功: %s", element_id)
         else:
-            print(f"[DEBUG] ❌ 要素が見つかりません")
-            logger.warning(f"ID検索失敗: {element_id}")
+            echo("❌ 要素が見つかりません")
+            logger.warning("ID検索失敗: %s", element_id)
         
         return element
     
@@ -328,17 +2968,17 @@ class HTMLAnalyzer:
             見つかった要素のリスト
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return []
         
-        print(f"\n[DEBUG] タグ名で検索: '<{tag_name}>'")
-        logger.info(f"タグ検索: {tag_name}")
+        echo("\nタグ名で検索: '<%s>'", tag_name)
+        logger.info("タグ検索: %s", tag_name)
         
-        # タグ名で検索
-        elements = self.soup.find_all(tag_name)
+        # タグ名で検索（索引から直接取り出す）
+        elements = list(self._element_index()['tag'].get(tag_name, []))
         
-        print(f"[DEBUG] ✅ {len(elements)}個の要素が見つかりました")
-        logger.info(f"タグ検索結果: {len(elements)}個")
+        echo("✅ %s個の要素が見つかりました", len(elements))
+        logger.info("タグ検索結果: %s個", len(elements))
         
         return elements
     
@@ -353,210 +2993,843 @@ class HTMLAnalyzer:
             見つかった要素のリスト
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return []
         
-        print(f"\n[DEBUG] CSSセレクタで検索: '{selector}'")
-        logger.info(f"CSS検索: {selector}")
+        echo("\nCSSセレクタで検索: '%s'", selector)
+        logger.info("CSS検索: %s", selector)
         
-        # CSSセレクタで検索
-        elements = self.soup.select(selector)
+        # CSSセレクタで検索（コンパイル結果を再利用、名前空間はsoup.selectと同じく文書のものを使う）
+        namespaces = getattr(self.soup, '_namespaces', None)
+        elements = compile_selector(selector, namespaces).select(self.soup)
         
-        print(f"[DEBUG] ✅ {len(elements)}個の要素が見つかりました")
-        logger.info(f"CSS検索結果: {len(elements)}個")
+        echo("✅ %s個の要素が見つかりました", len(elements))
+        logger.info("CSS検索結果: %s個", len(elements))
         
-        # 各要素の情報を表示
-        for i, element in enumerate(elements[:5], 1):
-            text = element.get_text(strip=True)[:50]
-            tag = element.name
-            print(f"[DEBUG]   [{i}] <{tag}> {text}...")
-            logger.debug(f"要素[{i}]: <{tag}> {text[:30]}")
+        # 各要素の情報を表示（表示もDEBUGログもない場合はテキスト抽出ごと省略）
+        if previews_enabled(logger):
+            for i, element in enumerate(elements[:5], 1):
+                text = element.get_text(strip=True)[:50]
+                tag = element.name
+                echo("  [%s] <%s> %s...", i, tag, text)
+                logger.debug("要素[%s]: <%s> %s", i, tag, text[:30])
         
         if len(elements) > 5:
-            print(f"[DEBUG]   ... 他 {len(elements) - 5}個")
+            echo("  ... 他 %s個", len(elements) - 5)
         
         return elements
     
-    def get_all_links(self) -> List[Dict[str, str]]:
+    def get_all_links(self, limit: Optional[int] = 10) -> List[Dict[str, str]]:
         """
         すべてのリンクを取得
         
+        Args:
+            limit: 取り出す<a>タグの最大数（Noneなら全件、全件を順に処理するならiter_links）
+        
         Returns:
             リンク情報のリスト
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return []
         
-        print("\n[DEBUG] ========== リンク一覧 ==========")
+        echo("\n========== リンク一覧 ==========")
         logger.info("リンク取得開始")
         
-        # すべての<a>タグを検索
-        links = self.soup.find_all('a')
+        # すべての<a>タグから最初のlimit個を取り出す
+        link_data, total = _extract_links(self.soup, self.url, limit, self._url_resolver())
         
-        link_data = []
+        echo("%s個のリンクが見つかりました", total)
+        logger.info("リンク数: %s", total)
         
-        print(f"[DEBUG] {len(links)}個のリンクが見つかりました")
-        logger.info(f"リンク数: {len(links)}")
-        
-        # 各リンクの情報を取得
-        for i, link in enumerate(links[:10], 1):  # 最初の10個
-            href = link.get('href', '')
-            text = link.get_text(strip=True)
-            
-            if href:
-                # 相対URLを絶対URLに変換
-                absolute_url = urljoin(self.url, href) if self.url else href
-                
-                link_info = {
-                    'href': absolute_url,
-                    'text': text if text else '(テキストなし)',
-                    'original_href': href
-                }
-                link_data.append(link_info)
-                
-                print(f"[DEBUG]   [{i}] {link_info['text'][:40]}")
-                print(f"[DEBUG]       → {absolute_url}")
-                logger.debug(f"リンク[{i}]: {text[:30]} -> {href}")
+        for i, link_info in enumerate(link_data, 1):
+            echo("  [%s] %s", i, link_info['text'][:40])
+            echo("      → %s", link_info['href'])
+            logger.debug("リンク[%s]: %s -> %s", i, link_info['text'][:30], link_info['original_href'])
         
-        if len(links) > 10:
-            print(f"[DEBUG]   ... 他 {len(links) - 10}個")
+        if limit is not None and total > limit:
+            echo("  ... 他 %s個", total - limit)
         
-        logger.info(f"リンク取得完了: {len(link_data)}個")
+        logger.info("リンク取得完了: %s個", len(link_data))
         
         return link_data
     
-    def get_all_images(self) -> List[Dict[str, str]]:
+    def get_all_images(self, limit: Optional[int] = 10) -> List[Dict[str, str]]:
         """
         すべての画像を取得
         
+        Args:
+            limit: 取り出す<img>タグの最大数（Noneなら全件、全件を順に処理するならiter_images）
+        
         Returns:
             画像情報のリスト
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return []
         
-        print("\n[DEBUG] ========== 画像一覧 ==========")
+        echo("\n========== 画像一覧 ==========")
         logger.info("画像取得開始")
         
-        # すべての<img>タグを検索
-        images = self.soup.find_all('img')
+        # すべての<img>タグから最初のlimit個を取り出す
+        image_data, total = _extract_images(self.soup, self.url, limit, self._url_resolver())
         
-        image_data = []
+        echo("%s個の画像が見つかりました", total)
+        logger.info("画像数: %s", total)
         
-        print(f"[DEBUG] {len(images)}個の画像が見つかりました")
-        logger.info(f"画像数: {len(images)}")
+        for i, img_info in enumerate(image_data, 1):
+            echo("  [%s] alt='%s'", i, img_info['alt'][:40])
+            echo("      src: %s...", img_info['src'][:60])
+            logger.debug("画像[%s]: alt=%s -> %s", i, img_info['alt'], img_info['original_src'][:50])
         
-        # 各画像の情報を取得
-        for i, img in enumerate(images[:10], 1):  # 最初の10個
-            src = img.get('src', '')
-            alt = img.get('alt', '')
+        if limit is not None and total > limit:
+            echo("  ... 他 %s個", total - limit)
+        
+        logger.info("画像取得完了: %s個", len(image_data))
+        
+        return image_data
+    
+    def iter_links(self, same_host: bool = False, schemes: Optional[Iterable[str]] = None,
+                   extensions: Optional[Iterable[str]] = None) -> Iterator[LinkRecord]:
+        """
+        すべてのリンクを1件ずつ取得（件数が多いページ向け、表示は行わない）
+        
+        Args:
+            same_host: Trueの場合、ページと同じホストのリンクだけ返す
+            schemes: 返すスキーム（例: ('http', 'https')）
+            extensions: 返すパスの拡張子（例: ('.pdf',)）
             
-            if src:
-                # 相対URLを絶対URLに変換
-                absolute_url = urljoin(self.url, src) if self.url else src
-                
-                img_info = {
-                    'src': absolute_url,
-                    'alt': alt if alt else '(altなし)',
-                    'original_src': src
-                }
-                image_data.append(img_info)
-                
-                print(f"[DEBUG]   [{i}] alt='{img_info['alt'][:40]}'")
-                print(f"[DEBUG]       src: {absolute_url[:60]}...")
-                logger.debug(f"画像[{i}]: alt={alt} -> {src[:50]}")
+        Yields:
+            LinkRecord（href, text, original_href）
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return
         
-        if len(images) > 10:
-            print(f"[DEBUG]   ... 他 {len(images) - 10}個")
+        logger.info("リンク走査開始: same_host=%s, schemes=%s, extensions=%s",
+                    same_host, schemes, extensions)
+        yield from iter_links(self.soup, self.url, same_host, schemes, extensions,
+                              self._url_resolver())
+    
+    def iter_images(self, same_host: bool = False, schemes: Optional[Iterable[str]] = None,
+                    extensions: Optional[Iterable[str]] = None) -> Iterator[ImageRecord]:
+        """
+        すべての画像を1件ずつ取得（件数が多いページ向け、表示は行わない）
         
-        logger.info(f"画像取得完了: {len(image_data)}個")
+        Args:
+            same_host: Trueの場合、ページと同じホストの画像だけ返す
+            schemes: 返すスキーム（例: ('https',)）
+            extensions: 返すパスの拡張子（例: ('.png', '.jpg')）
+            
+        Yields:
+            ImageRecord（src, alt, original_src）
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return
         
-        return image_data
+        logger.info("画像走査開始: same_host=%s, schemes=%s, extensions=%s",
+                    same_host, schemes, extensions)
+        yield from iter_images(self.soup, self.url, same_host, schemes, extensions,
+                               self._url_resolver())
     
-    def save_html(self, filename: Optional[str] = None):
+    def save_html(self, filename: Optional[str] = None) -> Optional[Dict[str, any]]:
         """
-        HTMLをファイルに保存
+        HTMLを保存
+        
+        ファイル名を省略し、スナップショットストアが設定されている場合は
+        ストアに圧縮して保存する（同じ内容のページは本文を1回だけ保存）。
         
         Args:
             filename: 保存するファイル名
+            
+        Returns:
+            ストアに保存した場合はSnapshotStore.putの結果、それ以外はNone
         """
         if not self.html:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
-            return
+            echo("❌ HTMLが読み込まれていません")
+            return None
+        
+        if not filename and self.snapshots is not None:
+            try:
+                stored = self.snapshots.put(self.html, self.url)
+            except Exception as e:
+                echo("❌ スナップショット保存エラー: %s", e)
+                logger.error("スナップショット保存エラー: %s", e, exc_info=True)
+                return None
+            echo("✅ スナップショット保存: %s (%s)", stored['digest'][:12],
+                 "新規" if stored['new'] else "保存済みの内容と同一")
+            logger.info("スナップショット保存: %s -> %s", self.url, stored['digest'])
+            return stored
         
         if not filename:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # 並列実行でも名前が衝突しないようにマイクロ秒まで含める
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
             filename = f'saved_html_{timestamp}.html'
         
-        print(f"\n[DEBUG] HTMLをファイルに保存: {filename}")
-        logger.info(f"HTML保存: {filename}")
+        echo("\nHTMLをファイルに保存: %s", filename)
+        logger.info("HTML保存: %s", filename)
         
         try:
             with open(filename, 'w', encoding='utf-8') as f:
                 f.write(self.html)
             
-            print(f"[DEBUG] ✅ 保存成功: {len(self.html):,} 文字")
-            logger.info(f"HTML保存完了: {len(self.html)}文字")
+            echo("✅ 保存成功: %s 文字", format(len(self.html), ','))
+            logger.info("HTML保存完了: %s文字", len(self.html))
             
         except Exception as e:
-            print(f"[DEBUG] ❌ 保存エラー: {e}")
-            logger.error(f"HTML保存エラー: {e}")
+            echo("❌ 保存エラー: %s", e)
+            logger.error("HTML保存エラー: %s", e)
+    
+    def iter_text_blocks(self, skip_boilerplate: bool = True,
+                         max_chars: Optional[int] = None) -> Iterator[str]:
+        """
+        本文のテキストをブロック単位で1つずつ取得（索引作成などに流す用、表示は行わない）
+        
+        Args:
+            skip_boilerplate: Trueの場合、<head>・nav・header・footer・asideを読み飛ばす
+            max_chars: 文字数の合計の上限（達したら走査を打ち切る）
+            
+        Yields:
+            ブロックのテキスト
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return
+        
+        logger.info("テキストブロック抽出開始: skip_boilerplate=%s, max_chars=%s",
+                    skip_boilerplate, max_chars)
+        yield from iter_text_blocks(self.soup, skip_boilerplate, max_chars)
     
-    def extract_text(self) -> str:
+    def extract_text(self, main_content: bool = False, max_chars: Optional[int] = None) -> str:
         """
         HTMLからテキストのみを抽出
         
+        Args:
+            main_content: Trueの場合、nav・header・footer・asideなどの定型部分を除く
+            max_chars: 文字数の上限（指定時は上限に達した時点で走査を打ち切る）
+        
         Returns:
             テキスト文字列
         """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return ""
         
-        print("\n[DEBUG] テキストを抽出中...")
+        echo("\nテキストを抽出中...")
         logger.info("テキスト抽出開始")
         
-        # テキストのみを取得
-        text = self.soup.get_text(separator='\n', strip=True)
+        if main_content or max_chars is not None:
+            # ブロック単位で必要な分だけ取り出す
+            text = '\n'.join(iter_text_blocks(self.soup, main_content, max_chars))
+        else:
+            # テキストのみを取得
+            text = self.soup.get_text(separator='\n', strip=True)
         
-        print(f"[DEBUG] ✅ テキスト抽出完了: {len(text):,} 文字")
-        logger.info(f"テキスト抽出完了: {len(text)}文字")
+        echo("✅ テキスト抽出完了: %s 文字", format(len(text), ','))
+        logger.info("テキスト抽出完了: %s文字", len(text))
         
         return text
     
-    def pretty_print(self):
-        """HTMLを整形して表示"""
+    def iter_pretty_lines(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """
+        整形したHTMLを1行ずつ取得（表示は行わない、stopに達したら整形を打ち切る）
+        
+        Args:
+            start: 最初の行番号（0始まり）
+            stop: 終わりの行番号（この行は含まない、Noneなら最後まで）
+            
+        Yields:
+            整形後の1行
+        """
         if not self.soup:
-            print("[DEBUG] ❌ HTMLが読み込まれていません")
+            echo("❌ HTMLが読み込まれていません")
             return
+        yield from itertools.islice(iter_pretty_lines(self.soup), start, stop)
+    
+    def pretty_print(self, head: int = 50, tail: int = 0,
+                     start: Optional[int] = None, stop: Optional[int] = None) -> int:
+        """
+        HTMLを整形して表示（1行ずつ整形し、表示しない行は保持しない）
+        
+        Args:
+            head: 先頭から表示する行数
+            tail: 末尾から表示する行数
+            start: 指定時はhead/tailの代わりにこの行番号から表示（0始まり）
+            stop: startと併用、この行番号の手前まで表示（Noneなら最後まで）
+            
+        Returns:
+            整形後の総行数（表示できなかった場合は0）
+        """
+        if not self.soup:
+            echo("❌ HTMLが読み込まれていません")
+            return 0
+        
+        echo("\n========== 整形HTML ==========")
+        
+        ranged = start is not None
+        if ranged:
+            tail = 0
+        else:
+            start, stop = 0, head
+        
+        last_lines = deque(maxlen=tail) if tail > 0 else None
+        total = 0
+        shown = 0
+        
+        for number, line in enumerate(iter_pretty_lines(self.soup)):
+            total += 1
+            if start <= number and (stop is None or number < stop):
+                print(line)
+                shown += 1
+            elif last_lines is not None:
+                last_lines.append(line)  # 表示済みの行は末尾の表示に含めない
+        
+        skipped = total - shown - (len(last_lines) if last_lines else 0)
+        if ranged:
+            print(f"\n({start}行目から{shown}行を表示 / 全{total}行)")
+        elif skipped > 0:
+            print(f"\n... 他 {skipped}行")
+        if last_lines:
+            print('\n'.join(last_lines))
+        
+        logger.info("整形表示: 全%s行中%s行", total, shown + (len(last_lines) if last_lines else 0))
+        
+        return total
+
+
+# ============================================
+# 解析結果のエクスポート
+# ============================================
+
+RECORD_ITEM_LIMIT = 10  # エクスポート時もJSONLのレコードに残すリンク・画像の数
+EXPORT_FORMATS = ('jsonl', 'csv', 'parquet')  # html_export.FORMATSのキー（起動時にhtml_exportを読み込まないよう固定で持つ）
+
+
+def create_exporter(directory: str, fmt: str = 'jsonl', append: bool = False) -> AnalysisExporter:
+    """構造の列をSTRUCTURE_ELEMENTSにそろえたAnalysisExporterを作成"""
+    return html_export.AnalysisExporter(directory, fmt, STRUCTURE_ELEMENTS, append=append)
+
+
+def _export_extracted(exporter: AnalysisExporter, source: str, result: Dict[str, any],
+                      extra: Optional[Dict[str, any]] = None):
+    """
+    全件で抽出した結果を書き出し、レコードに残すリンク・画像は先頭だけにする
+    
+    Args:
+        exporter: 書き出し先
+        source: URLまたはファイルパス
+        result: parse_and_extract(records=True)の結果（links / imagesを書き換える）
+        extra: ページの行に加える値
+    """
+    exporter.write_page(source, result.get('page_info'), result.get('structure'),
+                        result.get('links', ()), result.get('images', ()), extra)
+    for key in ('links', 'images'):
+        if key in result:
+            result[key] = result[key][:RECORD_ITEM_LIMIT]
+
+
+def _keep_first(records: Iterable[tuple], kept: List[Dict[str, str]],
+                limit: int = RECORD_ITEM_LIMIT) -> Iterator[tuple]:
+    """
+    iter_links / iter_imagesの結果をそのまま流しつつ、先頭limit件を辞書にしてkeptに残す
+    
+    書き出しとJSONLのレコードを1回の走査でまかなうために使う。
+    """
+    for record in records:
+        if len(kept) < limit:
+            kept.append(record._asdict())
+        yield record
+
+
+# ============================================
+# WARCからの再解析
+# ============================================
+
+def _iter_warc_html(path: str) -> Iterator[tuple]:
+    """WARC内のHTMLのresponse/resourceレコードを (HTML文字列, WARCRecord) で返す"""
+    for record in html_warc.iter_records(path, types=('response', 'resource')):
+        if record.type == 'response':
+            if record.status is None or not 200 <= record.status < 300:
+                continue
+            content_type = record.http_headers.get('content-type', '')
+        else:
+            content_type = record.headers.get('Content-Type', '')
+        if content_type and 'html' not in content_type.lower():
+            continue  # 画像・CSSなど
+        yield _decode_body(record.payload, content_type), record
+
+
+def analyze_warc(path: str, fields: Iterable[str] = EXTRACT_FIELDS,
+                 parser: str = DEFAULT_PARSER,
+                 limit: Optional[int] = 10,
+                 records: bool = False) -> Iterator[Dict[str, any]]:
+    """
+    WARCファイル内のHTMLページを先頭から1回読みながら解析する
+    
+    Args:
+        path: WARCファイルのパス
+        fields: 取り出す項目（EXTRACT_FIELDSの部分集合）
+        parser: 使用するパーサー名
+        limit: 取り出すリンク・画像の最大数（Noneなら全件）
+        records: Trueならリンク・画像を書き出し用の値で全件返す（parse_and_extractと同じ）
+        
+    Yields:
+        source, date + parse_and_extractの結果（1ページ1件）
+    """
+    for html, record in _iter_warc_html(path):
+        result = {'source': record.url, 'date': record.date}
+        result.update(parse_and_extract(html, record.url, fields, parser, limit, records))
+        yield result
+
+
+def run_warc(paths: List[str], output: str, parser: str = DEFAULT_PARSER,
+             exporter: Optional[AnalysisExporter] = None) -> Dict[str, any]:
+    """
+    WARCファイルを再解析して1ページ1行のJSONLに書き出す
+    
+    Args:
+        paths: WARCファイルのパス
+        output: JSONLの出力先
+        parser: 使用するパーサー名
+        exporter: 指定時は全リンク・全画像を表ごとに書き出す
+        
+    Returns:
+        件数と処理時間
+    """
+    logger.info("WARC再解析開始: %s", paths)
+    pages = 0
+    start = time.perf_counter()
+    
+    with open(output, 'w', encoding='utf-8') as out:
+        for path in paths:
+            for result in analyze_warc(path, EXTRACT_FIELDS, parser, RECORD_ITEM_LIMIT,
+                                       exporter is not None):
+                if exporter is not None:
+                    _export_extracted(exporter, result['source'], result)
+                out.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+                pages += 1
+    
+    elapsed = time.perf_counter() - start
+    logger.info("WARC再解析完了: %sページ, %.2f秒", pages, elapsed)
+    summary = {'pages': pages, 'seconds': elapsed,
+               'pages_per_sec': pages / elapsed if elapsed > 0 else 0.0}
+    if exporter is not None:
+        exporter.flush()
+        summary['export'] = exporter.stats()
+    return summary
+
+
+# ============================================
+# バッチモード
+# ============================================
+
+BATCH_STAGES = ('load', 'detect', 'parse', 'diff', 'page_info', 'structure', 'links', 'images',
+                'export', 'save')  # 計測する処理段階
+
+
+def collect_sources(url_list: Optional[str] = None, html_dir: Optional[str] = None) -> List[str]:
+    """
+    バッチ処理の対象を集める
+    
+    Args:
+        url_list: URL一覧ファイル（1行1URL、#で始まる行は無視）
+        html_dir: .htmlファイルを探すディレクトリ
+        
+    Returns:
+        URLまたはファイルパスのリスト
+    """
+    sources = []
+    
+    if url_list:
+        with open(url_list, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    sources.append(line)
+    
+    if html_dir:
+        for root, _dirs, files in os.walk(html_dir):
+            for name in sorted(files):
+                if name.lower().endswith(('.html', '.htm')):
+                    sources.append(os.path.join(root, name))
+    
+    return sources
+
+
+def _process_source(index: int, source: str, session: requests.Session,
+                    save_dir: Optional[str], timeout: int,
+                    parse_pool: Optional[ProcessPoolExecutor] = None,
+                    parser: str = DEFAULT_PARSER,
+                    cache: Optional[HTTPCache] = None,
+                    snapshots: Optional[SnapshotStore] = None,
+                    warc: Optional[WARCWriter] = None,
+                    fingerprints: Optional[Dict[str, FingerprintNode]] = None,
+                    exporter: Optional[AnalysisExporter] = None) -> Dict[str, any]:
+    """
+    1ページ分の解析を段階ごとに時間計測しながら実行
+    
+    Args:
+        index: 入力内の連番（保存ファイル名に使用）
+        source: URLまたはファイルパス
+        session: 全ワーカーで共有するSession
+        save_dir: HTMLの保存先（Noneなら保存しない）
+        timeout: URL取得のタイムアウト（秒）
+        parse_pool: 指定時はパースと抽出をこのプロセスプールで実行
+        parser: 使用するパーサー名
+        cache: 全ワーカーで共有するHTTPキャッシュ
+        snapshots: 全ワーカーで共有するスナップショットストア（指定時はsave_dirより優先）
+        warc: 全ワーカーで共有するWARCWriter
+        fingerprints: 全ワーカーで共有する前回の版の指紋（指定時は変化した部分だけを記録）
+        exporter: 全ワーカーで共有する書き出し先（指定時は全リンク・全画像を表ごとに書き出す）
+        
+    Returns:
+        JSONLに書き出す1レコード
+    """
+    analyzer = HTMLAnalyzer(session=session, parser=parser, cache=cache, snapshots=snapshots,
+                            warc=warc, fingerprints=fingerprints)
+    record = {'source': source, 'ok': False, 'error': None, 'timings': {}}
+    timings = record['timings']
+    
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[stage] = time.perf_counter() - start
+        return value
+    
+    if fingerprints is not None:
+        parse_pool = None  # 差分の検出にはこのスレッドのツリーが必要（run_batchではプールを作らない）
+    
+    try:
+        parse = parse_pool is None  # プロセスプールを使う場合はここではパースしない
         
-        print("\n[DEBUG] ========== 整形HTML ==========")
+        if source.startswith(('http://', 'https://')):
+            loaded = timed('load', analyzer.fetch_url, source, timeout, parse)
+        else:
+            loaded = timed('load', analyzer.load_from_file, source, parse)
+        
+        if not loaded:
+            record['error'] = "読み込み失敗"
+            return record
+        
+        # エンコーディング判定はloadの中で行われるので、かかった時間を別に記録
+        timings['detect'] = analyzer.detect_time
+        record['encoding'] = analyzer.encoding
+        
+        changes = None
+        if fingerprints is not None:
+            changes = timed('diff', analyzer.detect_changes)
+            record['changes'] = changes
+        
+        if changes is not None and not changes['new']:
+            pass  # 2回目以降は変化した部分（record['changes']）だけを記録
+        elif parse_pool is not None:
+            # パースと抽出は別プロセスで行い、小さな結果だけを受け取る
+            # 書き出す場合はスレッドで処理する場合と同じ値（iter_links / iter_images）で全件
+            exporting = exporter is not None
+            extracted = timed('parse', lambda: parse_pool.submit(
+                parse_and_extract, analyzer.html, analyzer.url, EXTRACT_FIELDS, parser,
+                RECORD_ITEM_LIMIT, exporting).result())
+            del extracted['parse_time']
+            if exporter is not None:
+                timed('export', _export_extracted, exporter, source, extracted,
+                      {'encoding': analyzer.encoding})
+            record.update(extracted)
+        else:
+            record['page_info'] = timed('page_info', analyzer.get_page_info)
+            record['structure'] = timed('structure', analyzer.analyze_structure)
+            if exporter is not None:
+                # 全リンク・全画像はリストにせずツリーから直接書き出し、同じ走査で先頭だけレコードに残す
+                record['links'] = []
+                record['images'] = []
+                timed('export', exporter.write_page, source, record['page_info'], record['structure'],
+                      _keep_first(analyzer.iter_links(), record['links']),
+                      _keep_first(analyzer.iter_images(), record['images']),
+                      {'encoding': analyzer.encoding})
+            else:
+                record['links'] = timed('links', analyzer.get_all_links)
+                record['images'] = timed('images', analyzer.get_all_images)
         
-        # prettify()で整形
-        pretty_html = self.soup.prettify()
+        if snapshots is not None:
+            stored = timed('save', analyzer.save_html)
+            record['snapshot'] = stored['digest'] if stored else None
+        elif save_dir:
+            filename = os.path.join(save_dir, f'saved_html_{index:06d}.html')
+            timed('save', analyzer.save_html, filename)
+            record['saved_to'] = filename
         
-        # 最初の50行のみ表示
-        lines = pretty_html.split('\n')[:50]
-        print('\n'.join(lines))
+        record['ok'] = True
         
-        if len(pretty_html.split('\n')) > 50:
-            print(f"\n... 他 {len(pretty_html.split('\n')) - 50}行")
+    except Exception as e:
+        record['error'] = str(e)
+        logger.error("バッチ処理エラー: %s: %s", source, e, exc_info=True)
+    
+    return record
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """パーセンタイルを計算（nearest-rank法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run_batch(sources: List[str], workers: int = 4, output: str = 'batch_results.jsonl',
+              save_dir: Optional[str] = None, timeout: int = 10,
+              parse_processes: int = 0, parser: str = DEFAULT_PARSER,
+              cache: Optional[HTTPCache] = None,
+              snapshots: Optional[SnapshotStore] = None,
+              warc: Optional[WARCWriter] = None,
+              fingerprints: Optional[Dict[str, FingerprintNode]] = None,
+              exporter: Optional[AnalysisExporter] = None) -> Dict[str, any]:
+    """
+    複数ページをスレッドプールで並列解析し、1ページ1行のJSONLに書き出す
+    
+    Args:
+        sources: URLまたはファイルパスのリスト
+        workers: 並列スレッド数
+        output: JSONLの出力先
+        save_dir: HTMLの保存先（Noneなら保存しない）
+        timeout: URL取得のタイムアウト（秒）
+        parse_processes: 1以上ならパースをこの数のプロセスで実行（GIL回避、fingerprints指定時は無視）
+        parser: 使用するパーサー名
+        cache: 共有するHTTPキャッシュ（Noneならキャッシュしない）
+        snapshots: HTMLの保存先のスナップショットストア（指定時はsave_dirより優先）
+        warc: 取得したレスポンスを書き込むWARCWriter
+        fingerprints: 前回の版の指紋（指定時は変化の検出を行い、この辞書を更新する）
+        exporter: 解析結果の書き出し先（ページ情報・構造・全リンク・全画像を表ごとに追記）
+        
+    Returns:
+        スループットの集計結果
+    """
+    logger.info("バッチ開始: %s件, %sスレッド", len(sources), workers)
+    
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+    
+    if fingerprints is not None and parse_processes > 0:
+        # 差分の検出にはワーカースレッドのツリーが必要なので、プロセスプールは作らない
+        echo("⚠ --fingerprints と --parse-processes は併用できないため、パースはスレッドで行います")
+        logger.warning("指紋の比較中はプロセスプールを使用しません: parse_processes=%s", parse_processes)
+        parse_processes = 0
+    
+    session = create_session(pool_size=workers)
+    parse_pool = create_parse_pool(parse_processes, parser) if parse_processes > 0 else None
+    write_lock = threading.Lock()
+    stage_times = {stage: [] for stage in BATCH_STAGES}
+    succeeded = 0
+    change_counts = {'new': 0, 'changed': 0, 'unchanged': 0}
+    start = time.perf_counter()
+    
+    try:
+        with open(output, 'w', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_process_source, i, source, session, save_dir, timeout,
+                            parse_pool, parser, cache, snapshots, warc, fingerprints, exporter)
+                for i, source in enumerate(sources)
+            ]
+            
+            for future in as_completed(futures):
+                record = future.result()
+                
+                for stage, seconds in record['timings'].items():
+                    stage_times[stage].append(seconds)
+                if record['ok']:
+                    succeeded += 1
+                changes = record.get('changes')
+                if changes:
+                    status = 'new' if changes['new'] else 'changed' if changes['changed'] else 'unchanged'
+                    change_counts[status] += 1
+                
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    finally:
+        session.close()
+        if parse_pool is not None:
+            parse_pool.shutdown()
+    
+    elapsed = time.perf_counter() - start
+    
+    summary = {
+        'pages': len(sources),
+        'succeeded': succeeded,
+        'failed': len(sources) - succeeded,
+        'seconds': elapsed,
+        'pages_per_sec': len(sources) / elapsed if elapsed > 0 else 0.0,
+        'stages': {
+            stage: {
+                'count': len(times),
+                'p50': _percentile(times, 50),
+                'p95': _percentile(times, 95),
+            }
+            for stage, times in stage_times.items() if times
+        },
+    }
+    
+    if cache is not None:
+        summary['cache'] = cache.stats()
+    if snapshots is not None:
+        summary['snapshots'] = snapshots.stats()
+    if warc is not None:
+        warc.flush()
+        summary['warc'] = {'records': warc.records, 'files': list(warc.paths)}
+    if fingerprints is not None:
+        summary['changes'] = change_counts
+    if exporter is not None:
+        exporter.flush()
+        summary['export'] = {'rows': exporter.stats(), 'files': exporter.paths}
+    
+    logger.info("バッチ完了: %s/%s件, %.1fページ/秒", succeeded, len(sources), summary['pages_per_sec'])
+    
+    return summary
+
+
+def print_batch_summary(summary: Dict[str, any]):
+    """バッチのスループット集計を表示"""
+    print("\n" + "=" * 70)
+    print("📊 バッチ処理サマリー")
+    print("=" * 70)
+    print(f"ページ数: {summary['pages']} (成功 {summary['succeeded']}, 失敗 {summary['failed']})")
+    print(f"処理時間: {summary['seconds']:.2f}秒")
+    print(f"スループット: {summary['pages_per_sec']:.2f} ページ/秒")
+    print(f"\n{'段階':<12}{'件数':>8}{'p50(ms)':>12}{'p95(ms)':>12}")
+    for stage, stats in summary['stages'].items():
+        print(f"{stage:<12}{stats['count']:>8}{stats['p50'] * 1000:>12.1f}{stats['p95'] * 1000:>12.1f}")
+    
+    if 'cache' in summary:
+        cache = summary['cache']
+        print(f"\nキャッシュ: ヒット {cache['hits']}, ミス {cache['misses']}, "
+              f"節約 {cache['bytes_saved']:,} バイト")
+    
+    if 'snapshots' in summary:
+        stored = summary['snapshots']
+        print(f"スナップショット: {stored['snapshots']}件 / 本文 {stored['blobs']}種類, "
+              f"{stored['bytes']:,} → {stored['stored_bytes']:,} バイト")
+    
+    if 'warc' in summary:
+        print(f"WARC: {summary['warc']['records']}レコード → {', '.join(summary['warc']['files'])}")
+    
+    if 'changes' in summary:
+        changes = summary['changes']
+        print(f"変化: 変化あり {changes['changed']}, 変化なし {changes['unchanged']}, 初回 {changes['new']}")
+    
+    if 'export' in summary:
+        rows = ', '.join(f"{table} {count:,}行" for table, count in summary['export']['rows'].items())
+        print(f"エクスポート: {rows}")
 
 
 # ============================================
 # メイン実行部分
 # ============================================
 
-def main():
-    """メイン関数"""
+def main(argv: Optional[List[str]] = None):
+    """メイン関数（引数なしならインタラクティブモード、あればバッチモード）"""
+    parser = argparse.ArgumentParser(description="ドライバー不要 HTML解析ツール")
+    parser.add_argument('--urls', help="URL一覧ファイル（1行1URL）")
+    parser.add_argument('--html-dir', help=".htmlファイルを読み込むディレクトリ")
+    parser.add_argument('--workers', type=int, default=4, help="並列スレッド数")
+    parser.add_argument('--output', default='batch_results.jsonl', help="JSONLの出力先")
+    parser.add_argument('--save-dir', help="取得したHTMLの保存先")
+    parser.add_argument('--snapshot-dir',
+                        help="HTMLを圧縮・重複排除して保存するスナップショットストア（--save-dirより優先）")
+    parser.add_argument('--warc-dir', help="取得したレスポンスをWARC（.warc.gz）で保存するディレクトリ")
+    parser.add_argument('--warc-max-mb', type=int, default=1024,
+                        help="WARCファイル1つの上限（MB、超えたら次のファイルへ）")
+    parser.add_argument('--from-warc', nargs='+', help="WARCファイルを再解析して--outputに書き出す")
+    parser.add_argument('--export-dir',
+                        help="ページ情報・構造・全リンク・全画像を表ごとに書き出すディレクトリ")
+    parser.add_argument('--export-format', default='jsonl', choices=EXPORT_FORMATS,
+                        help="--export-dirの形式（parquetはpyarrowが必要）")
+    parser.add_argument('--export-append', action='store_true',
+                        help="既存のエクスポートファイルに追記する（jsonl / csvのみ）")
+    parser.add_argument('--fingerprints',
+                        help="前回の版の指紋ファイル（JSON、指定時は変化した部分だけを記録し、終了時に更新）")
+    parser.add_argument('--timeout', type=int, default=10, help="URL取得のタイムアウト（秒）")
+    parser.add_argument('--parse-processes', type=int, default=0,
+                        help="パースを実行するプロセス数（0ならスレッド内でパース、--fingerprintsとは併用不可）")
+    parser.add_argument('--parser', default=DEFAULT_PARSER, choices=list(PARSER_BACKENDS),
+                        help="BeautifulSoupのパーサー")
+    parser.add_argument('--cache-dir', help="HTTPキャッシュの保存先（指定時のみ有効）")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="HTTPキャッシュの上限（MB）")
+    parser.add_argument('--calibrate-parser', action='store_true',
+                        help="--html-dirのページで各パーサーを計測して最速のものを選ぶ")
+    parser.add_argument('--verbosity', default='debug', choices=VERBOSITY_MODES,
+                        help="出力モード（debug: 従来どおり / info, silent: 表示なし / structured: JSONログ）")
+    parser.add_argument('--log-file', default=LOG_FILE, help="ログファイルのパス（空文字で出力しない）")
+    parser.add_argument('--log-background', action='store_true',
+                        help="ログの書き込みを別スレッドで行う")
+    args = parser.parse_args(argv)
+    
+    if args.export_format == 'parquet' and args.export_dir and not html_export.HAS_PYARROW:
+        parser.error("--export-format parquet には pyarrow が必要です")
+    
+    configure_logging(args.verbosity, args.log_file or None, args.log_background)
+    
+    fingerprints = None
+    if args.fingerprints:
+        try:
+            fingerprints = load_fingerprints(args.fingerprints)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.calibrate_parser:
+        # パーサー計測モード
+        samples = collect_sources(html_dir=args.html_dir)
+        print_calibration(calibrate_parser(samples))
+        return
+    
+    exporter = create_exporter(args.export_dir, args.export_format, args.export_append) \
+        if args.export_dir else None
+    
+    if args.from_warc:
+        # WARC再解析モード（ネットワークにはアクセスしない）
+        try:
+            summary = run_warc(args.from_warc, args.output, args.parser, exporter)
+        finally:
+            if exporter is not None:
+                exporter.close()
+        print(f"WARC再解析: {summary['pages']}ページ, {summary['seconds']:.2f}秒 "
+              f"({summary['pages_per_sec']:.1f} ページ/秒) → {args.output}")
+        if 'export' in summary:
+            print(f"エクスポート: {summary['export']} → {args.export_dir}")
+        return
+    
+    warc = html_warc.WARCWriter(args.warc_dir, max_bytes=args.warc_max_mb * 1024 * 1024) \
+        if args.warc_dir else None
+    cache = HTTPCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+    
+    if args.urls or args.html_dir:
+        # バッチモード（input()を使わない）
+        sources = collect_sources(args.urls, args.html_dir)
+        snapshots = html_snapshot_store.SnapshotStore(args.snapshot_dir) if args.snapshot_dir else None
+        try:
+            summary = run_batch(sources, args.workers, args.output, args.save_dir, args.timeout,
+                                args.parse_processes, args.parser, cache, snapshots, warc,
+                                fingerprints, exporter)
+            if fingerprints is not None:
+                save_fingerprints(args.fingerprints, fingerprints)
+        finally:
+            if exporter is not None:
+                exporter.close()
+            if snapshots is not None:
+                snapshots.close()
+            if warc is not None:
+                warc.close()
+        print_batch_summary(summary)
+        return
+    
     print("=" * 70)
     print("🔍 ドライバー不要 HTML解析ツール")
     print("=" * 70)
     logger.info("プログラム開始")
     
-    analyzer = HTMLAnalyzer()
+    snapshots = html_snapshot_store.SnapshotStore(args.snapshot_dir) if args.snapshot_dir else None
+    analyzer = HTMLAnalyzer(parser=args.parser, cache=cache, snapshots=snapshots, warc=warc,
+                            fingerprints=fingerprints)
     
     print("\n解析方法を選択:")
     print("1. URLから取得")
@@ -569,18 +3842,18 @@ def main():
             # URLから取得
             url = input("URL: ")
             if not analyzer.fetch_url(url):
-                print("[DEBUG] ❌ HTML取得に失敗しました")
+                echo("❌ HTML取得に失敗しました")
                 return
         
         elif choice == "2":
             # ファイルから読み込み
             filepath = input("HTMLファイルのパス: ")
             if not analyzer.load_from_file(filepath):
-                print("[DEBUG] ❌ ファイル読み込みに失敗しました")
+                echo("❌ ファイル読み込みに失敗しました")
                 return
         
         else:
-            print("[DEBUG] ❌ 無効な選択です")
+            echo("❌ 無効な選択です")
             return
         
         # ページ情報を取得
@@ -595,6 +3868,11 @@ def main():
         # 画像一覧
         images = analyzer.get_all_images()
         
+        # 表形式で書き出し（--export-dir指定時）
+        if exporter is not None:
+            exporter.write_page(analyzer.url, page_info, structure, analyzer.iter_links(),
+                                analyzer.iter_images(), {'encoding': analyzer.encoding})
+        
         # HTMLを保存
         analyzer.save_html()
         
@@ -607,7 +3885,9 @@ def main():
         print("  id <ID>          - IDで検索")
         print("  tag <タグ名>      - タグで検索")
         print("  css <セレクタ>    - CSSセレクタで検索")
-        print("  text             - テキストを抽出")
+        print("  text             - 本文テキストを抽出（最初の500文字）")
+        print("  changes          - 前回の版からの変化を表示")
+        print("  pretty [開始 終了] - 整形HTMLを表示（省略時は先頭50行）")
         print("  quit             - 終了")
         
         while True:
@@ -627,18 +3907,28 @@ def main():
             elif command.startswith("tag "):
                 tag_name = command[4:].strip()
                 results = analyzer.find_by_tag(tag_name)
-                print(f"[DEBUG] {len(results)}個見つかりました")
+                echo("%s個見つかりました", len(results))
             
             elif command.startswith("css "):
                 selector = command[4:].strip()
                 analyzer.find_by_css_selector(selector)
             
             elif command == "text":
-                text = analyzer.extract_text()
-                print(f"\n{text[:500]}...")  # 最初の500文字
+                text = analyzer.extract_text(main_content=True, max_chars=500)  # 本文の最初の500文字だけ抽出
+                print(f"\n{text}...")
+            
+            elif command == "changes":
+                analyzer.detect_changes()
+            
+            elif command == "pretty" or command.startswith("pretty "):
+                numbers = command[7:].split()
+                if len(numbers) == 2 and all(number.isdigit() for number in numbers):
+                    analyzer.pretty_print(start=int(numbers[0]), stop=int(numbers[1]))
+                else:
+                    analyzer.pretty_print()
             
             else:
-                print("[DEBUG] 不明なコマンド")
+                echo("不明なコマンド")
         
         print("\n" + "=" * 70)
         print("✅ 解析完了")
@@ -646,12 +3936,24 @@ def main():
         logger.info("プログラム終了")
     
     except KeyboardInterrupt:
-        print("\n\n[DEBUG] 中断されました")
+        echo("\n\n中断されました")
         logger.info("ユーザー中断")
     
     except Exception as e:
-        print(f"\n[DEBUG] ❌ エラー: {e}")
-        logger.error(f"エラー: {e}", exc_info=True)
+        echo("\n❌ エラー: %s", e)
+        logger.error("エラー: %s", e, exc_info=True)
+    
+    finally:
+        # 接続プールを解放
+        analyzer.close()
+        if fingerprints is not None:
+            save_fingerprints(args.fingerprints, fingerprints)
+        if exporter is not None:
+            exporter.close()
+        if snapshots is not None:
+            snapshots.close()
+        if warc is not None:
+            warc.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,361 @@
+# ============================================
+# HTMLスナップショットストア
+# 本文のハッシュをキーに圧縮して保存（同じ内容は1回だけ保存）
+# ============================================
+
+import gzip  # gzip圧縮用（標準ライブラリ）
+import hashlib  # 本文のハッシュ計算用
+import importlib.util  # zstandardの有無を確認する用
+import logging  # ログ出力用
+import os  # ファイル操作用
+import sqlite3  # URL・取得時刻 → 本文の索引用
+import tempfile  # 書きかけのファイルを見せないための一時ファイル用
+import threading  # 索引の排他制御用
+import time  # 取得時刻用
+import zlib  # 辞書付き圧縮用（標準ライブラリ）
+from collections import Counter  # 辞書作成時の行の出現回数用
+from typing import Dict, Iterable, List, Optional  # 型ヒント用
+
+from lazy_import import LazyModule  # オプションの圧縮ライブラリの遅延インポート用
+
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# 圧縮方式
+# ============================================
+
+# zstandardはオプション（無ければ標準ライブラリのgzip/zlibを使う）
+HAS_ZSTD = importlib.util.find_spec('zstandard') is not None
+zstandard = LazyModule('zstandard')
+
+# 圧縮方式 → ファイルの拡張子
+#   zstd : zstandard（辞書対応、最も速く小さい）
+#   gzip : 標準ライブラリ、gzipコマンドでも読める（辞書なし）
+#   zlib : 標準ライブラリ、gzipと同じDeflateにプリセット辞書を付けられる
+CODECS = {'zstd': '.zst', 'gzip': '.gz', 'zlib': '.zz'}
+
+DEFAULT_LEVEL = {'zstd': 10, 'gzip': 6, 'zlib': 6}  # 圧縮レベルの既定値
+DICTIONARY_SIZE = 32 * 1024  # 辞書の大きさ（zlibのプリセット辞書は最大32KB）
+
+
+def default_codec(dictionary: bool = False) -> str:
+    """使える中で最適な圧縮方式（辞書を使う場合、zstdが無ければzlib）"""
+    if HAS_ZSTD:
+        return 'zstd'
+    return 'zlib' if dictionary else 'gzip'
+
+
+def _compress(data: bytes, codec: str, level: int, dictionary: Optional[bytes]) -> bytes:
+    """本文を圧縮"""
+    if codec == 'zstd':
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=level, dict_data=dict_data).compress(data)
+    if codec == 'zlib':
+        compressor = zlib.compressobj(level, zdict=dictionary) if dictionary else zlib.compressobj(level)
+        return compressor.compress(data) + compressor.flush()
+    return gzip.compress(data, compresslevel=level, mtime=0)  # mtime固定で同じ本文は同じバイト列
+
+
+def _decompress(data: bytes, codec: str, dictionary: Optional[bytes]) -> bytes:
+    """圧縮された本文を展開"""
+    if codec == 'zstd':
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+    if codec == 'zlib':
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+    return gzip.decompress(data)
+
+
+def train_dictionary(samples: Iterable[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """
+    同じサイトのページから圧縮用の辞書を作成
+
+    zstandardがあればその学習機能を使う。無い場合は、半数以上のページに
+    出てくる行（ヘッダー・フッター・ナビゲーションなど）を集めてzlib用の辞書にする。
+
+    Args:
+        samples: 同じサイトのHTML（数十ページ程度）
+        size: 辞書の最大バイト数
+
+    Returns:
+        辞書のバイト列
+    """
+    encoded = [sample.encode('utf-8') for sample in samples]
+    if not encoded:
+        raise ValueError("辞書の作成にはサンプルが1件以上必要です")
+
+    if HAS_ZSTD:
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+
+    # 各ページで1回だけ数える（1ページ内の繰り返しは圧縮で十分縮む）
+    counts = Counter()
+    for sample in encoded:
+        counts.update({line.strip() for line in sample.splitlines() if len(line.strip()) >= 8})
+    threshold = max(2, len(encoded) // 2)
+    common = [line for line, n in counts.most_common() if n >= threshold]
+
+    chosen = []
+    total = 0
+    for line in common:
+        if total + len(line) + 1 > size:
+            break
+        chosen.append(line)
+        total += len(line) + 1
+    # Deflateは近い位置の一致ほど短く符号化するので、よく出る行を辞書の末尾に置く
+    return b'\n'.join(reversed(chosen))
+
+
+# ============================================
+# スナップショットストア
+# ============================================
+
+class SnapshotStore:
+    """
+    HTMLを本文のSHA-256で管理する圧縮ストア
+
+    ディレクトリ構成:
+        blobs/ab/abcdef....zst  … 圧縮した本文（同じ本文は1つだけ）
+        index.sqlite           … URL・取得時刻 → 本文ハッシュの索引
+
+    本文ファイルは一時ファイルに書いてからos.replaceで置くので、
+    並列に保存しても壊れたファイルや名前の衝突は起きない。
+    """
+
+    def __init__(self, directory: str = 'snapshots', codec: Optional[str] = None,
+                 level: Optional[int] = None):
+        """
+        初期化
+
+        Args:
+            directory: 保存先ディレクトリ
+            codec: 圧縮方式（CODECSのいずれか、Noneなら自動選択）
+            level: 圧縮レベル（Noneなら方式ごとの既定値）
+        """
+        if codec is not None and codec not in CODECS:
+            raise ValueError(f"codecは {list(CODECS)} のいずれか: {codec}")
+        if codec == 'zstd' and not HAS_ZSTD:
+            raise ValueError("zstdを使うには zstandard をインストールしてください")
+
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")  # 読み込みと書き込みを並行できるように
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,  -- 本文（UTF-8）のSHA-256
+                codec TEXT NOT NULL,
+                dictionary TEXT,          -- 圧縮に使った辞書のID（なければNULL）
+                size INTEGER NOT NULL,    -- 本文のバイト数
+                stored_size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                url TEXT,
+                fetched_at REAL NOT NULL,
+                digest TEXT NOT NULL REFERENCES blobs(digest)
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_url ON snapshots(url, fetched_at);
+            CREATE TABLE IF NOT EXISTS dictionaries (
+                id TEXT PRIMARY KEY,
+                data BLOB NOT NULL
+            );
+        """)
+        self._db.commit()
+
+        self._dictionaries = {}  # 辞書ID → バイト列（読み込み済みのもの）
+        self.dictionary_id = None  # 新しく保存する本文に使う辞書
+        self.codec = codec
+        self.level = level
+
+    # --------------------------------------------
+    # 辞書
+    # --------------------------------------------
+
+    def set_dictionary(self, dictionary: bytes) -> str:
+        """
+        以降に保存する本文の圧縮に使う辞書を登録
+
+        Args:
+            dictionary: train_dictionaryで作った辞書
+
+        Returns:
+            辞書ID（索引に記録され、展開時に使われる）
+        """
+        dictionary_id = hashlib.sha256(dictionary).hexdigest()[:16]
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO dictionaries (id, data) VALUES (?, ?)",
+                             (dictionary_id, dictionary))
+            self._db.commit()
+            # putが辞書IDと辞書を同じロックの中で読むので、両方をここで入れ替える
+            self._dictionaries[dictionary_id] = dictionary
+            self.dictionary_id = dictionary_id
+        logger.info("辞書を登録: %s (%sバイト)", dictionary_id, len(dictionary))
+        return dictionary_id
+
+    def train(self, samples: Iterable[str], size: int = DICTIONARY_SIZE) -> str:
+        """サンプルから辞書を作成して登録（train_dictionary + set_dictionary）"""
+        return self.set_dictionary(train_dictionary(samples, size))
+
+    def _dictionary(self, dictionary_id: Optional[str]) -> Optional[bytes]:
+        if dictionary_id is None:
+            return None
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            with self._lock:
+                dictionary = self._load_dictionary(dictionary_id)
+        return dictionary
+
+    def _load_dictionary(self, dictionary_id: Optional[str]) -> Optional[bytes]:
+        # 呼び出し側で_lockを取っておくこと
+        if dictionary_id is None:
+            return None
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            row = self._db.execute("SELECT data FROM dictionaries WHERE id = ?",
+                                   (dictionary_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"辞書が見つかりません: {dictionary_id}")
+            dictionary = self._dictionaries[dictionary_id] = row[0]
+        return dictionary
+
+    # --------------------------------------------
+    # 保存・読み込み
+    # --------------------------------------------
+
+    def _blob_path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest + CODECS[codec])
+
+    def put(self, html: str, url: Optional[str] = None,
+            fetched_at: Optional[float] = None) -> Dict[str, any]:
+        """
+        HTMLを保存（同じ本文が保存済みなら索引だけ追加）
+
+        Args:
+            html: HTML文字列
+            url: 取得元のURL
+            fetched_at: 取得時刻（UNIX時間、Noneなら現在時刻）
+
+        Returns:
+            digest, path, new（本文を新たに書いたか）, size, stored_sizeを持つ辞書
+        """
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        fetched_at = time.time() if fetched_at is None else fetched_at
+
+        with self._lock:
+            row = self._db.execute("SELECT codec, stored_size FROM blobs WHERE digest = ?",
+                                   (digest,)).fetchone()
+            # 圧縮中にset_dictionaryが呼ばれても、索引に記録する辞書IDと実際の辞書がずれないよう
+            # ここで組にして取り出しておく
+            dictionary_id = self.dictionary_id
+            dictionary = self._load_dictionary(dictionary_id) if row is None else None
+            codec, level = self.codec, self.level
+
+        new = row is None
+        if new:
+            codec = codec or default_codec(dictionary is not None)
+            if codec == 'gzip' and dictionary is not None:
+                codec = 'zlib'  # gzip形式は辞書を持てない
+            level = level if level is not None else DEFAULT_LEVEL[codec]
+            compressed = _compress(data, codec, level, dictionary)
+
+            path = self._blob_path(digest, codec)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressed)
+            os.replace(temp_path, path)  # 同じ本文を同時に書いても中身は同じ
+            stored_size = len(compressed)
+        else:
+            codec, stored_size = row
+            path = self._blob_path(digest, codec)
+
+        with self._lock:
+            if new:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO blobs (digest, codec, dictionary, size, stored_size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (digest, codec, dictionary_id, len(data), stored_size))
+            self._db.execute("INSERT INTO snapshots (url, fetched_at, digest) VALUES (?, ?, ?)",
+                             (url, fetched_at, digest))
+            self._db.commit()
+
+        logger.debug("スナップショット保存: %s -> %s (%s)", url, digest[:12], '新規' if new else '重複')
+        return {'digest': digest, 'path': path, 'new': new,
+                'size': len(data), 'stored_size': stored_size}
+
+    def get(self, digest: str) -> str:
+        """
+        本文ハッシュからHTMLを読み込む
+
+        Args:
+            digest: putが返したdigest
+
+        Returns:
+            HTML文字列
+        """
+        with self._lock:
+            row = self._db.execute("SELECT codec, dictionary FROM blobs WHERE digest = ?",
+                                   (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"スナップショットが見つかりません: {digest}")
+        codec, dictionary_id = row
+        with open(self._blob_path(digest, codec), 'rb') as f:
+            data = _decompress(f.read(), codec, self._dictionary(dictionary_id))
+        return data.decode('utf-8')
+
+    def latest(self, url: str, before: Optional[float] = None) -> Optional[Dict[str, any]]:
+        """
+        URLの最新（またはbefore時点で最新）のスナップショット
+
+        Args:
+            url: 取得元のURL
+            before: この時刻以前のものに限る（UNIX時間）
+
+        Returns:
+            url, fetched_at, digestを持つ辞書（無ければNone）
+        """
+        query = "SELECT url, fetched_at, digest FROM snapshots WHERE url = ?"
+        params = [url]
+        if before is not None:
+            query += " AND fetched_at <= ?"
+            params.append(before)
+        query += " ORDER BY fetched_at DESC LIMIT 1"
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        return dict(zip(('url', 'fetched_at', 'digest'), row)) if row else None
+
+    def history(self, url: str) -> List[Dict[str, any]]:
+        """URLのスナップショット一覧（古い順）"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, fetched_at, digest FROM snapshots WHERE url = ? ORDER BY fetched_at",
+                (url,)).fetchall()
+        return [dict(zip(('url', 'fetched_at', 'digest'), row)) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """保存件数と容量"""
+        with self._lock:
+            snapshots = self._db.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+            blobs, size, stored = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+        return {'snapshots': snapshots, 'blobs': blobs, 'bytes': size, 'stored_bytes': stored}
+
+    def close(self):
+        """索引を閉じる"""
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
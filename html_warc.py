@@ -0,0 +1,342 @@
+# ============================================
+# WARCファイルの書き込み・読み込み
+# 取得したページをWARC（Web ARChive）形式で保存
+# ============================================
+
+import base64  # ダイジェストのBase32表記用
+import gzip  # レコードごとのgzip圧縮用
+import hashlib  # WARC-Block-Digest / WARC-Payload-Digest用
+import logging  # ログ出力用
+import os  # ファイル操作用
+import threading  # 複数ワーカーからの書き込みの排他制御用
+import uuid  # WARC-Record-ID用
+from datetime import datetime, timezone  # WARC-Date用
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple  # 型ヒント用
+from urllib.parse import urlsplit  # リクエスト行の組み立て用
+
+
+logger = logging.getLogger(__name__)
+
+
+WARC_VERSION = 'WARC/1.1'
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1ファイルの上限（超えたら次のファイルへ）
+DEFAULT_BUFFER_BYTES = 1024 * 1024  # まとめて書き込むまでのバッファサイズ
+
+# 本文はデコード済み（requestsが展開済み）で保存するので、転送時の符号化を示すヘッダーは外す
+_DROPPED_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length'}
+
+
+def _digest(data: bytes) -> str:
+    """WARCで一般的な sha1:<Base32> 形式のダイジェスト"""
+    return 'sha1:' + base64.b32encode(hashlib.sha1(data).digest()).decode('ascii')
+
+
+def _warc_date(timestamp: Optional[float] = None) -> str:
+    moment = datetime.fromtimestamp(timestamp, timezone.utc) if timestamp else datetime.now(timezone.utc)
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _header_block(lines: Iterable[Tuple[str, str]], encoding: str = 'utf-8') -> bytes:
+    # WARCのヘッダーはUTF-8、HTTPのヘッダーはhttp.clientと同じlatin-1（受信したバイト列に戻る）
+    return ''.join(f"{name}: {value}\r\n" for name, value in lines).encode(encoding)
+
+
+# ============================================
+# 書き込み
+# ============================================
+
+class WARCWriter:
+    """
+    レコードごとにgzipしたWARCファイルを書き出す（.warc.gz）
+
+    レコードは1件ずつ独立したgzipメンバーにするので、索引から任意の
+    レコードへ直接シークでき、通常のgzip展開でも全体を読める。
+    書き込みはbuffer_bytesまでメモリにためてからまとめて行い、
+    ファイルがmax_bytesを超えそうになったら次のファイルに切り替える。
+    """
+
+    def __init__(self, directory: str = 'warc', prefix: str = 'html-analyzer',
+                 max_bytes: int = DEFAULT_MAX_BYTES, buffer_bytes: int = DEFAULT_BUFFER_BYTES,
+                 compresslevel: int = 6):
+        """
+        初期化
+
+        Args:
+            directory: 出力先ディレクトリ
+            prefix: ファイル名の先頭
+            max_bytes: 1ファイルの上限バイト数
+            buffer_bytes: まとめて書き込むまでのバッファサイズ
+            compresslevel: gzipの圧縮レベル
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.buffer_bytes = buffer_bytes
+        self.compresslevel = compresslevel
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_bytes = 0  # 現在のファイルに書いた（バッファ分を含む）バイト数
+        self._buffer = bytearray()
+        self._serial = 0
+        self.paths = []  # 作成したファイルの一覧
+        self.records = 0  # 書き込んだレコード数
+
+    # --------------------------------------------
+    # ファイルの切り替え
+    # --------------------------------------------
+
+    def _open_next(self):
+        """次のファイルを開いてwarcinfoレコードを書く"""
+        self._serial += 1
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')
+        filename = f"{self.prefix}-{timestamp}-{self._serial:05d}-{os.getpid()}.warc.gz"
+        path = os.path.join(self.directory, filename)
+        self._file = open(path, 'wb')
+        self._file_bytes = 0
+        self.paths.append(path)
+        logger.info("WARCファイル作成: %s", path)
+
+        info = _header_block([
+            ('software', 'html-analyzer'),
+            ('format', 'WARC File Format 1.1'),
+            ('conformsTo', 'https://iipc.github.io/warc-specifications/specifications/warc-format/warc-1.1/'),
+        ])
+        self._append(self._record('warcinfo', info, 'application/warc-fields',
+                                  extra=[('WARC-Filename', filename)]))
+
+    def _flush_buffer(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+
+    def _append(self, member: bytes):
+        """圧縮済みのレコードをバッファに追加（必要なら書き込み・ファイル切り替え）"""
+        self._buffer += member
+        self._file_bytes += len(member)
+        if len(self._buffer) >= self.buffer_bytes:
+            self._flush_buffer()
+
+    def _record(self, warc_type: str, block: bytes, content_type: str,
+                url: Optional[str] = None, timestamp: Optional[float] = None,
+                extra: Optional[List[Tuple[str, str]]] = None,
+                record_id: Optional[str] = None) -> bytes:
+        """1レコードを組み立ててgzipメンバーにする"""
+        headers = [
+            ('WARC-Type', warc_type),
+            ('WARC-Record-ID', record_id or f"<urn:uuid:{uuid.uuid4()}>"),
+            ('WARC-Date', _warc_date(timestamp)),
+        ]
+        if url is not None:
+            headers.append(('WARC-Target-URI', url))
+        headers.extend(extra or [])
+        headers.extend([
+            ('Content-Type', content_type),
+            ('WARC-Block-Digest', _digest(block)),
+            ('Content-Length', str(len(block))),
+        ])
+        raw = WARC_VERSION.encode('ascii') + b'\r\n' + _header_block(headers) + b'\r\n' + block + b'\r\n\r\n'
+        return gzip.compress(raw, compresslevel=self.compresslevel, mtime=0)
+
+    def _write(self, members: List[bytes]):
+        """関連するレコード（リクエスト + レスポンス）を同じファイルにまとめて書く"""
+        size = sum(len(member) for member in members)
+        with self._lock:
+            if self._file is None:
+                self._open_next()
+            elif self._file_bytes + size > self.max_bytes:
+                self._flush_buffer()
+                self._file.close()
+                self._open_next()
+            for member in members:
+                self._append(member)
+            self.records += len(members)
+
+    # --------------------------------------------
+    # レコードの書き込み
+    # --------------------------------------------
+
+    def write_response(self, url: str, status: int, reason: str, headers: Iterable[Tuple[str, str]],
+                       body: bytes, request_headers: Optional[Iterable[Tuple[str, str]]] = None,
+                       method: str = 'GET', timestamp: Optional[float] = None):
+        """
+        HTTPのリクエストとレスポンスをrequest/responseレコードとして書き込む
+
+        本文は展開済みのものを保存し、Content-Encoding / Transfer-Encoding は外して
+        Content-Lengthを付け直す（読み込み側で再度展開しなくてよいように）。
+
+        Args:
+            url: 取得したURL
+            status: ステータスコード
+            reason: ステータスの説明（'OK'など）
+            headers: レスポンスヘッダー
+            body: 本文（展開済み）
+            request_headers: 送信したリクエストヘッダー（Noneならrequestレコードを書かない）
+            method: HTTPメソッド
+            timestamp: 取得時刻（UNIX時間、Noneなら現在時刻）
+        """
+        response_headers = [(name, value) for name, value in headers
+                            if name.lower() not in _DROPPED_HEADERS]
+        response_headers.append(('Content-Length', str(len(body))))
+        http_block = (f"HTTP/1.1 {status} {reason}\r\n".encode('latin-1')
+                      + _header_block(response_headers, 'latin-1') + b'\r\n' + body)
+
+        response_id = f"<urn:uuid:{uuid.uuid4()}>"
+        members = [self._record(
+            'response', http_block, 'application/http;msgtype=response', url, timestamp,
+            extra=[('WARC-Payload-Digest', _digest(body))], record_id=response_id)]
+
+        if request_headers is not None:
+            parts = urlsplit(url)
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+            request_block = (f"{method} {target} HTTP/1.1\r\n".encode('utf-8')
+                             + _header_block([('Host', parts.netloc), *request_headers], 'latin-1')
+                             + b'\r\n')
+            members.append(self._record(
+                'request', request_block, 'application/http;msgtype=request', url, timestamp,
+                extra=[('WARC-Concurrent-To', response_id)]))
+
+        self._write(members)
+
+    def write_revisit(self, url: str, status: int, reason: str,
+                      headers: Iterable[Tuple[str, str]], timestamp: Optional[float] = None):
+        """
+        本文が前回と同じ（304 Not Modified）ことをrevisitレコードとして書き込む
+
+        Args:
+            url: 取得したURL
+            status: ステータスコード
+            reason: ステータスの説明
+            headers: レスポンスヘッダー
+            timestamp: 取得時刻（UNIX時間、Noneなら現在時刻）
+        """
+        http_block = (f"HTTP/1.1 {status} {reason}\r\n".encode('latin-1')
+                      + _header_block(headers, 'latin-1') + b'\r\n')
+        self._write([self._record(
+            'revisit', http_block, 'application/http;msgtype=response', url, timestamp,
+            extra=[('WARC-Profile',
+                    'http://netpreserve.org/warc/1.1/revisit/server-not-modified')])])
+
+    def write_resource(self, url: str, html: str, content_type: str = 'text/html; charset=utf-8',
+                       timestamp: Optional[float] = None):
+        """
+        HTTPレスポンスではない文書（ブラウザで描画後のDOMなど）をresourceレコードとして書き込む
+
+        Args:
+            url: 文書のURL
+            html: HTML文字列
+            content_type: 文書のContent-Type
+            timestamp: 取得時刻（UNIX時間、Noneなら現在時刻）
+        """
+        body = html.encode('utf-8')
+        self._write([self._record('resource', body, content_type, url, timestamp,
+                                  extra=[('WARC-Payload-Digest', _digest(body))])])
+
+    def flush(self):
+        """バッファの内容をファイルに書き込む"""
+        with self._lock:
+            if self._file is not None:
+                self._flush_buffer()
+                self._file.flush()
+
+    def close(self):
+        """バッファを書き込んでファイルを閉じる"""
+        with self._lock:
+            if self._file is not None:
+                self._flush_buffer()
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# ============================================
+# 読み込み
+# ============================================
+
+class WARCRecord(NamedTuple):
+    """iter_recordsが返すレコード1件"""
+    type: str  # WARC-Type（response, request, resource, revisit, warcinfo など）
+    url: Optional[str]  # WARC-Target-URI
+    date: Optional[str]  # WARC-Date
+    headers: Dict[str, str]  # WARCヘッダー
+    status: Optional[int]  # HTTPステータス（response/revisitのみ）
+    http_headers: Dict[str, str]  # HTTPヘッダー（名前は小文字、response/revisitのみ）
+    payload: bytes  # 本文（responseはHTTPヘッダーを除いた部分）
+
+
+def _read_headers(stream) -> Optional[List[bytes]]:
+    """空行までのヘッダー行を読む（ファイル末尾ならNone）"""
+    line = stream.readline()
+    while line in (b'\r\n', b'\n'):  # レコード間の空行
+        line = stream.readline()
+    if not line:
+        return None
+    lines = [line]
+    while True:
+        line = stream.readline()
+        if not line or line in (b'\r\n', b'\n'):
+            return lines
+        lines.append(line)
+
+
+def _parse_fields(lines: Iterable[bytes], encoding: str = 'utf-8') -> Dict[str, str]:
+    fields = {}
+    for line in lines:
+        name, _, value = line.decode(encoding, errors='replace').partition(':')
+        fields[name.strip()] = value.strip()
+    return fields
+
+
+def iter_records(path: str, types: Optional[Iterable[str]] = None) -> Iterator[WARCRecord]:
+    """
+    WARCファイルのレコードを先頭から1件ずつ読む（.warc / .warc.gz どちらも可）
+
+    Args:
+        path: WARCファイルのパス
+        types: 返すWARC-Type（例: ('response', 'resource')、Noneなら全部）
+
+    Yields:
+        WARCRecord
+    """
+    wanted = set(types) if types is not None else None
+
+    with open(path, 'rb') as raw:
+        gzipped = raw.read(2) == b'\x1f\x8b'
+        raw.seek(0)
+        # gzip.GzipFileは連結されたgzipメンバーを続けて展開する
+        stream = gzip.GzipFile(fileobj=raw) if gzipped else raw
+
+        while True:
+            lines = _read_headers(stream)
+            if lines is None:
+                return
+            if not lines[0].startswith(b'WARC/'):
+                raise ValueError(f"WARCレコードの先頭ではありません: {lines[0][:40]!r}")
+
+            headers = _parse_fields(lines[1:])
+            block = stream.read(int(headers.get('Content-Length', 0)))
+            warc_type = headers.get('WARC-Type', '')
+            if wanted is not None and warc_type not in wanted:
+                continue
+
+            status = None
+            http_headers = {}
+            payload = block
+            if headers.get('Content-Type', '').startswith('application/http') and \
+                    warc_type in ('response', 'revisit'):
+                head, _, payload = block.partition(b'\r\n\r\n')
+                status_line, *header_lines = head.split(b'\r\n')
+                parts = status_line.split(b' ', 2)
+                status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+                http_headers = {name.lower(): value for name, value in _parse_fields(header_lines, 'latin-1').items()}
+
+            yield WARCRecord(warc_type, headers.get('WARC-Target-URI'), headers.get('WARC-Date'),
+                             headers, status, http_headers, payload)
@@ -0,0 +1,80 @@
+# ============================================
+# 遅延インポート
+# 重いライブラリを最初に使う時まで読み込まない
+# ============================================
+
+import importlib  # モジュールを名前で読み込む用
+import threading  # 複数スレッドから同時に初回アクセスされた場合の排他用
+
+
+class LazyModule:
+    """
+    属性に初めてアクセスした時にモジュールを読み込む代理オブジェクト
+
+    例:
+        requests = LazyModule('requests')  # この時点では読み込まない
+        requests.get(url)                  # ここで import requests が実行される
+    """
+
+    def __init__(self, name: str):
+        """
+        初期化
+
+        Args:
+            name: モジュール名（'selenium.webdriver' のようなドット区切りも可）
+        """
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute: str, value):
+        setattr(self._load(), attribute, value)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<LazyModule '{self.__dict__['_name']}' ({state})>"
+
+
+class LazyAttribute:
+    """
+    モジュール内のクラスなどを、使う時まで読み込まない代理オブジェクト
+
+    属性アクセス（By.TAG_NAME）と呼び出し（Options()）を本物に転送する。
+    except節やisinstanceには本物のクラスが必要なので使わないこと。
+    """
+
+    def __init__(self, module: str, attribute: str):
+        """
+        初期化
+
+        Args:
+            module: モジュール名
+            attribute: モジュール内の名前
+        """
+        self._module = LazyModule(module)
+        self._attribute = attribute
+
+    def _resolve(self):
+        return getattr(self._module, self._attribute)
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._resolve(), attribute)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<LazyAttribute '{self._attribute}'>"
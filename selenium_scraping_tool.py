@@ -3,33 +3,33 @@
 # HTML/DOM構造を分析してスクレイピングをサポート
 # ============================================
 
-from selenium import webdriver  # Seleniumのメインモジュール
-from selenium.webdriver.chrome.service import Service  # Chromeドライバー管理用
-from selenium.webdriver.chrome.options import Options  # Chromeオプション設定用
-from selenium.webdriver.common.by import By  # 要素検索方法の指定用
-from selenium.webdriver.support.ui import WebDriverWait  # 待機処理用
-from selenium.webdriver.support import expected_conditions as EC  # 待機条件用
-from selenium.common.exceptions import TimeoutException, NoSuchElementException  # 例外処理用
 import logging  # ログ出力用
+from analysis_logging import VERBOSITY_MODES, configure_logging, echo, previews_enabled  # 出力モード切替用
+from lazy_import import LazyAttribute, LazyModule  # Seleniumの遅延インポート用
 from datetime import datetime  # 日時取得用
-from typing import List, Dict, Optional  # 型ヒント用
+from typing import TYPE_CHECKING, List, Dict, Optional  # 型ヒント用
 import time  # 待機処理用
 import json  # JSON出力用
+import argparse  # 出力モードの引数解析用
+
+# Seleniumは読み込みが重いので、ブラウザを起動する時まで読み込まない
+webdriver = LazyModule('selenium.webdriver')  # Seleniumのメインモジュール
+Options = LazyAttribute('selenium.webdriver.chrome.options', 'Options')  # Chromeオプション設定用
+By = LazyAttribute('selenium.webdriver.common.by', 'By')  # 要素検索方法の指定用
+selenium_exceptions = LazyModule('selenium.common.exceptions')  # 例外処理用（except節では本物のクラスを参照）
+html_snapshot_store = LazyModule('html_snapshot_store')  # HTMLの圧縮保存用（--snapshot-dir指定時）
+html_warc = LazyModule('html_warc')  # WARCの書き込み用（--warc-dir指定時）
+
+if TYPE_CHECKING:  # 型チェッカー向け（実行時には読み込まない）
+    from html_snapshot_store import SnapshotStore
+    from html_warc import WARCWriter
 
 
 # ============================================
 # ログ設定
 # ============================================
 
-# ログ設定（ファイルとコンソール両方に出力）
-logging.basicConfig(
-    level=logging.DEBUG,  # DEBUGレベル以上を出力
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # ログフォーマット
-    handlers=[
-        logging.FileHandler('scraping.log', encoding='utf-8'),  # ファイルに保存
-        logging.StreamHandler()  # コンソールにも表示
-    ]
-)
+LOG_FILE = 'scraping.log'  # ログファイルのパス（main()でconfigure_loggingに渡す）
 
 # ロガーを作成
 logger = logging.getLogger(__name__)
@@ -44,25 +44,30 @@ class ScrapingSupport:
     Webページの構造を分析してスクレイピングをサポートするクラス
     """
     
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, snapshots: Optional['SnapshotStore'] = None,
+                 warc: Optional['WARCWriter'] = None):
         """
         初期化メソッド
         
         Args:
             headless: Trueの場合、ブラウザを非表示で実行
+            snapshots: get_full_htmlの保存先にするスナップショットストア（省略時はファイルに保存）
+            warc: get_full_htmlで取得したHTMLを書き込むWARCWriter（省略時は書き込まない）
         """
-        print("[DEBUG] ScrapingSupportクラスを初期化します")
+        echo("ScrapingSupportクラスを初期化します")
         logger.info("ScrapingSupportクラスの初期化開始")
         
         self.driver = None  # Webドライバーを保存する変数
         self.headless = headless  # ヘッドレスモードのフラグ
+        self.snapshots = snapshots  # スナップショットストア（Noneならファイルに保存）
+        self.warc = warc  # WARCの書き込み先（Noneなら書き込まない）
         
         # Chromeオプションの設定
         self.options = Options()
         
         if self.headless:  # ヘッドレスモードの場合
             self.options.add_argument('--headless')  # ブラウザを表示しない
-            print("[DEBUG] ヘッドレスモードを有効化")
+            echo("ヘッドレスモードを有効化")
             logger.debug("ヘッドレスモード有効")
         
         # その他の推奨オプション
@@ -78,13 +83,13 @@ class ScrapingSupport:
             '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
         )
         
-        print("[DEBUG] Chromeオプションの設定完了")
-        logger.debug(f"Chromeオプション設定完了: headless={headless}")
+        echo("Chromeオプションの設定完了")
+        logger.debug("Chromeオプション設定完了: headless=%s", headless)
     
     def start_driver(self):
         """Chromeドライバーを起動"""
         try:
-            print("[DEBUG] Chromeドライバーを起動します")
+            echo("Chromeドライバーを起動します")
             logger.info("Chromeドライバー起動開始")
             
             # Chromeドライバーを作成
@@ -93,13 +98,13 @@ class ScrapingSupport:
             # 暗黙的な待機時間を設定（要素が見つかるまで最大10秒待つ）
             self.driver.implicitly_wait(10)
             
-            print("[DEBUG] ✅ Chromeドライバーの起動成功")
+            echo("✅ Chromeドライバーの起動成功")
             logger.info("Chromeドライバー起動成功")
             return True
             
         except Exception as e:
-            print(f"[DEBUG] ❌ Chromeドライバーの起動失敗: {e}")
-            logger.error(f"Chromeドライバー起動失敗: {e}", exc_info=True)
+            echo("❌ Chromeドライバーの起動失敗: %s", e)
+            logger.error("Chromeドライバー起動失敗: %s", e, exc_info=True)
             return False
     
     def open_url(self, url: str) -> bool:
@@ -113,8 +118,8 @@ class ScrapingSupport:
             成功時True、失敗時False
         """
         try:
-            print(f"[DEBUG] URLにアクセス: {url}")
-            logger.info(f"URLアクセス開始: {url}")
+            echo("URLにアクセス: %s", url)
+            logger.info("URLアクセス開始: %s", url)
             
             # URLを開く
             self.driver.get(url)
@@ -126,18 +131,18 @@ class ScrapingSupport:
             current_url = self.driver.current_url
             title = self.driver.title
             
-            print(f"[DEBUG] ✅ ページ読み込み完了")
-            print(f"[DEBUG] 現在のURL: {current_url}")
-            print(f"[DEBUG] ページタイトル: {title}")
+            echo("✅ ページ読み込み完了")
+            echo("現在のURL: %s", current_url)
+            echo("ページタイトル: %s", title)
             
-            logger.info(f"ページ読み込み成功: {title}")
-            logger.debug(f"最終URL: {current_url}")
+            logger.info("ページ読み込み成功: %s", title)
+            logger.debug("最終URL: %s", current_url)
             
             return True
             
         except Exception as e:
-            print(f"[DEBUG] ❌ URLアクセス失敗: {e}")
-            logger.error(f"URLアクセス失敗: {url}, エラー: {e}", exc_info=True)
+            echo("❌ URLアクセス失敗: %s", e)
+            logger.error("URLアクセス失敗: %s, エラー: %s", url, e, exc_info=True)
             return False
     
     def get_page_info(self) -> Dict[str, any]:
@@ -147,7 +152,7 @@ class ScrapingSupport:
         Returns:
             ページ情報の辞書
         """
-        print("\n[DEBUG] ========== ページ基本情報 ==========")
+        echo("\n========== ページ基本情報 ==========")
         logger.info("ページ基本情報の取得開始")
         
         info = {
@@ -157,15 +162,51 @@ class ScrapingSupport:
         }
         
         # 情報を表示
-        print(f"[DEBUG] URL: {info['url']}")
-        print(f"[DEBUG] タイトル: {info['title']}")
-        print(f"[DEBUG] HTML長: {info['html_length']:,} 文字")
+        echo("URL: %s", info['url'])
+        echo("タイトル: %s", info['title'])
+        echo("HTML長: %s 文字", format(info['html_length'], ','))
         
-        logger.info(f"ページ情報取得完了: {info['title']}")
-        logger.debug(f"HTML長: {info['html_length']}")
+        logger.info("ページ情報取得完了: %s", info['title'])
+        logger.debug("HTML長: %s", info['html_length'])
         
         return info
     
+    def analyze_dom_histogram(self) -> Dict[str, any]:
+        """
+        ブラウザ内で1回だけDOMを走査して、全タグの出現数と深さの統計を求める
+        
+        Returns:
+            tags（タグ名 → 個数）, total_elements, max_depth, avg_depth,
+            depth_histogram（深さ → 要素数）を持つ辞書
+        """
+        # 要素ごとにWebDriverへ問い合わせると往復が多いので、JavaScriptでまとめて数える
+        histogram = self.driver.execute_script("""
+            const tags = {};
+            const depths = {};
+            const stack = [[document.documentElement, 1]];
+            while (stack.length) {
+                const [el, depth] = stack.pop();
+                if (!el) continue;
+                const name = el.tagName.toLowerCase();
+                tags[name] = (tags[name] || 0) + 1;
+                depths[depth] = (depths[depth] || 0) + 1;
+                for (const child of el.children) stack.push([child, depth + 1]);
+            }
+            return {tags: tags, depths: depths};
+        """)
+        
+        tags = dict(sorted(histogram['tags'].items(), key=lambda item: (-item[1], item[0])))
+        depths = {int(d): n for d, n in histogram['depths'].items()}
+        total = sum(tags.values())
+        
+        return {
+            'tags': tags,
+            'total_elements': total,
+            'max_depth': max(depths) if depths else 0,
+            'avg_depth': sum(d * n for d, n in depths.items()) / total if total else 0.0,
+            'depth_histogram': dict(sorted(depths.items())),
+        }
+    
     def analyze_dom_structure(self) -> Dict[str, any]:
         """
         DOM構造を分析
@@ -173,7 +214,7 @@ class ScrapingSupport:
         Returns:
             DOM分析結果の辞書
         """
-        print("\n[DEBUG] ========== DOM構造分析 ==========")
+        echo("\n========== DOM構造分析 ==========")
         logger.info("DOM構造分析開始")
         
         analysis = {}
@@ -185,21 +226,26 @@ class ScrapingSupport:
             'form', 'input', 'button', 'select', 'textarea'
         ]
         
-        print("[DEBUG] 要素数をカウント中...")
+        echo("要素数をカウント中...")
+        
+        try:
+            # 全タグの統計を1回の走査で取得し、主要な要素だけを取り出す
+            histogram = self.analyze_dom_histogram()
+        except Exception as e:
+            echo("  カウント失敗 (%s)", e)
+            logger.warning("要素カウント失敗: %s", e)
+            return analysis
         
         for element in elements_to_count:
-            try:
-                # 要素を検索してカウント
-                count = len(self.driver.find_elements(By.TAG_NAME, element))
-                analysis[element] = count
-                
-                if count > 0:  # 存在する要素のみ表示
-                    print(f"[DEBUG]   <{element}>: {count}個")
-                    logger.debug(f"要素カウント: <{element}> = {count}")
-                    
-            except Exception as e:
-                print(f"[DEBUG]   <{element}>: カウント失敗 ({e})")
-                logger.warning(f"要素カウント失敗: <{element}>: {e}")
+            count = histogram['tags'].get(element, 0)
+            analysis[element] = count
+            
+            if count > 0:  # 存在する要素のみ表示
+                echo("  <%s>: %s個", element, count)
+                logger.debug("要素カウント: <%s> = %s", element, count)
+        
+        echo("全要素数: %s個 / 最大の深さ: %s",
+             format(histogram['total_elements'], ','), histogram['max_depth'])
         
         logger.info("DOM構造分析完了")
         return analysis
@@ -214,30 +260,31 @@ class ScrapingSupport:
         Returns:
             見つかった要素のリスト
         """
-        print(f"\n[DEBUG] クラス名で検索: '{class_name}'")
-        logger.info(f"クラス名検索: {class_name}")
+        echo("\nクラス名で検索: '%s'", class_name)
+        logger.info("クラス名検索: %s", class_name)
         
         try:
             # クラス名で要素を検索
             elements = self.driver.find_elements(By.CLASS_NAME, class_name)
             
-            print(f"[DEBUG] ✅ {len(elements)}個の要素が見つかりました")
-            logger.info(f"クラス名検索成功: {len(elements)}個発見")
+            echo("✅ %s個の要素が見つかりました", len(elements))
+            logger.info("クラス名検索成功: %s個発見", len(elements))
             
-            # 各要素の情報を表示
-            for i, element in enumerate(elements[:5], 1):  # 最初の5個のみ表示
-                text = element.text[:50] if element.text else "(テキストなし)"
-                print(f"[DEBUG]   [{i}] {text}...")
-                logger.debug(f"要素[{i}]: {text[:30]}...")
+            # 各要素の情報を表示（ブラウザへの問い合わせになるので、不要な場合は省略）
+            if previews_enabled(logger):
+                for i, element in enumerate(elements[:5], 1):  # 最初の5個のみ表示
+                    text = element.text[:50] if element.text else "(テキストなし)"
+                    echo("  [%s] %s...", i, text)
+                    logger.debug("要素[%s]: %s...", i, text[:30])
             
             if len(elements) > 5:
-                print(f"[DEBUG]   ... 他 {len(elements) - 5}個")
+                echo("  ... 他 %s個", len(elements) - 5)
             
             return elements
             
         except Exception as e:
-            print(f"[DEBUG] ❌ 検索失敗: {e}")
-            logger.error(f"クラス名検索失敗: {class_name}, エラー: {e}")
+            echo("❌ 検索失敗: %s", e)
+            logger.error("クラス名検索失敗: %s, エラー: %s", class_name, e)
             return []
     
     def find_elements_by_id(self, element_id: str):
@@ -250,29 +297,30 @@ class ScrapingSupport:
         Returns:
             見つかった要素（単一）またはNone
         """
-        print(f"\n[DEBUG] IDで検索: '{element_id}'")
-        logger.info(f"ID検索: {element_id}")
+        echo("\nIDで検索: '%s'", element_id)
+        logger.info("ID検索: %s", element_id)
         
         try:
             # IDで要素を検索（IDは一意なので単一要素）
             element = self.driver.find_element(By.ID, element_id)
             
-            print(f"[DEBUG] ✅ 要素が見つかりました")
-            print(f"[DEBUG]   タグ: {element.tag_name}")
-            print(f"[DEBUG]   テキスト: {element.text[:100] if element.text else '(なし)'}...")
+            echo("✅ 要素が見つかりました")
+            if previews_enabled(logger):
+                echo("  タグ: %s", element.tag_name)
+                echo("  テキスト: %s...", element.text[:100] if element.text else '(なし)')
+                logger.debug("要素タグ: %s", element.tag_name)
             
-            logger.info(f"ID検索成功: {element_id}")
-            logger.debug(f"要素タグ: {element.tag_name}")
+            logger.info("ID検索成功: %s", element_id)
             
             return element
             
-        except NoSuchElementException:
-            print(f"[DEBUG] ❌ 要素が見つかりません")
-            logger.warning(f"ID検索失敗: {element_id} (要素なし)")
+        except selenium_exceptions.NoSuchElementException:
+            echo("❌ 要素が見つかりません")
+            logger.warning("ID検索失敗: %s (要素なし)", element_id)
             return None
         except Exception as e:
-            print(f"[DEBUG] ❌ 検索失敗: {e}")
-            logger.error(f"ID検索エラー: {element_id}, エラー: {e}")
+            echo("❌ 検索失敗: %s", e)
+            logger.error("ID検索エラー: %s, エラー: %s", element_id, e)
             return None
     
     def find_elements_by_tag(self, tag_name: str) -> List:
@@ -285,21 +333,21 @@ class ScrapingSupport:
         Returns:
             見つかった要素のリスト
         """
-        print(f"\n[DEBUG] タグ名で検索: '<{tag_name}>'")
-        logger.info(f"タグ検索: {tag_name}")
+        echo("\nタグ名で検索: '<%s>'", tag_name)
+        logger.info("タグ検索: %s", tag_name)
         
         try:
             # タグ名で要素を検索
             elements = self.driver.find_elements(By.TAG_NAME, tag_name)
             
-            print(f"[DEBUG] ✅ {len(elements)}個の要素が見つかりました")
-            logger.info(f"タグ検索成功: {len(elements)}個発見")
+            echo("✅ %s個の要素が見つかりました", len(elements))
+            logger.info("タグ検索成功: %s個発見", len(elements))
             
             return elements
             
         except Exception as e:
-            print(f"[DEBUG] ❌ 検索失敗: {e}")
-            logger.error(f"タグ検索失敗: {tag_name}, エラー: {e}")
+            echo("❌ 検索失敗: %s", e)
+            logger.error("タグ検索失敗: %s, エラー: %s", tag_name, e)
             return []
     
     def find_all_links(self) -> List[Dict[str, str]]:
@@ -309,7 +357,7 @@ class ScrapingSupport:
         Returns:
             リンク情報のリスト
         """
-        print("\n[DEBUG] ========== リンク一覧 ==========")
+        echo("\n========== リンク一覧 ==========")
         logger.info("リンク取得開始")
         
         try:
@@ -318,8 +366,8 @@ class ScrapingSupport:
             
             link_data = []
             
-            print(f"[DEBUG] {len(links)}個のリンクが見つかりました")
-            logger.info(f"リンク数: {len(links)}")
+            echo("%s個のリンクが見つかりました", len(links))
+            logger.info("リンク数: %s", len(links))
             
             # 各リンクの情報を取得
             for i, link in enumerate(links[:10], 1):  # 最初の10個のみ表示
@@ -333,19 +381,19 @@ class ScrapingSupport:
                     }
                     link_data.append(link_info)
                     
-                    print(f"[DEBUG]   [{i}] {link_info['text'][:40]}")
-                    print(f"[DEBUG]       → {href}")
-                    logger.debug(f"リンク[{i}]: {text[:30]} -> {href}")
+                    echo("  [%s] %s", i, link_info['text'][:40])
+                    echo("      → %s", href)
+                    logger.debug("リンク[%s]: %s -> %s", i, text[:30], href)
             
             if len(links) > 10:
-                print(f"[DEBUG]   ... 他 {len(links) - 10}個")
+                echo("  ... 他 %s個", len(links) - 10)
             
-            logger.info(f"リンク取得完了: {len(link_data)}個")
+            logger.info("リンク取得完了: %s個", len(link_data))
             return link_data
             
         except Exception as e:
-            print(f"[DEBUG] ❌ リンク取得失敗: {e}")
-            logger.error(f"リンク取得エラー: {e}")
+            echo("❌ リンク取得失敗: %s", e)
+            logger.error("リンク取得エラー: %s", e)
             return []
     
     def find_all_images(self) -> List[Dict[str, str]]:
@@ -355,7 +403,7 @@ class ScrapingSupport:
         Returns:
             画像情報のリスト
         """
-        print("\n[DEBUG] ========== 画像一覧 ==========")
+        echo("\n========== 画像一覧 ==========")
         logger.info("画像取得開始")
         
         try:
@@ -364,8 +412,8 @@ class ScrapingSupport:
             
             image_data = []
             
-            print(f"[DEBUG] {len(images)}個の画像が見つかりました")
-            logger.info(f"画像数: {len(images)}")
+            echo("%s個の画像が見つかりました", len(images))
+            logger.info("画像数: %s", len(images))
             
             # 各画像の情報を取得
             for i, img in enumerate(images[:10], 1):  # 最初の10個のみ表示
@@ -379,19 +427,19 @@ class ScrapingSupport:
                     }
                     image_data.append(img_info)
                     
-                    print(f"[DEBUG]   [{i}] alt='{img_info['alt'][:40]}'")
-                    print(f"[DEBUG]       src: {src[:60]}...")
-                    logger.debug(f"画像[{i}]: alt={alt} -> {src[:50]}")
+                    echo("  [%s] alt='%s'", i, img_info['alt'][:40])
+                    echo("      src: %s...", src[:60])
+                    logger.debug("画像[%s]: alt=%s -> %s", i, alt, src[:50])
             
             if len(images) > 10:
-                print(f"[DEBUG]   ... 他 {len(images) - 10}個")
+                echo("  ... 他 %s個", len(images) - 10)
             
-            logger.info(f"画像取得完了: {len(image_data)}個")
+            logger.info("画像取得完了: %s個", len(image_data))
             return image_data
             
         except Exception as e:
-            print(f"[DEBUG] ❌ 画像取得失敗: {e}")
-            logger.error(f"画像取得エラー: {e}")
+            echo("❌ 画像取得失敗: %s", e)
+            logger.error("画像取得エラー: %s", e)
             return []
     
     def get_full_html(self, save_to_file: bool = True) -> str:
@@ -404,33 +452,45 @@ class ScrapingSupport:
         Returns:
             HTML文字列
         """
-        print("\n[DEBUG] ========== HTML取得 ==========")
+        echo("\n========== HTML取得 ==========")
         logger.info("HTML取得開始")
         
         try:
             # ページのHTMLを取得
             html = self.driver.page_source
             
-            print(f"[DEBUG] HTML長: {len(html):,} 文字")
-            logger.info(f"HTML取得成功: {len(html)}文字")
+            echo("HTML長: %s 文字", format(len(html), ','))
+            logger.info("HTML取得成功: %s文字", len(html))
             
-            if save_to_file:
-                # ファイル名を生成（タイムスタンプ付き）
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            if self.warc is not None:
+                # 描画後のDOMはHTTPレスポンスそのものではないのでresourceレコードにする
+                self.warc.write_resource(self.driver.current_url, html)
+                logger.debug("WARC書き込み: %s", self.driver.current_url)
+            
+            if save_to_file and self.snapshots is not None:
+                # 本文のハッシュをキーに圧縮して保存（同じ内容は1回だけ）
+                stored = self.snapshots.put(html, self.driver.current_url)
+                echo("✅ スナップショット保存: %s (%s)", stored['digest'][:12],
+                     "新規" if stored['new'] else "保存済みの内容と同一")
+                logger.info("スナップショット保存: %s", stored['digest'])
+            
+            elif save_to_file:
+                # ファイル名を生成（並列実行でも衝突しないようにマイクロ秒まで含める）
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
                 filename = f'scraped_html_{timestamp}.html'
                 
                 # ファイルに保存
                 with open(filename, 'w', encoding='utf-8') as f:
                     f.write(html)
                 
-                print(f"[DEBUG] ✅ HTMLをファイルに保存: {filename}")
-                logger.info(f"HTML保存完了: {filename}")
+                echo("✅ HTMLをファイルに保存: %s", filename)
+                logger.info("HTML保存完了: %s", filename)
             
             return html
             
         except Exception as e:
-            print(f"[DEBUG] ❌ HTML取得失敗: {e}")
-            logger.error(f"HTML取得エラー: {e}")
+            echo("❌ HTML取得失敗: %s", e)
+            logger.error("HTML取得エラー: %s", e)
             return ""
     
     def save_screenshot(self, filename: Optional[str] = None):
@@ -440,7 +500,7 @@ class ScrapingSupport:
         Args:
             filename: 保存するファイル名（省略時は自動生成）
         """
-        print("\n[DEBUG] ========== スクリーンショット ==========")
+        echo("\n========== スクリーンショット ==========")
         logger.info("スクリーンショット撮影開始")
         
         try:
@@ -452,12 +512,12 @@ class ScrapingSupport:
             # スクリーンショットを保存
             self.driver.save_screenshot(filename)
             
-            print(f"[DEBUG] ✅ スクリーンショット保存: {filename}")
-            logger.info(f"スクリーンショット保存完了: {filename}")
+            echo("✅ スクリーンショット保存: %s", filename)
+            logger.info("スクリーンショット保存完了: %s", filename)
             
         except Exception as e:
-            print(f"[DEBUG] ❌ スクリーンショット失敗: {e}")
-            logger.error(f"スクリーンショットエラー: {e}")
+            echo("❌ スクリーンショット失敗: %s", e)
+            logger.error("スクリーンショットエラー: %s", e)
     
     def generate_scraping_code(self, target_element: str) -> str:
         """
@@ -469,8 +529,8 @@ class ScrapingSupport:
         Returns:
             サンプルコード（文字列）
         """
-        print("\n[DEBUG] ========== サンプルコード生成 ==========")
-        logger.info(f"サンプルコード生成: {target_element}")
+        echo("\n========== サンプルコード生成 ==========")
+        logger.info("サンプルコード生成: %s", target_element)
         
         code = f"""
 # ===== Seleniumスクレイピングサンプルコード =====
@@ -507,7 +567,7 @@ finally:
     driver.quit()
 """
         
-        print("[DEBUG] サンプルコード:")
+        echo("サンプルコード:")
         print(code)
         logger.debug("サンプルコード生成完了")
         
@@ -516,10 +576,10 @@ finally:
     def close(self):
         """ブラウザを閉じる"""
         if self.driver:
-            print("\n[DEBUG] ブラウザを閉じます")
+            echo("\nブラウザを閉じます")
             logger.info("ブラウザクローズ")
             self.driver.quit()
-            print("[DEBUG] ✅ ブラウザを閉じました")
+            echo("✅ ブラウザを閉じました")
             logger.info("ブラウザクローズ完了")
 
 
@@ -527,20 +587,36 @@ finally:
 # メイン実行部分
 # ============================================
 
-def main():
+def main(argv: Optional[List[str]] = None):
     """メイン関数"""
+    parser = argparse.ArgumentParser(description="Selenium スクレイピングサポートツール")
+    parser.add_argument('--verbosity', default='debug', choices=VERBOSITY_MODES,
+                        help="出力モード（debug: 従来どおり / info, silent: 表示なし / structured: JSONログ）")
+    parser.add_argument('--log-file', default=LOG_FILE, help="ログファイルのパス（空文字で出力しない）")
+    parser.add_argument('--log-background', action='store_true',
+                        help="ログの書き込みを別スレッドで行う")
+    parser.add_argument('--snapshot-dir',
+                        help="HTMLを圧縮・重複排除して保存するスナップショットストア（省略時はファイルに保存）")
+    parser.add_argument('--warc-dir', help="取得したHTMLをWARC（.warc.gz）で保存するディレクトリ")
+    args = parser.parse_args(argv)
+    
+    configure_logging(args.verbosity, args.log_file or None, args.log_background)
+    
+    snapshots = html_snapshot_store.SnapshotStore(args.snapshot_dir) if args.snapshot_dir else None
+    warc = html_warc.WARCWriter(args.warc_dir) if args.warc_dir else None
+    
     print("=" * 70)
     print("🔍 Selenium スクレイピングサポートツール")
     print("=" * 70)
     logger.info("プログラム開始")
     
     # スクレイピングサポートインスタンスを作成
-    scraper = ScrapingSupport(headless=False)  # False=ブラウザ表示、True=非表示
+    scraper = ScrapingSupport(headless=False, snapshots=snapshots, warc=warc)  # False=ブラウザ表示、True=非表示
     
     try:
         # ドライバーを起動
         if not scraper.start_driver():
-            print("[DEBUG] ❌ ドライバー起動に失敗しました")
+            echo("❌ ドライバー起動に失敗しました")
             return
         
         # スクレイピング対象のURL（ここを変更してください）
@@ -549,7 +625,7 @@ def main():
         
         # URLを開く
         if not scraper.open_url(url):
-            print("[DEBUG] ❌ URLを開けませんでした")
+            echo("❌ URLを開けませんでした")
             return
         
         # ページ基本情報を取得
@@ -577,18 +653,25 @@ def main():
         print("✅ 分析完了！")
         print("=" * 70)
         print(f"📄 ログファイル: scraping.log")
-        print(f"💾 HTMLファイル: scraped_html_*.html")
+        if snapshots is not None:
+            print(f"💾 スナップショット: {args.snapshot_dir}")
+        else:
+            print(f"💾 HTMLファイル: scraped_html_*.html")
         print(f"📸 スクリーンショット: screenshot_*.png")
         
         logger.info("分析完了")
         
     except Exception as e:
-        print(f"\n[DEBUG] ❌ エラー発生: {e}")
-        logger.error(f"予期しないエラー: {e}", exc_info=True)
+        echo("\n❌ エラー発生: %s", e)
+        logger.error("予期しないエラー: %s", e, exc_info=True)
     
     finally:
         # ブラウザを閉じる
         scraper.close()
+        if snapshots is not None:
+            snapshots.close()
+        if warc is not None:
+            warc.close()
         logger.info("プログラム終了")
 
 
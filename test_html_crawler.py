@@ -0,0 +1,181 @@
+# ============================================
+# テストコード - クローラー（アクセス間隔・robots.txt）
+# ============================================
+
+import threading  # pop()の待機を確かめる用
+import time  # アクセス間隔の計測用
+
+import pytest
+import requests
+
+from html_crawler import Crawler, Frontier, RobotsCache
+
+ROBOTS = 'User-agent: *\nDisallow: /private\nCrawl-delay: 2\n'
+
+
+def html(*links) -> bytes:
+    body = ''.join(f'<a href="{href}">{href}</a>' for href in links)
+    return f'<html><head><title>t</title></head><body>{body}</body></html>'.encode('utf-8')
+
+
+def static(body: bytes, status: int = 200, content_type: str = 'text/html; charset=utf-8'):
+    return lambda _headers: (status, {'Content-Type': content_type}, body)
+
+
+# --------------------------------------------
+# Frontier
+# --------------------------------------------
+
+def pop_times(frontier, count):
+    """count件をpop()して、(url, 取り出した時刻) の一覧を返す"""
+    popped = []
+    for _ in range(count):
+        url, _depth = frontier.pop()
+        popped.append((url, time.monotonic()))
+        frontier.done()
+    return popped
+
+
+def test_same_host_requests_are_spaced():
+    frontier = Frontier(delay=0.2)
+    for i in range(3):
+        frontier.push(f'http://a/{i}', 0, 'a')
+
+    popped = pop_times(frontier, 3)
+
+    assert [url for url, _at in popped] == ['http://a/0', 'http://a/1', 'http://a/2']
+    gaps = [b - a for (_u, a), (_v, b) in zip(popped, popped[1:])]
+    assert all(gap >= 0.19 for gap in gaps)
+    assert frontier.pop() is None  # 空で処理中も無ければ終了
+
+
+def test_other_hosts_do_not_wait():
+    """あるホストの待ち時間中でも、別のホストのURLはすぐに取り出せる"""
+    frontier = Frontier(delay=5.0)
+    frontier.push('http://a/1', 0, 'a')
+    frontier.push('http://a/2', 0, 'a')
+    frontier.push('http://b/1', 0, 'b')
+
+    start = time.monotonic()
+    urls = [url for url, _at in pop_times(frontier, 2)]
+
+    assert sorted(urls) == ['http://a/1', 'http://b/1']
+    assert time.monotonic() - start < 1.0
+    assert len(frontier) == 1
+    assert frontier.hosts() == 1
+
+
+def test_crawl_delay_cannot_shorten_default():
+    frontier = Frontier(delay=0.3)
+    frontier.set_delay('a', 0.0)
+    for i in range(2):
+        frontier.push(f'http://a/{i}', 0, 'a')
+
+    (_u, first), (_v, second) = pop_times(frontier, 2)
+    assert second - first >= 0.29
+
+
+def test_pop_waits_for_urls_from_pages_in_progress():
+    """処理中のページがある間は、空でもそのページのリンクを待つ"""
+    frontier = Frontier(delay=0.0)
+    frontier.push('http://a/0', 0, 'a')
+    assert frontier.pop() == ('http://a/0', 0)
+
+    def finish_page():
+        time.sleep(0.1)
+        frontier.push('http://a/1', 1, 'a')
+        frontier.done()
+
+    threading.Thread(target=finish_page).start()
+    assert frontier.pop() == ('http://a/1', 1)
+    frontier.done()
+    assert frontier.pop() is None
+
+
+def test_close_stops_pop_and_push():
+    frontier = Frontier(delay=0.0)
+    frontier.push('http://a/0', 0, 'a')
+    frontier.close()
+
+    assert frontier.pop() is None
+    assert not frontier.push('http://a/1', 0, 'a')
+
+
+# --------------------------------------------
+# RobotsCache
+# --------------------------------------------
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def test_robots_rules_and_crawl_delay(http_server, session):
+    http_server.routes['/robots.txt'] = static(ROBOTS.encode('ascii'), content_type='text/plain')
+    robots = RobotsCache(session)
+
+    assert robots.allowed(http_server.url('/public'))
+    assert not robots.allowed(http_server.url('/private/page'))
+    assert robots.crawl_delay(http_server.url('/')) == 2.0
+    assert robots.fetches == 1  # ホストごとに1回だけ取得する
+    assert http_server.paths() == ['/robots.txt']
+
+
+@pytest.mark.parametrize('status, allowed', [(404, True), (500, True), (401, False), (403, False)])
+def test_robots_status_codes(http_server, session, status, allowed):
+    http_server.routes['/robots.txt'] = static(b'', status=status)
+    robots = RobotsCache(session)
+
+    assert robots.allowed(http_server.url('/page')) is allowed
+    assert robots.crawl_delay(http_server.url('/page')) is None
+
+
+def test_robots_unreachable_host_allows_all(session):
+    robots = RobotsCache(session, timeout=1)
+
+    assert robots.allowed('http://127.0.0.1:9/page')  # 接続できなければ全許可
+
+
+def test_robots_expires(http_server, session):
+    http_server.routes['/robots.txt'] = static(ROBOTS.encode('ascii'), content_type='text/plain')
+    robots = RobotsCache(session, max_age=0.0)
+
+    robots.allowed(http_server.url('/a'))
+    robots.allowed(http_server.url('/b'))
+    assert robots.fetches == 2
+
+
+# --------------------------------------------
+# Crawler
+# --------------------------------------------
+
+def test_crawl_follows_links_and_respects_robots(http_server):
+    http_server.routes.update({
+        '/robots.txt': static(b'User-agent: *\nDisallow: /private\n', content_type='text/plain'),
+        '/': static(html('/a', '/b', '/private/x', 'http://other.example/')),
+        '/a': static(html('/', '/b', '/c')),
+        '/b': static(html('/a')),
+        '/c': static(html()),
+    })
+
+    stats = Crawler([http_server.url('/')], workers=2, delay=0.0, max_depth=3).run()
+
+    assert stats['pages'] == 4
+    assert stats['failed'] == 0
+    assert stats['robots_blocked'] == 1
+    assert '/private/x' not in http_server.paths()
+    assert http_server.paths().count('/robots.txt') == 1
+    assert sorted(path for path in http_server.paths() if path != '/robots.txt') == ['/', '/a', '/b', '/c']
+
+
+def test_crawl_stops_at_max_pages_and_depth(http_server):
+    http_server.routes.update({f'/{i}': static(html(f'/{i + 1}')) for i in range(10)})
+
+    by_depth = Crawler([http_server.url('/0')], workers=1, delay=0.0, max_depth=2,
+                       respect_robots=False).run()
+    assert by_depth['pages'] == 3
+
+    by_pages = Crawler([http_server.url('/0')], workers=2, delay=0.0, max_pages=4, max_depth=None,
+                       respect_robots=False).run()
+    assert by_pages['pages'] == 4
@@ -0,0 +1,96 @@
+# ============================================
+# テストコード - 差分検出（diff_document）と指紋の保存
+# ============================================
+
+import json  # 指紋ファイルの書き換え用
+
+import pytest
+from bs4 import BeautifulSoup
+
+from html_parser_no_driver import diff_document, load_fingerprints, save_fingerprints
+
+BASE_URL = 'http://example.com/'
+
+
+def listing(items) -> str:
+    """idの無い<li>が並ぶ一覧ページ（兄弟のキーが位置で決まる）"""
+    rows = ''.join(
+        f'<li><a href="/item/{i}">商品{i}</a> <span>説明{i}</span><b>a</b><i>b</i><em>c</em><u>d</u></li>'
+        for i in items
+    )
+    return f'<html><body><ul>{rows}</ul></body></html>'
+
+
+def diff(html: str, previous=None) -> dict:
+    return diff_document(BeautifulSoup(html, 'html.parser'), previous, BASE_URL)
+
+
+@pytest.fixture
+def base_items():
+    return list(range(20))
+
+
+@pytest.fixture
+def previous(base_items):
+    """一覧ページの初回の指紋"""
+    first = diff(listing(base_items))
+    assert first['new'] and first['regions'] == []
+    return first['fingerprint']
+
+
+def test_unchanged(base_items, previous):
+    result = diff(listing(base_items), previous)
+    assert not result['changed']
+    assert result['regions'] == []
+    assert result['fingerprint'] is previous  # 変化の無い木は前回の指紋をそのまま使う
+
+
+def test_moved_sibling_is_not_a_change(base_items, previous):
+    result = diff(listing(base_items[1:] + base_items[:1]), previous)
+    assert result['regions'] == []
+    assert result['links_added'] == [] and result['links_removed'] == []
+
+
+def test_inserted_sibling(base_items, previous):
+    result = diff(listing([99] + base_items), previous)
+    assert [(r['path'], r['change']) for r in result['regions']] == [('/html/body/ul/li', 'added')]
+    assert result['links_added'] == [BASE_URL + 'item/99']
+    assert result['links_removed'] == []
+
+
+def test_deleted_sibling(base_items, previous):
+    result = diff(listing([i for i in base_items if i != 5]), previous)
+    assert [(r['path'], r['change']) for r in result['regions']] == [('/html/body/ul/li[6]', 'removed')]
+    assert result['links_removed'] == [BASE_URL + 'item/5']
+
+
+def test_edited_sibling(base_items, previous):
+    result = diff(listing([77 if i == 7 else i for i in base_items]), previous)
+    assert [(r['path'], r['change']) for r in result['regions']] == [('/html/body/ul/li[8]', 'changed')]
+    assert result['links_added'] == [BASE_URL + 'item/77']
+    assert result['links_removed'] == [BASE_URL + 'item/7']
+
+
+def test_fingerprints_round_trip(tmp_path, base_items, previous):
+    path = str(tmp_path / 'fingerprints.json')
+    save_fingerprints(path, {BASE_URL: previous})
+    loaded = load_fingerprints(path)
+    assert loaded[BASE_URL] == previous
+    assert diff(listing(base_items), loaded[BASE_URL])['regions'] == []
+
+
+def test_missing_fingerprints_file_is_empty(tmp_path):
+    assert load_fingerprints(str(tmp_path / 'none.json')) == {}
+
+
+@pytest.mark.parametrize('content', [
+    b'\x80\x04\x95not json',  # pickleなどJSON以外
+    json.dumps({'version': 1, 'pages': {BASE_URL: ['00', '00', 'links', None]}}).encode(),
+    json.dumps({'version': 1, 'pages': {BASE_URL: ['zz', '00', [], None]}}).encode(),
+    json.dumps({'version': 99, 'pages': {}}).encode(),
+])
+def test_invalid_fingerprints_file_is_rejected(tmp_path, content):
+    path = tmp_path / 'fingerprints.json'
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        load_fingerprints(str(path))
@@ -0,0 +1,127 @@
+# ============================================
+# テストコード - エンコーディング判定（detect_encoding）と逐次デコード
+# ============================================
+
+import codecs  # BOM用
+
+import pytest
+
+from html_parser_no_driver import (DETECT_SCAN_BYTES, SNIFF_BYTES, HTMLAnalyzer,
+                                   IncrementalHTMLDecoder, detect_encoding)
+
+TEXT = 'こんにちは、これは日本語のページです。カタカナもあります。'
+
+
+def page(body: str, head: str = '') -> str:
+    return f'<html><head>{head}<title>t</title></head><body><p>{body}</p></body></html>'
+
+
+def test_bom_wins_over_everything():
+    data = codecs.BOM_UTF8 + page(TEXT, '<meta charset="euc-jp">').encode('utf-8')
+
+    guess = detect_encoding(data, 'shift_jis')
+    assert (guess.encoding, guess.source) == ('utf-8-sig', 'bom')
+
+
+@pytest.mark.parametrize('encoding', ['utf-16-le', 'utf-16-be'])
+def test_utf16_bom(encoding):
+    bom = codecs.BOM_UTF16_LE if encoding.endswith('le') else codecs.BOM_UTF16_BE
+    guess = detect_encoding(bom + page(TEXT).encode(encoding))
+
+    assert (guess.encoding, guess.source) == ('utf-16', 'bom')
+
+
+def test_declared_header_wins_over_meta():
+    data = page(TEXT, '<meta charset="utf-8">').encode('euc_jp')
+
+    guess = detect_encoding(data, 'EUC-JP')
+    assert (guess.encoding, guess.source) == ('euc_jp', 'header')
+
+
+def test_latin1_header_is_ignored():
+    """requestsの既定値ISO-8859-1は宣言として扱わず、本文から判定する"""
+    data = page(TEXT, '<meta charset="Shift_JIS">').encode('cp932')
+
+    guess = detect_encoding(data, 'ISO-8859-1')
+    assert (guess.encoding, guess.source) == ('cp932', 'meta')
+
+
+@pytest.mark.parametrize('declared, codec, expected', [
+    ('Shift_JIS', 'cp932', 'cp932'),
+    ('euc-jp', 'euc_jp', 'euc_jp'),
+    ('utf-8', 'utf-8', 'utf-8'),
+])
+def test_meta_charset(declared, codec, expected):
+    data = page(TEXT, f'<meta http-equiv="Content-Type" content="text/html; charset={declared}">').encode(codec)
+
+    guess = detect_encoding(data)
+    assert (guess.encoding, guess.source) == (expected, 'meta')
+
+
+def test_meta_after_sniff_window_is_not_used():
+    """<meta>は先頭SNIFF_BYTESの中だけを見る"""
+    data = ('<!--' + ' ' * SNIFF_BYTES + '-->' + page(TEXT, '<meta charset="utf-8">')).encode('cp932')
+
+    assert detect_encoding(data).source == 'detected'
+
+
+@pytest.mark.parametrize('codec, expected', [
+    ('cp932', 'cp932'),
+    ('euc_jp', 'euc_jp'),
+    ('utf-8', 'utf-8'),
+    ('iso2022_jp', 'iso2022_jp'),
+])
+def test_guess_japanese_without_declaration(codec, expected):
+    guess = detect_encoding(page(TEXT).encode(codec))
+
+    assert (guess.encoding, guess.source) == (expected, 'detected')
+
+
+def test_guess_after_large_ascii_prefix():
+    """先頭に大きなscriptがあっても、後ろの非ASCIIバイトから判定する"""
+    script = '<script>' + 'var a = 1;\n' * (DETECT_SCAN_BYTES // 5) + '</script>'
+    data = page(TEXT, script).encode('cp932')
+    assert len(data) > 2 * DETECT_SCAN_BYTES
+
+    assert detect_encoding(data).encoding == 'cp932'
+
+
+def test_ascii_only_is_utf8():
+    guess = detect_encoding(page('hello').encode('ascii'))
+
+    assert (guess.encoding, guess.source) == ('utf-8', 'ascii')
+
+
+def test_undecidable_falls_back_to_utf8():
+    """どの日本語エンコーディングでも正しくない場合はUTF-8"""
+    guess = detect_encoding(page('caf\xe9 au lait').encode('latin-1'))
+
+    assert (guess.encoding, guess.source) == ('utf-8', 'default')
+
+
+@pytest.mark.parametrize('codec', ['cp932', 'euc_jp', 'utf-8'])
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_incremental_decoder_matches_whole_decode(codec, chunk_size):
+    """少しずつ渡しても、全体を判定してデコードした場合と同じ文字列になる"""
+    data = page(TEXT * 50, '<script>' + 'x' * SNIFF_BYTES + '</script>').encode(codec)
+    decoder = IncrementalHTMLDecoder()
+
+    pieces = [decoder.decode(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    pieces.append(decoder.decode(b'', final=True))
+
+    assert decoder.encoding == detect_encoding(data).encoding
+    assert ''.join(pieces) == data.decode(decoder.encoding)
+
+
+@pytest.mark.parametrize('keep_html', [False, True])
+def test_load_from_file_detects_encoding(tmp_path, keep_html):
+    path = tmp_path / 'sjis.html'
+    data = page(TEXT).encode('cp932')
+    path.write_bytes(data)
+    analyzer = HTMLAnalyzer()
+
+    assert analyzer.load_from_file(str(path), keep_html=keep_html)
+    assert (analyzer.encoding, analyzer.encoding_source) == ('cp932', 'detected')
+    assert analyzer.soup.p.string == TEXT
+    assert analyzer.html == data.decode('cp932')
+    assert analyzer.html_length == len(analyzer.html)
@@ -0,0 +1,138 @@
+# ============================================
+# テストコード - 解析結果の書き出し（JSONL / CSVの追記とヘッダー確認）
+# ============================================
+
+import csv  # 出力したCSVの読み込み用
+import json  # 出力したJSONLの読み込み用
+
+import pytest
+
+import html_export
+from html_export import LINK_COLUMNS, PAGE_COLUMNS, AnalysisExporter, open_sink
+from html_parser_no_driver import EXPORT_FORMATS
+
+LINKS = [
+    {'href': 'http://example.com/a', 'text': 'A', 'original_href': '/a'},
+    {'href': 'http://example.com/b', 'text': '', 'original_href': '/b', 'extra': 'ignored'},
+]
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_cli_formats_match_exporter():
+    """CLIの選択肢（html_exportを読み込まずに定義）とFORMATSが一致する"""
+    assert EXPORT_FORMATS == tuple(html_export.FORMATS)
+
+
+def test_jsonl_append(tmp_path):
+    path = str(tmp_path / 'links')
+    with open_sink(path, LINK_COLUMNS, 'jsonl') as sink:
+        assert sink.write_many(LINKS) == 2
+    with open_sink(path, LINK_COLUMNS, 'jsonl', append=True) as sink:
+        sink.write({'href': 'http://example.com/c'})
+
+    rows = read_jsonl(path + '.jsonl')
+    assert [row['href'] for row in rows] == ['http://example.com/a', 'http://example.com/b',
+                                             'http://example.com/c']
+    assert list(rows[0]) == [name for name, _type in LINK_COLUMNS]  # キーは列の順、余分なキーは捨てる
+    assert rows[2]['text'] is None
+
+
+def test_jsonl_overwrite_without_append(tmp_path):
+    path = str(tmp_path / 'links.jsonl')
+    for _ in range(2):
+        with open_sink(path, LINK_COLUMNS, 'jsonl') as sink:
+            sink.write_many(LINKS)
+
+    assert len(read_jsonl(path)) == 2
+
+
+def test_csv_header_written_once_on_append(tmp_path):
+    path = str(tmp_path / 'pages.csv')
+    with open_sink(path, PAGE_COLUMNS, 'csv') as sink:
+        sink.write({'source': 's1', 'html_length': '120', 'title': 'タイトル'})
+    with open_sink(path, PAGE_COLUMNS, 'csv', append=True) as sink:
+        sink.write({'source': 's2', 'html_length': 7})
+
+    header, first, second = read_csv(path)
+    assert tuple(header) == tuple(name for name, _type in PAGE_COLUMNS)
+    assert first[header.index('title')] == 'タイトル'
+    assert first[header.index('html_length')] == '120'
+    assert second[header.index('source')] == 's2'
+    assert second[header.index('title')] == ''  # Noneは空欄
+
+
+def test_csv_append_to_empty_file_writes_header(tmp_path):
+    path = tmp_path / 'links.csv'
+    path.write_text('')
+    with open_sink(str(path), LINK_COLUMNS, 'csv', append=True) as sink:
+        sink.write_many(LINKS)
+
+    assert len(read_csv(str(path))) == 3
+
+
+def test_csv_append_with_different_columns_is_rejected(tmp_path):
+    path = str(tmp_path / 'table.csv')
+    with open_sink(path, LINK_COLUMNS, 'csv') as sink:
+        sink.write_many(LINKS)
+
+    with pytest.raises(ValueError):
+        open_sink(path, PAGE_COLUMNS, 'csv', append=True)
+    assert len(read_csv(path)) == 3  # 既存のファイルは変更しない
+
+
+def test_buffered_rows_are_written_on_flush(tmp_path):
+    path = str(tmp_path / 'links.jsonl')
+    sink = open_sink(path, LINK_COLUMNS, 'jsonl', buffer_rows=10)
+    sink.write_many(LINKS)
+    assert read_jsonl(path) == []
+
+    sink.flush()
+    assert len(read_jsonl(path)) == 2
+    sink.close()
+    sink.close()  # 何度呼んでもよい
+
+    with pytest.raises(ValueError):
+        sink.write(LINKS[0])
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / 'x'), LINK_COLUMNS, 'xml')
+
+
+@pytest.mark.parametrize('fmt', ['jsonl', 'csv'])
+def test_exporter_tables(tmp_path, fmt):
+    """1ページ分の結果がsource列で結び付いた4つの表に分かれる"""
+    with AnalysisExporter(str(tmp_path), fmt, structure_elements=('p', 'a')) as exporter:
+        written = exporter.write_page(
+            'page.html', {'url': 'file://page.html', 'title': 't', 'html_length': 10},
+            {'p': 3, 'a': 2}, iter(LINKS), [], {'encoding': 'utf-8'})
+        paths = exporter.paths
+
+    assert written == {'pages': 1, 'structure': 1, 'links': 2, 'images': 0}
+    if fmt == 'jsonl':
+        assert read_jsonl(paths['pages'])[0]['encoding'] == 'utf-8'
+        assert read_jsonl(paths['structure']) == [{'source': 'page.html', 'p': 3, 'a': 2}]
+        assert {row['source'] for row in read_jsonl(paths['links'])} == {'page.html'}
+    else:
+        assert read_csv(paths['structure']) == [['source', 'p', 'a'], ['page.html', '3', '2']]
+        assert len(read_csv(paths['images'])) == 1  # ヘッダーのみ
+
+
+@pytest.mark.skipif(not html_export.HAS_PYARROW, reason="pyarrow未インストール")
+def test_parquet_cannot_append(tmp_path):
+    path = str(tmp_path / 'links.parquet')
+    with open_sink(path, LINK_COLUMNS, 'parquet') as sink:
+        sink.write_many(LINKS)
+
+    with pytest.raises(ValueError):
+        open_sink(path, LINK_COLUMNS, 'parquet', append=True)
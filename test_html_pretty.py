@@ -0,0 +1,79 @@
+# ============================================
+# 整形出力（iter_pretty_lines）のテスト
+# prettify()と1行ずつ同じ内容になることを、パーサーと文書の組み合わせごとに確かめる
+# ============================================
+
+import bs4
+import pytest
+
+import html_parser_no_driver as parser_module
+from html_parser_no_driver import HTMLAnalyzer, available_parsers, iter_pretty_lines
+
+
+DOCUMENTS = {
+    'sample': parser_module._PRETTY_SAMPLE,
+    'attributes': (
+        '<html><body><input type="checkbox" disabled class="a  b c" data-x=\'"q"\' value="&lt;&amp;">'
+        '<a href="/x?a=1&b=2" title="it\'s">リンク&nbsp;テキスト</a></body></html>'
+    ),
+    'whitespace': (
+        '<div>\n  <pre>  1\n <b> 2 </b>\n</pre>\n  <p>   text   <span> s </span>  </p>\n'
+        '<textarea>\n  keep  </textarea><pre><pre>nested</pre></pre></div>'
+    ),
+    'namespaces': (
+        '<html><body><svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 1 1">'
+        '<use xlink:href="#a" xmlns:xlink="http://www.w3.org/1999/xlink"></use></svg>'
+        '<math><mi>x</mi></math></body></html>'
+    ),
+    'fragment': '<p>a<br/>b<hr>c<!-- note --><![CDATA[x]]></p>テキスト<p></p>',
+    'empty': '',
+}
+
+
+@pytest.fixture(params=available_parsers())
+def parser(request):
+    return request.param
+
+
+@pytest.mark.parametrize('name', DOCUMENTS)
+def test_pretty_pieces_match_prettify(parser, name):
+    """公開APIで組み立てた断片をつなげるとprettify()と一致する"""
+    soup = bs4.BeautifulSoup(DOCUMENTS[name], parser)
+    formatter = soup.formatter_for_name('minimal')
+
+    assert ''.join(parser_module._pretty_pieces(soup, formatter)) == soup.prettify()
+
+
+@pytest.mark.parametrize('name', DOCUMENTS)
+@pytest.mark.parametrize('formatter', ['minimal', 'html', 'html5'])
+def test_iter_pretty_lines_matches_prettify(parser, name, formatter):
+    """iter_pretty_linesの各行がprettify()を行に分けたものと同じ"""
+    soup = bs4.BeautifulSoup(DOCUMENTS[name], parser)
+
+    assert list(iter_pretty_lines(soup, formatter)) == soup.prettify(formatter=formatter).splitlines()
+
+
+def test_streaming_is_used(parser):
+    """このbs4ではprettify()に戻らず逐次出力を使う"""
+    assert parser_module._streaming_pretty_supported(parser)
+
+
+def test_tag_subtree(parser):
+    """文書全体ではなくTagを渡した場合もprettify()と同じ"""
+    soup = bs4.BeautifulSoup(DOCUMENTS['attributes'], parser)
+
+    assert list(iter_pretty_lines(soup.body)) == soup.body.prettify().splitlines()
+
+
+def test_analyzer_pretty_print_slices(capsys):
+    """pretty_printの先頭・末尾の行がprettify()の行と一致する"""
+    lines = bs4.BeautifulSoup(DOCUMENTS['sample'], 'html.parser').prettify().splitlines()
+    analyzer = HTMLAnalyzer()
+    analyzer.soup = bs4.BeautifulSoup(DOCUMENTS['sample'], 'html.parser')
+
+    assert list(analyzer.iter_pretty_lines(2, 6)) == lines[2:6]
+
+    analyzer.pretty_print(head=3, tail=2)
+    output = capsys.readouterr().out
+    for line in lines[:3] + lines[-2:]:
+        assert line in output
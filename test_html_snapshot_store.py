@@ -0,0 +1,94 @@
+# ============================================
+# テストコード - スナップショットストア（圧縮方式ごとの保存・読み込み・履歴）
+# ============================================
+
+import hashlib  # digestの確認用
+
+import pytest
+
+from html_snapshot_store import HAS_ZSTD, SnapshotStore, train_dictionary
+
+CODECS = [
+    'gzip',
+    'zlib',
+    pytest.param('zstd', marks=pytest.mark.skipif(not HAS_ZSTD, reason="zstandard未インストール")),
+]
+
+HEADER = '<header><nav><a href="/">トップ</a> <a href="/about">会社概要</a></nav></header>'
+FOOTER = '<footer><p>Copyright example.com All rights reserved.</p></footer>'
+
+
+def site_page(i: int) -> str:
+    """ヘッダー・フッターが共通の同じサイトのページ"""
+    return f'<html>\n<body>\n{HEADER}\n<main><h1>記事{i}</h1><p>本文{i}</p></main>\n{FOOTER}\n</body>\n</html>'
+
+
+@pytest.fixture(params=CODECS)
+def store(request, tmp_path):
+    with SnapshotStore(str(tmp_path), codec=request.param) as store:
+        yield store
+
+
+def test_put_and_get(store):
+    html = site_page(1)
+    stored = store.put(html, 'http://example.com/1')
+
+    assert stored['digest'] == hashlib.sha256(html.encode('utf-8')).hexdigest()
+    assert stored['new']
+    assert stored['size'] == len(html.encode('utf-8'))
+    assert stored['path'].endswith({'gzip': '.gz', 'zlib': '.zz', 'zstd': '.zst'}[store.codec])
+    assert store.get(stored['digest']) == html
+
+
+def test_same_body_is_stored_once(store):
+    first = store.put(site_page(1), 'http://example.com/1', fetched_at=100.0)
+    second = store.put(site_page(1), 'http://example.com/1', fetched_at=200.0)
+
+    assert not second['new']
+    assert second['digest'] == first['digest']
+    assert store.stats()['snapshots'] == 2
+    assert store.stats()['blobs'] == 1
+
+
+def test_history_and_latest(store):
+    url = 'http://example.com/1'
+    store.put(site_page(2), url, fetched_at=200.0)
+    store.put(site_page(1), url, fetched_at=100.0)
+    store.put(site_page(3), url, fetched_at=300.0)
+    store.put(site_page(9), 'http://example.com/other', fetched_at=400.0)
+
+    history = store.history(url)
+    assert [entry['fetched_at'] for entry in history] == [100.0, 200.0, 300.0]
+    assert [store.get(entry['digest']) for entry in history] == [site_page(1), site_page(2), site_page(3)]
+    assert store.latest(url)['fetched_at'] == 300.0
+    assert store.latest(url, before=250.0)['fetched_at'] == 200.0
+    assert store.latest(url, before=50.0) is None
+    assert store.history('http://example.com/none') == []
+
+
+def test_dictionary_round_trip(store, tmp_path):
+    """辞書付きで保存した本文は、開き直したストアでも辞書を読み込んで展開できる"""
+    samples = [site_page(i) for i in range(20)]
+    dictionary_id = store.train(samples)
+    stored = store.put(site_page(100), 'http://example.com/100')
+    plain_size = SnapshotStore(str(tmp_path / 'plain'), codec=store.codec).put(site_page(100))['stored_size']
+
+    assert stored['stored_size'] < plain_size
+    if store.codec == 'gzip':
+        assert stored['path'].endswith('.zz')  # gzip形式は辞書を持てないのでzlibにする
+    store.close()
+
+    with SnapshotStore(str(tmp_path), codec=store.codec) as reopened:
+        assert reopened.dictionary_id is None
+        assert reopened.get(stored['digest']) == site_page(100)
+        assert reopened._dictionary(dictionary_id) == train_dictionary(samples)
+
+
+def test_unknown_digest(store):
+    with pytest.raises(KeyError):
+        store.get('0' * 64)
+
+
+def test_unknown_codec(tmp_path):
+    with pytest.raises(ValueError):
+        SnapshotStore(str(tmp_path), codec='brotli')
@@ -0,0 +1,111 @@
+# ============================================
+# テストコード - WARCの書き込みと読み込み（往復）
+# ============================================
+
+import gzip  # レコード単位のgzipメンバーの確認用
+
+import pytest
+
+from html_warc import WARCWriter, iter_records
+
+URL = 'http://example.com/ページ?q=1'
+BODY = '<html><body><p>日本語</p></body></html>'.encode('utf-8')
+
+
+@pytest.fixture
+def writer(tmp_path):
+    with WARCWriter(str(tmp_path / 'warc')) as writer:
+        yield writer
+
+
+def read_all(writer):
+    writer.close()
+    return [record for path in writer.paths for record in iter_records(path)]
+
+
+def test_response_round_trip(writer):
+    writer.write_response(URL, 200, 'OK',
+                          [('Content-Type', 'text/html; charset=utf-8'), ('X-Name', 'caf\xe9')],
+                          BODY, [('User-Agent', 'test')])
+
+    warcinfo, response, request = read_all(writer)
+
+    assert warcinfo.type == 'warcinfo'
+    assert response.type == 'response'
+    assert response.url == URL
+    assert response.status == 200
+    assert response.payload == BODY
+    assert response.http_headers['content-type'] == 'text/html; charset=utf-8'
+    assert response.http_headers['x-name'] == 'caf\xe9'  # latin-1のまま往復する
+    assert response.http_headers['content-length'] == str(len(BODY))
+    assert response.headers['WARC-Payload-Digest'].startswith('sha1:')
+
+    assert request.type == 'request'
+    assert request.headers['WARC-Concurrent-To'] == response.headers['WARC-Record-ID']
+    assert b'\r\nUser-Agent: test\r\n' in request.payload
+
+
+def test_header_values_are_written_as_latin1(writer):
+    """HTTPヘッダーは受信したバイト列（latin-1）のまま記録する"""
+    writer.write_response(URL, 200, 'OK', [('X-Name', 'caf\xe9')], BODY)
+    writer.close()
+
+    with open(writer.paths[0], 'rb') as f:
+        raw = gzip.decompress(f.read())
+    assert b'\r\nX-Name: caf\xe9\r\n' in raw
+
+
+def test_revisit_and_resource(writer):
+    writer.write_revisit(URL, 304, 'Not Modified', [('ETag', '"v1"')])
+    writer.write_resource(URL, '<p>描画後</p>')
+
+    _warcinfo, revisit, resource = read_all(writer)
+
+    assert (revisit.type, revisit.status, revisit.payload) == ('revisit', 304, b'')
+    assert revisit.http_headers['etag'] == '"v1"'
+    assert resource.type == 'resource'
+    assert resource.status is None
+    assert resource.payload.decode('utf-8') == '<p>描画後</p>'
+
+
+def test_type_filter(writer):
+    writer.write_response(URL, 200, 'OK', [], BODY, [])
+    writer.write_resource(URL, '<p>x</p>')
+    writer.close()
+
+    types = [record.type for record in iter_records(writer.paths[0], types=('response', 'resource'))]
+    assert types == ['response', 'resource']
+
+
+def test_rotation_keeps_every_file_readable(tmp_path):
+    """上限を超えたら次のファイルに切り替え、どのファイルも単独で読める"""
+    with WARCWriter(str(tmp_path), max_bytes=2000, buffer_bytes=0) as writer:
+        for i in range(10):
+            writer.write_response(f'http://example.com/{i}', 200, 'OK', [], BODY * 20)
+
+    assert len(writer.paths) > 1
+    urls = []
+    for path in writer.paths:
+        records = list(iter_records(path))
+        assert records[0].type == 'warcinfo'  # ファイルごとにwarcinfoから始まる
+        urls.extend(record.url for record in records if record.type == 'response')
+    assert urls == [f'http://example.com/{i}' for i in range(10)]
+
+
+def test_uncompressed_warc_is_readable(writer, tmp_path):
+    """gzipを展開した.warcも同じように読める"""
+    writer.write_response(URL, 200, 'OK', [], BODY)
+    writer.close()
+    plain = tmp_path / 'plain.warc'
+    with open(writer.paths[0], 'rb') as f:
+        plain.write_bytes(gzip.decompress(f.read()))
+
+    assert [record.type for record in iter_records(str(plain))] == ['warcinfo', 'response']
+
+
+def test_not_a_warc_file(tmp_path):
+    path = tmp_path / 'broken.warc'
+    path.write_bytes(b'HTTP/1.1 200 OK\r\n\r\n')
+
+    with pytest.raises(ValueError):
+        list(iter_records(str(path)))
@@ -0,0 +1,117 @@
+# ============================================
+# テストコード - HTTPキャッシュ（304での再検証とLRUでの削除）
+# ============================================
+
+from types import SimpleNamespace  # store()に渡すレスポンスの代わり用
+
+import pytest
+
+from html_parser_no_driver import HTTPCache, HTMLAnalyzer
+
+PAGE = '<html><head><title>キャッシュ</title></head><body><p>本文</p></body></html>'.encode('utf-8')
+
+
+def response(body: bytes, etag=None, last_modified=None):
+    """検証子付きの読み込み済みレスポンスの代わり"""
+    headers = {}
+    if etag:
+        headers['ETag'] = etag
+    if last_modified:
+        headers['Last-Modified'] = last_modified
+    return SimpleNamespace(headers=headers, content=body, encoding='utf-8')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HTTPCache(str(tmp_path / 'cache'))
+
+
+def etag_route(state):
+    """If-None-Matchが現在のETagと一致すれば304を返すページ"""
+    def route(headers):
+        if headers.get('If-None-Match') == state['etag']:
+            return 304, {'ETag': state['etag']}, b''
+        return 200, {'Content-Type': 'text/html; charset=utf-8', 'ETag': state['etag']}, state['body']
+    return route
+
+
+def test_revalidation_uses_cached_body(http_server, cache):
+    """2回目は条件付きリクエストになり、304ならディスクの本文でパースする"""
+    state = {'etag': '"v1"', 'body': PAGE}
+    http_server.routes['/page'] = etag_route(state)
+    analyzer = HTMLAnalyzer(cache=cache)
+
+    assert analyzer.fetch_url(http_server.url('/page'))
+    assert analyzer.fetch_url(http_server.url('/page'))
+
+    first, second = (headers for _path, headers in http_server.requests)
+    assert 'If-None-Match' not in first
+    assert second['If-None-Match'] == '"v1"'
+    assert analyzer.soup.title.string == 'キャッシュ'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'bytes_saved': len(PAGE),
+                             'entries': 1, 'total_bytes': len(PAGE)}
+
+
+def test_changed_page_replaces_entry(http_server, cache):
+    """ETagが変わって200が返った場合は新しい本文で置き換える"""
+    state = {'etag': '"v1"', 'body': PAGE}
+    http_server.routes['/page'] = etag_route(state)
+    analyzer = HTMLAnalyzer(cache=cache)
+    analyzer.fetch_url(http_server.url('/page'))
+
+    state.update(etag='"v2"', body=PAGE.replace('本文'.encode('utf-8'), '更新'.encode('utf-8')))
+    assert analyzer.fetch_url(http_server.url('/page'))
+
+    assert analyzer.soup.p.string == '更新'
+    assert cache.lookup(http_server.url('/page'))['etag'] == '"v2"'
+    assert cache.load_body(http_server.url('/page')) == state['body']
+    assert cache.stats()['entries'] == 1
+
+
+def test_last_modified_is_sent_back(cache):
+    """Last-ModifiedだけのエントリはIf-Modified-Sinceで再検証する"""
+    date = 'Wed, 21 Oct 2026 07:28:00 GMT'
+    cache.store('http://example.com/a', response(PAGE, last_modified=date))
+
+    meta = cache.lookup('http://example.com/a')
+    assert HTTPCache.conditional_headers(meta) == {'If-Modified-Since': date}
+
+
+def test_response_without_validators_is_not_stored(cache):
+    cache.store('http://example.com/a', response(PAGE))
+
+    assert cache.lookup('http://example.com/a') is None
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_eviction(tmp_path):
+    """上限を超えたら最も長く使われていないエントリから削除する"""
+    cache = HTTPCache(str(tmp_path), max_bytes=100)
+    cache.store('http://example.com/a', response(b'a' * 40, etag='"a"'))
+    cache.store('http://example.com/b', response(b'b' * 40, etag='"b"'))
+    assert cache.load_body('http://example.com/a') == b'a' * 40  # aを最近使ったことにする
+
+    cache.store('http://example.com/c', response(b'c' * 40, etag='"c"'))
+
+    assert cache.lookup('http://example.com/b') is None
+    assert cache.load_body('http://example.com/b') is None
+    assert cache.lookup('http://example.com/a') is not None
+    assert cache.lookup('http://example.com/c') is not None
+    assert cache.stats()['total_bytes'] == 80
+
+
+def test_oversized_body_is_not_stored(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_bytes=10)
+    cache.store('http://example.com/a', response(b'x' * 11, etag='"a"'))
+
+    assert cache.lookup('http://example.com/a') is None
+
+
+def test_index_survives_restart(tmp_path):
+    """ディレクトリの既存エントリを読み込み直す"""
+    HTTPCache(str(tmp_path)).store('http://example.com/a', response(PAGE, etag='"a"'))
+
+    reopened = HTTPCache(str(tmp_path))
+    assert reopened.lookup('http://example.com/a')['etag'] == '"a"'
+    assert reopened.stats()['total_bytes'] == len(PAGE)